@@ -1,17 +1,46 @@
-from PyQt5.QtCore import QSettings, QEvent, Qt, QTimer, QSize, pyqtSignal, QUrl
+from PyQt5.QtCore import (
+    QSettings, QEvent, Qt, QTimer, QSize, pyqtSignal, QUrl, QThread, QFileSystemWatcher,
+    QItemSelectionModel, QItemSelection, QAbstractTableModel, QModelIndex, QObject
+)
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QPushButton, QLabel, QSlider, 
     QVBoxLayout, QHBoxLayout, QFileDialog, QMessageBox,
     QListWidget, QListWidgetItem, QDialog, QMenu, QWidgetAction,
     QSizePolicy, QTabWidget, QWidget, QComboBox, QCheckBox,
-    QSystemTrayIcon
+    QSystemTrayIcon, QTreeWidget, QTreeWidgetItem, QProgressDialog, QSpinBox,
+    QLineEdit, QShortcut, QTableView, QInputDialog, QTabBar
 )
-from PyQt5.QtGui import QIcon, QDragEnterEvent, QDropEvent, QPixmap
+from PyQt5.QtGui import QIcon, QDragEnterEvent, QDropEvent, QPixmap, QPainter, QColor, QKeySequence
 import os
 import sys
+import random
+import hashlib
+import mmap
+import struct
+import math
+import io
+import socket
+import ssl
+import urllib.parse
+import multiprocessing
+import queue
+import sqlite3
+import bisect
+import re
+import unicodedata
+import locale
+import threading
+import time
+import tempfile
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import pygame
-from mutagen.mp3 import MP3
-from mutagen.wave import WAVE
+try:
+    import numpy as np
+except ImportError:  # El analizador de espectro es opcional
+    np = None
+import mutagen
 import json
 
 # Modificar las funciones de guardado y carga
@@ -26,84 +55,3425 @@ def save_window_state(window_name, geometry, state):
     # Cargar configuración existente si existe
     if os.path.exists(config_file):
         try:
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-        except json.JSONDecodeError:
-            # Si el archivo está corrupto, empezar con un diccionario vacío
-            config = {}
-    
-    # Guardar nueva configuración
-    config[window_name] = {
-        'x': geometry.x(),
-        'y': geometry.y(),
-        'width': geometry.width(),
-        'height': geometry.height(),
-        'state': int(state)
-    }
-    
-    # Escribir al archivo asegurándose que el directorio existe
+            with open(config_file, 'r') as f:
+                config = json.load(f)
+        except json.JSONDecodeError:
+            # Si el archivo está corrupto, empezar con un diccionario vacío
+            config = {}
+    
+    # Guardar nueva configuración
+    config[window_name] = {
+        'x': geometry.x(),
+        'y': geometry.y(),
+        'width': geometry.width(),
+        'height': geometry.height(),
+        'state': int(state)
+    }
+    
+    # Escribir al archivo asegurándose que el directorio existe
+    try:
+        with open(config_file, 'w') as f:
+            json.dump(config, f, indent=4)
+        print(f"Configuración guardada en: {config_file}")  # Debug
+    except Exception as e:
+        print(f"Error al guardar la configuración: {e}")  # Debug
+
+def load_window_state(window_name, default_geometry):
+    """Carga el estado de la ventana desde setting.json"""
+    # Obtener la ruta absoluta del directorio del script
+    config_dir = os.path.dirname(os.path.abspath(__file__))
+    config_file = os.path.join(config_dir, 'setting.json')
+    
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r') as f:
+                config = json.load(f)
+                if window_name in config:
+                    print(f"Configuración cargada para: {window_name}")  # Debug
+                    return config[window_name]
+    except Exception as e:
+        print(f"Error al cargar la configuración: {e}")  # Debug
+    
+    print(f"Usando configuración por defecto para: {window_name}")  # Debug
+    return {
+        'x': default_geometry[0],
+        'y': default_geometry[1],
+        'width': default_geometry[2],
+        'height': default_geometry[3],
+        'state': 0
+    }
+
+def load_stylesheet():
+    """Carga el archivo CSS del tema oscuro"""
+    style_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dark_theme.css')
+    try:
+        with open(style_file, 'r') as f:
+            return f.read()
+    except Exception as e:
+        print(f"Error al cargar el tema: {e}")
+        return ""
+
+def get_data_path(filename):
+    """Obtiene la ruta de un archivo de datos junto a setting.json"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+
+def get_icon_path():
+    """Obtiene la ruta absoluta del ícono"""
+    # Intenta diferentes ubicaciones posibles
+    possible_paths = [
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icons', 'icon.png'),
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'icons', 'icon.png'),
+        os.path.abspath(os.path.join('icons', 'icon.png')),
+    ]
+    
+    for path in possible_paths:
+        if os.path.exists(path):
+            print(f"Ícono encontrado en: {path}")  # Debug
+            return path
+            
+    print("No se encontró el archivo icon.png en ninguna ubicación")  # Debug
+    return None
+
+class PlayQueue:
+    """Motor de la cola de reproducción: orden secuencial o aleatorio, repetición y cola "a continuación".
+
+    El modo aleatorio usa un Fisher–Yates perezoso: no se copia ni se permuta la
+    lista, solo se recuerdan las posiciones intercambiadas en cada sorteo, así que
+    siguiente/anterior son O(1) y las ediciones de la lista se aplican en O(1).
+    """
+
+    REPEAT_OFF = 0
+    REPEAT_ALL = 1
+    REPEAT_ONE = 2
+
+    HISTORY_SIZE = 1000
+
+    def __init__(self, source):
+        self.source = source  # Secuencia con el orden visible de la lista
+        self.shuffle = False
+        self.repeat = PlayQueue.REPEAT_OFF
+        self.current = None
+        self.up_next = deque()  # Pistas elegidas con "reproducir a continuación"
+        self._history = deque(maxlen=PlayQueue.HISTORY_SIZE)  # Para "anterior"
+        self._forward = []  # Pistas deshechas con "anterior", para volver con "siguiente"
+        self._cursor = -1  # Índice de la pista actual en source (-1 = desconocido)
+        self._orphan = False  # La pista actual se eliminó; _cursor apunta a la anterior
+        self._live = set()  # Claves presentes en la lista
+        # Estado del Fisher–Yates perezoso
+        self._pool = []  # Claves de la ronda aleatoria (solo crece por el final)
+        self._swaps = {}  # Posiciones del pool sobrescritas por los intercambios
+        self._remaining = 0  # Las posiciones [0, _remaining) aún no se han sorteado
+        self._round = 0
+        self._drawn = {}  # clave -> ronda en la que salió
+
+    def track_inserted(self, index, key):
+        """Notifica que se insertó una pista en la posición index"""
+        self._live.add(key)
+        self._add_to_pool(key)
+        if 0 <= index <= self._cursor:
+            self._cursor += 1
+
+    def track_removed(self, index, key):
+        """Notifica que se eliminó la pista de la posición index"""
+        self._live.discard(key)
+        self._drawn.pop(key, None)
+        if 0 <= index < self._cursor:
+            self._cursor -= 1
+        elif index == self._cursor and key == self.current:
+            # La siguiente pista secuencial será la que ocupó su lugar
+            self._cursor -= 1
+            self._orphan = True
+
+    def track_moved(self, old_index, new_index):
+        """Notifica que una pista cambió de posición"""
+        if old_index == self._cursor and not self._orphan:
+            self._cursor = new_index
+        else:
+            if old_index < self._cursor:
+                self._cursor -= 1
+            if new_index <= self._cursor:
+                self._cursor += 1
+
+    def tracks_moved(self, old_rows, new_rows):
+        """Notifica que varias pistas cambiaron de posición de una vez (O(k)).
+
+        old_rows y new_rows son ascendentes y emparejados; las demás pistas
+        conservan su orden relativo.
+        """
+        i = bisect.bisect_left(old_rows, self._cursor)
+        if i < len(old_rows) and old_rows[i] == self._cursor:
+            self._cursor = new_rows[i]
+            return
+        cursor = self._cursor - i
+        for row in new_rows:
+            if row <= cursor:
+                cursor += 1
+        self._cursor = cursor
+
+    def has(self, key):
+        """Indica si la clave sigue en la lista"""
+        return key in self._live
+
+    def resync(self):
+        """Reconstruye el estado tras reemplazar toda la lista (O(n))"""
+        live = set(self.source)
+        for key in self._live - live:
+            self._drawn.pop(key, None)
+        for key in live - self._live:
+            self._add_to_pool(key)
+        self._live = live
+        if self.current in live:
+            self._cursor = -1
+            self._orphan = False
+        else:
+            self._cursor = min(self._cursor, len(self.source) - 1)
+            self._orphan = self.current is not None
+
+    def set_shuffle(self, enabled):
+        """Activa o desactiva el modo aleatorio empezando una ronda nueva"""
+        self.shuffle = bool(enabled)
+        if self.shuffle:
+            self._new_round()
+
+    def play_next(self, key):
+        """Coloca una pista al frente de la cola"""
+        self.up_next.appendleft(key)
+
+    def enqueue(self, key):
+        """Agrega una pista al final de la cola"""
+        self.up_next.append(key)
+
+    def jump(self, key, index=-1):
+        """Fija la pista actual por elección del usuario"""
+        if self.current is not None and self.current != key:
+            self._history.append(self.current)
+        self._forward.clear()
+        self._set_current(key, index)
+
+    def next(self, auto=False):
+        """Avanza a la siguiente pista y la devuelve (None si la reproducción termina)"""
+        if auto and self.repeat == PlayQueue.REPEAT_ONE and self.current in self._live:
+            return self.current
+
+        key = None
+        index = -1
+        while self.up_next and key is None:
+            candidate = self.up_next.popleft()
+            if candidate in self._live:
+                key = candidate
+        if key is None:
+            key = self._pop_live(self._forward)
+        if key is None and self.shuffle:
+            key = self._draw()
+            if key is None and self.repeat != PlayQueue.REPEAT_OFF:
+                self._new_round()
+                key = self._draw()
+                if key is None and self.current in self._live:
+                    key = self.current  # Única pista de la lista
+        elif key is None:
+            index = self._position() + 1
+            if index >= len(self.source) and self.repeat != PlayQueue.REPEAT_OFF:
+                index = 0
+            if index < len(self.source):
+                key = self.source[index]
+            else:
+                index = -1
+
+        if key is None:
+            return None
+        if self.current is not None:
+            self._history.append(self.current)
+        self._set_current(key, index)
+        return key
+
+    def previous(self):
+        """Vuelve a la pista anterior y la devuelve (None si no hay)"""
+        key = self._pop_live(self._history)
+        index = -1
+        if key is None and not self.shuffle:
+            index = self._position() - (0 if self._orphan else 1)
+            if index < 0 and self.repeat != PlayQueue.REPEAT_OFF:
+                index = len(self.source) - 1
+            if 0 <= index < len(self.source):
+                key = self.source[index]
+            else:
+                index = -1
+        if key is None:
+            return None
+        if self.current is not None:
+            self._forward.append(self.current)
+        self._set_current(key, index)
+        return key
+
+    def _set_current(self, key, index):
+        self.current = key
+        self._cursor = index
+        self._orphan = False
+        self._drawn[key] = self._round
+
+    def _position(self):
+        """Índice de la pista actual; O(1) salvo justo después de un salto"""
+        if self._orphan:
+            return self._cursor
+        if 0 <= self._cursor < len(self.source) and self.source[self._cursor] == self.current:
+            return self._cursor
+        try:
+            self._cursor = self.source.index(self.current)
+        except ValueError:
+            self._cursor = -1
+        return self._cursor
+
+    def _pop_live(self, stack):
+        while stack:
+            key = stack.pop()
+            if key in self._live:
+                return key
+        return None
+
+    def _add_to_pool(self, key):
+        self._pool.append(key)
+        # La nueva posición entra en la zona sin sortear
+        if len(self._pool) - 1 != self._remaining:
+            self._swaps[self._remaining] = key
+        self._remaining += 1
+
+    def _new_round(self):
+        self._round += 1
+        # Compactar solo cuando las claves eliminadas dominan el pool (coste amortizado)
+        if len(self._pool) > 2 * len(self._live) + 16:
+            self._pool = [key for key in dict.fromkeys(self._pool) if key in self._live]
+        self._swaps.clear()
+        self._remaining = len(self._pool)
+        if self.current is not None:
+            self._drawn[self.current] = self._round
+
+    def _draw(self):
+        while self._remaining:
+            j = random.randrange(self._remaining)
+            last = self._remaining - 1
+            key = self._swaps.pop(j, None)
+            if key is None:
+                key = self._pool[j]
+            if j != last:
+                tail = self._swaps.pop(last, None)
+                self._swaps[j] = self._pool[last] if tail is None else tail
+            self._remaining = last
+            if key in self._live and self._drawn.get(key) != self._round:
+                return key
+        return None
+
+def iter_riff_chunks(buf):
+    """Recorre los chunks de un archivo RIFF/WAVE devolviendo (id, inicio de datos, tamaño)"""
+    if len(buf) < 12 or buf[0:4] not in (b'RIFF', b'RF64') or buf[8:12] != b'WAVE':
+        return
+    pos = 12
+    while pos + 8 <= len(buf):
+        chunk_id = bytes(buf[pos:pos + 4])
+        size = struct.unpack('<I', buf[pos + 4:pos + 8])[0]
+        start = pos + 8
+        # En RF64 y grabaciones cortadas el tamaño puede superar el archivo
+        yield chunk_id, start, min(size, len(buf) - start)
+        pos = start + size + (size & 1)  # Los chunks se alinean a 2 bytes
+
+def audio_payload_range(buf, path):
+    """Devuelve (inicio, fin) de los datos de audio, sin etiquetas ID3/APE ni cabeceras RIFF"""
+    if path.lower().endswith('.wav'):
+        for chunk_id, start, size in iter_riff_chunks(buf):
+            if chunk_id == b'data':
+                return start, start + size
+        return 0, 0
+
+    start, end = 0, len(buf)
+    # Etiquetas ID3v2 al inicio (puede haber varias seguidas)
+    while end - start >= 10 and buf[start:start + 3] == b'ID3':
+        flags = buf[start + 5]
+        b = buf[start + 6:start + 10]
+        tag_size = (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+        start += 10 + tag_size + (10 if flags & 0x10 else 0)
+    # ID3v1 al final
+    if end - start >= 128 and buf[end - 128:end - 125] == b'TAG':
+        end -= 128
+    # APEv2 al final (el tamaño incluye el pie pero no la cabecera)
+    if end - start >= 32 and buf[end - 32:end - 24] == b'APETAGEX':
+        ape_size, _, ape_flags = struct.unpack('<III', buf[end - 20:end - 8])
+        end -= ape_size + (32 if ape_flags & 0x80000000 else 0)
+    start = min(start, len(buf))
+    return start, max(start, end)
+
+def wav_fingerprint(buf):
+    """Huella gruesa de un WAV PCM de 16 bits: duración en segundos y envolvente de energía"""
+    channels = rate = bits = 0
+    data = None
+    for chunk_id, start, size in iter_riff_chunks(buf):
+        if chunk_id == b'fmt ' and size >= 16:
+            _, channels, rate, _, _, bits = struct.unpack('<HHIIHH', buf[start:start + 16])
+        elif chunk_id == b'data':
+            data = (start, start + size - size % 2)
+    if data is None or bits != 16 or not channels or not rate:
+        return None
+
+    segments = 32
+    count = (data[1] - data[0]) // 2
+    frames = count // channels
+    seg_len = count // segments
+    if seg_len == 0:
+        return None
+    step = max(1, seg_len // 2048)
+    if np is not None:
+        # Mismas muestras y sumas enteras que la versión sin NumPy: las huellas guardadas siguen valiendo
+        samples = np.frombuffer(buf, dtype='<i2', count=segments * seg_len, offset=data[0])
+        energies = np.abs(samples.reshape(segments, seg_len)[:, ::step].astype(np.int64)).sum(axis=1).tolist()
+        del samples  # Suelta el búfer antes de que se cierre el mmap
+    else:
+        view = memoryview(buf)[data[0]:data[1]].cast('h')
+        try:
+            energies = [sum(abs(x) for x in view[i * seg_len:(i + 1) * seg_len:step]) for i in range(segments)]
+        finally:
+            view.release()
+    median = sorted(energies)[segments // 2]
+    envelope = 0
+    for energy in energies:
+        envelope = (envelope << 1) | (energy > median)
+    return [round(frames / rate), envelope]
+
+def hash_audio_file(path, fingerprint=False):
+    """Calcula el hash de los datos de audio con lectura mapeada en memoria.
+
+    Se ejecuta en los procesos del ProcessPoolExecutor; devuelve (ruta, hash, huella).
+    """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return path, None, None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start, end = audio_payload_range(mm, path)
+                digest = hashlib.blake2b(digest_size=16)
+                view = memoryview(mm)
+                try:
+                    step = 1 << 20
+                    for pos in range(start, end, step):
+                        digest.update(view[pos:min(pos + step, end)])
+                finally:
+                    view.release()
+                print_fp = wav_fingerprint(mm) if fingerprint and path.lower().endswith('.wav') else None
+                return path, digest.hexdigest(), print_fp
+    except (OSError, ValueError) as e:
+        print(f"Error al calcular el hash de {path}: {e}")  # Debug
+        return path, None, None
+
+class HashCache:
+    """Caché persistente de hashes indexada por identidad de archivo (dispositivo e inodo)"""
+
+    def __init__(self, filename='hash_cache.json'):
+        self.cache_file = get_data_path(filename)
+        self.entries = {}
+        self.dirty = False
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r') as f:
+                    self.entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error al cargar la caché de hashes: {e}")  # Debug
+            self.entries = {}
+
+    @staticmethod
+    def identity(st):
+        return f"{st.st_dev}:{st.st_ino}"
+
+    def lookup(self, st, fingerprint=False):
+        """Devuelve (hash, huella) si el archivo no cambió desde que se calculó"""
+        entry = self.entries.get(self.identity(st))
+        if not entry or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+            return None
+        if fingerprint and entry[3] is None and entry[4]:
+            return None  # Falta la huella y el formato la admite
+        return entry[2], entry[3]
+
+    def store(self, st, path, digest, print_fp):
+        self.entries[self.identity(st)] = [st.st_size, st.st_mtime_ns, digest, print_fp,
+                                           path.lower().endswith('.wav'), path]
+        self.dirty = True
+
+    def prune(self, seen):
+        """Quita las entradas no vistas en el último escaneo cuyo archivo ya no existe o cambió.
+
+        seen relaciona cada identidad vista con su ruta actual; las demás entradas solo se
+        conservan si su ruta sigue apuntando al mismo archivo sin modificar (otra lista
+        puede usarlas).
+        """
+        for key, entry in list(self.entries.items()):
+            if key in seen:
+                if entry[5:] != [seen[key]]:
+                    self.entries[key] = entry[:5] + [seen[key]]  # Renombrado, o guardado sin ruta
+                    self.dirty = True
+                continue
+            try:
+                st = os.stat(entry[5]) if len(entry) > 5 else None
+            except OSError:
+                st = None
+            if (st is None or self.identity(st) != key or st.st_size != entry[0]
+                    or st.st_mtime_ns != entry[1]):
+                del self.entries[key]
+                self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump(self.entries, f)
+            self.dirty = False
+        except OSError as e:
+            print(f"Error al guardar la caché de hashes: {e}")  # Debug
+
+class DuplicateScanWorker(QThread):
+    """Busca pistas duplicadas en segundo plano usando un pool de procesos"""
+    progress = pyqtSignal(int, int)
+    scan_finished = pyqtSignal(list, list)  # grupos exactos, grupos por huella
+
+    # Por debajo de este número de archivos no compensa arrancar procesos
+    POOL_THRESHOLD = 16
+
+    def __init__(self, paths, fingerprint=False, parent=None):
+        super().__init__(parent)
+        self.paths = list(paths)
+        self.fingerprint = fingerprint
+
+    def run(self):
+        cache = HashCache()
+        results = {}
+        pending = []
+        stats = {}
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = st
+            cached = cache.lookup(st, self.fingerprint)
+            if cached is not None:
+                results[path] = cached
+            else:
+                pending.append(path)
+
+        total = len(self.paths)
+        done = total - len(pending)
+        self.progress.emit(done, total)
+        flags = [self.fingerprint] * len(pending)
+        if len(pending) >= DuplicateScanWorker.POOL_THRESHOLD:
+            try:
+                # "spawn" evita heredar con fork el estado de Qt y SDL del proceso principal
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context) as pool:
+                    hashed = pool.map(hash_audio_file, pending, flags, chunksize=8)
+                    done = self._collect(hashed, cache, stats, results, done, total)
+            except (OSError, RuntimeError, BrokenProcessPool) as e:
+                print(f"Error en el pool de procesos, se continúa en este hilo: {e}")  # Debug
+            pending = [path for path in pending if path not in results]
+            flags = flags[:len(pending)]
+        self._collect(map(hash_audio_file, pending, flags), cache, stats, results, done, total)
+        cache.prune({HashCache.identity(st): path for path, st in stats.items()})
+        cache.save()
+
+        exact = {}
+        for path in self.paths:
+            if path in results and results[path][0]:
+                exact.setdefault(results[path][0], []).append(path)
+        exact_groups = [group for group in exact.values() if len(group) > 1]
+
+        similar_groups = []
+        if self.fingerprint:
+            # Una sola entrada por hash para no repetir los duplicados exactos
+            similar = {}
+            for group in exact.values():
+                print_fp = results[group[0]][1]
+                if print_fp:
+                    similar.setdefault(tuple(print_fp), []).extend(group)
+            similar_groups = [group for group in similar.values()
+                              if len(group) > 1 and len({results[p][0] for p in group}) > 1]
+        self.scan_finished.emit(exact_groups, similar_groups)
+
+    def _collect(self, hashed, cache, stats, results, done, total):
+        for path, digest, print_fp in hashed:
+            if digest:
+                cache.store(stats[path], path, digest, print_fp)
+                results[path] = (digest, print_fp)
+            done += 1
+            if done % 32 == 0 or done == total:
+                self.progress.emit(done, total)
+        return done
+
+class SpectrumAnalyzer:
+    """Calcula bandas de espectro y niveles VU con FFT sobre buffers preasignados"""
+
+    FLOOR_DB = -60.0
+
+    def __init__(self, fft_size=2048, num_bands=24, sample_rate=44100):
+        self.fft_size = fft_size
+        self.num_bands = num_bands
+        self.window = np.hanning(fft_size).astype(np.float32)
+        self.frame = np.zeros(fft_size, dtype=np.float32)
+        self.magnitude = np.zeros(fft_size // 2 + 1, dtype=np.float32)
+        self.bands = np.zeros(num_bands, dtype=np.float32)  # 0..1
+        self.levels = np.zeros(2, dtype=np.float32)  # VU izquierdo/derecho, 0..1
+        self._band_values = np.zeros(num_bands, dtype=np.float32)
+        # Una senoidal a escala completa con ventana de Hann da un pico de ~N/4
+        self._reference = 32768.0 * fft_size / 4
+        self.set_sample_rate(sample_rate)
+
+    def set_sample_rate(self, sample_rate):
+        """Recalcula los límites de las bandas (espaciado logarítmico)"""
+        self.sample_rate = sample_rate
+        freqs = np.geomspace(40, min(16000, sample_rate / 2), self.num_bands + 1)
+        edges = np.clip((freqs * self.fft_size / sample_rate).astype(np.int64), 1, self.fft_size // 2)
+        for i in range(1, len(edges)):
+            edges[i] = max(edges[i], edges[i - 1] + 1)  # Cada banda con al menos un bin
+        edges = np.minimum(edges, self.fft_size // 2 + 1)
+        self._starts = edges[:-1].copy()
+        self._stop = int(edges[-1])
+        self._widths = np.maximum(np.diff(edges), 1).astype(np.float32)
+
+    def process(self, pcm):
+        """Actualiza bandas y niveles a partir de muestras int16 (frames x canales)"""
+        n = min(len(pcm), self.fft_size)
+        if n == 0:
+            self.decay()
+            return
+        pcm = pcm[-n:]
+        np.mean(pcm, axis=1, dtype=np.float32, out=self.frame[:n])
+        self.frame[n:] = 0
+        self.frame *= self.window
+        np.abs(np.fft.rfft(self.frame), out=self.magnitude)
+
+        np.add.reduceat(self.magnitude[:self._stop], self._starts, out=self._band_values)
+        self._band_values /= self._widths
+        self._band_values /= self._reference
+        np.maximum(self._band_values, 1e-9, out=self._band_values)
+        np.log10(self._band_values, out=self._band_values)
+        self._band_values *= 20.0 / -self.FLOOR_DB
+        self._band_values += 1.0
+        np.clip(self._band_values, 0.0, 1.0, out=self._band_values)
+        # Subida inmediata y caída suave
+        self.bands *= 0.85
+        np.maximum(self.bands, self._band_values, out=self.bands)
+
+        channels = pcm.shape[1]
+        for ch in range(min(channels, 2)):
+            column = pcm[:, ch].astype(np.float32)
+            rms = float(np.sqrt(np.dot(column, column) / n)) / 32768.0
+            level = max(0.0, 1.0 + 20.0 * np.log10(max(rms, 1e-9)) / -self.FLOOR_DB)
+            self.levels[ch] = max(level, self.levels[ch] * 0.85)
+        if channels == 1:
+            self.levels[1] = self.levels[0]
+
+    def decay(self):
+        """Deja caer las barras cuando no hay audio"""
+        self.bands *= 0.85
+        self.levels *= 0.85
+
+    def is_silent(self):
+        return float(self.bands.max()) < 0.01 and float(self.levels.max()) < 0.01
+
+def decode_pcm(path, rate, channels, limit, out_path):
+    """Decodifica un archivo a PCM de 16 bits en out_path; devuelve (ruta, fotogramas, motivo).
+
+    Se ejecuta en el proceso de decodificación, con su propio mezclador a la frecuencia
+    del reproductor. Con 0 fotogramas, motivo explica por qué no se decodificó.
+    """
+    try:
+        init = pygame.mixer.get_init()
+        if init is None or init[0] != rate or init[1] != -16 or init[2] != channels:
+            pygame.mixer.quit()
+            pygame.mixer.init(frequency=rate, size=-16, channels=channels)
+        # Sin decodificar lo que no cabría en la caché (una mezcla de 2 h son ~1,2 GB)
+        if int(read_track_info(path)['duration'] * rate) * channels * 2 > limit:
+            return path, 0, "no cabe en la caché PCM"
+        sound = pygame.mixer.Sound(path)
+        samples = pygame.sndarray.samples(sound)
+        if samples.nbytes > limit:
+            return path, 0, "no cabe en la caché PCM"
+        with open(out_path, 'wb') as f:
+            samples.tofile(f)
+        return path, len(samples), ''
+    except (pygame.error, OSError) as e:
+        return path, 0, str(e)
+
+class PCMDecoder(QThread):
+    """Decodifica en segundo plano la pista que suena por music y la guarda en la caché PCM.
+
+    SDL bloquea su dispositivo mientras decodifica con Sound(), así que la decodificación
+    va en un proceso aparte con el mezclador 'dummy' (como el análisis de silencios) y el
+    PCM vuelve por un archivo temporal. Solo cuenta la última petición: al cambiar de
+    pista se descarta el resultado de la anterior.
+    """
+    decoded = pyqtSignal(str)  # La pista ya está completa en la caché
+    done = pyqtSignal(str)  # Terminó una petición, se guardara o no
+    status = pyqtSignal(str)
+
+    IDLE_SECONDS = 60  # Sin peticiones durante este tiempo se cierra el proceso
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pending = None  # Ruta pedida que aún no ha terminado
+        self._job = None  # (ruta, frecuencia, canales) por atender
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._pool = None
+
+    def request(self, path, rate, channels):
+        """Pide decodificar una pista con el formato del mezclador; sustituye a la petición anterior"""
+        with self._cond:
+            if self.pending == path:
+                return
+            self.pending = path
+            self._job = (path, rate, channels)
+            self._cond.notify()
+        if not self.isRunning():
+            self.start()
+
+    def cancel(self):
+        """Olvida la petición pendiente y el resultado de la que está en curso"""
+        with self._cond:
+            self.pending = None
+            self._job = None
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self.pending = None
+            self._job = None
+            self._cond.notify()
+        self.wait()
+
+    def run(self):
+        try:
+            while True:
+                with self._cond:
+                    while self._job is None and not self._stopping:
+                        if not self._cond.wait(PCMDecoder.IDLE_SECONDS):
+                            self._close_pool()
+                    if self._stopping:
+                        break
+                    job, self._job = self._job, None
+                self._decode(*job)
+        finally:
+            self._close_pool()
+
+    def _decode(self, path, rate, channels):
+        fd, out_path = tempfile.mkstemp(suffix='.pcm')
+        os.close(fd)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if self._pool is None:
+                # "spawn" evita heredar con fork el estado de Qt y SDL del proceso principal
+                self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=init_silence_process)
+            _, frames, reason = self._pool.submit(decode_pcm, path, rate, channels,
+                                                  self.cache.budget, out_path).result()
+            if frames and self.pending == path:
+                samples = np.memmap(out_path, dtype=np.int16, mode='r', shape=(frames, channels))
+                try:
+                    if self.cache.store_track(path, mtime, rate, samples):
+                        self.decoded.emit(path)
+                    else:
+                        reason = "no cabe en la caché PCM"
+                finally:
+                    del samples
+        except (OSError, RuntimeError, BrokenProcessPool) as e:
+            reason = str(e)
+            self._close_pool()
+        finally:
+            try:
+                os.remove(out_path)
+            except OSError:
+                pass
+        with self._cond:
+            if self.pending != path:
+                return  # Ya se pidió otra pista: nadie espera este resultado
+            if self._job is None:
+                self.pending = None
+        self.status.emit(f"No se decodificó {os.path.basename(path)}: {reason}" if reason else '')
+        self.done.emit(path)
+
+    def _close_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+class RefreshScheduler(QObject):
+    """Reloj único para todo lo que se repinta periódicamente en la interfaz.
+
+    Cada consumidor (barra de progreso, visualizador, estadísticas...) se registra con
+    su periodo y el widget que lo muestra. Un solo QTimer de disparo único despierta en
+    el siguiente vencimiento y atiende a la vez a todos los que vencen dentro de un
+    margen, así que los refrescos lentos viajan en los ticks de los rápidos. Solo
+    cuentan los consumidores activos cuyo widget está visible y sin minimizar: si no
+    queda ninguno el reloj se para y no hay despertares.
+    """
+
+    SLACK = 0.25  # Fracción del periodo que un consumidor puede adelantarse para compartir tick
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._consumers = {}  # nombre -> {'callback', 'interval', 'widget', 'active', 'due'}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._tick)
+        self.ticks = 0  # Despertares del reloj desde el arranque
+
+    def register(self, name, callback, interval, widget=None):
+        """Añade un consumidor inactivo que refresca cada interval ms mientras widget se vea"""
+        self._consumers[name] = {'callback': callback, 'interval': interval, 'widget': widget,
+                                 'active': False, 'due': 0.0}
+
+    def set_active(self, name, active):
+        consumer = self._consumers[name]
+        if consumer['active'] != active:
+            consumer['active'] = active
+            consumer['due'] = self._now() + consumer['interval']
+            self.reschedule()
+
+    def is_active(self, name):
+        return self._consumers[name]['active']
+
+    def reschedule(self):
+        """Vuelve a calcular el próximo despertar (llamar al cambiar la visibilidad de una ventana)"""
+        due = [consumer['due'] for consumer in self._consumers.values() if self._runnable(consumer)]
+        if not due:
+            self._timer.stop()
+            return
+        self._timer.start(max(0, int(min(due) - self._now())))
+
+    @staticmethod
+    def _now():
+        return time.monotonic() * 1000
+
+    @staticmethod
+    def _runnable(consumer):
+        if not consumer['active']:
+            return False
+        widget = consumer['widget']
+        return widget is None or (widget.isVisible() and not widget.window().isMinimized())
+
+    def _tick(self):
+        self.ticks += 1
+        now = self._now()
+        for consumer in list(self._consumers.values()):
+            if (self._runnable(consumer)
+                    and consumer['due'] - RefreshScheduler.SLACK * consumer['interval'] <= now):
+                consumer['due'] = now + consumer['interval']
+                consumer['callback']()
+        self.reschedule()
+
+class SpectrumWidget(QWidget):
+    """Visualizador de espectro y VU alimentado con el PCM que se está reproduciendo"""
+
+    def __init__(self, pcm_source, scheduler, parent=None):
+        super().__init__(parent)
+        self.pcm_source = pcm_source  # Función que devuelve las últimas N muestras o None
+        self.scheduler = scheduler
+        self.analyzer = SpectrumAnalyzer()
+        self.enabled = False
+        self.playing = False
+        self.setMinimumHeight(48)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+        # Limitar la frecuencia de refresco a la de la pantalla (máximo 60 Hz)
+        refresh_rate = 60.0
+        screen = QApplication.primaryScreen()
+        if screen is not None and screen.refreshRate() > 0:
+            refresh_rate = min(refresh_rate, screen.refreshRate())
+        self.scheduler.register('spectrum', self.tick, int(1000 / refresh_rate), self)
+
+    def set_enabled(self, enabled):
+        """Muestra u oculta el visualizador"""
+        self.enabled = enabled
+        self.setVisible(enabled)
+        self.update_state()
+
+    def set_playing(self, playing):
+        self.playing = playing
+        self.update_state()
+
+    def update_state(self):
+        """Solo calcula mientras hay audio; el planificador lo pausa si no se ve"""
+        active = self.enabled and (self.playing or not self.analyzer.is_silent())
+        self.scheduler.set_active('spectrum', active)
+
+    def tick(self):
+        pcm = self.pcm_source(self.analyzer.fft_size) if self.playing else None
+        if pcm is None:
+            self.analyzer.decay()
+            if self.analyzer.is_silent():
+                self.analyzer.bands[:] = 0
+                self.analyzer.levels[:] = 0
+                self.update_state()
+        else:
+            self.analyzer.process(pcm)
+        self.update()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.scheduler.reschedule()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.scheduler.reschedule()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        vu_width = 6
+        bars_width = width - 2 * (vu_width + 2) - 4
+        bands = self.analyzer.bands
+        bar_width = bars_width / len(bands)
+        color = QColor('#00a0fc')
+        for i, value in enumerate(bands):
+            bar_height = int(value * height)
+            painter.fillRect(int(i * bar_width) + 1, height - bar_height,
+                             max(1, int(bar_width) - 2), bar_height, color)
+        for ch, value in enumerate(self.analyzer.levels):
+            bar_height = int(value * height)
+            x = width - (2 - ch) * (vu_width + 2)
+            painter.fillRect(x, 0, vu_width, height, QColor('#2d2d2d'))
+            painter.fillRect(x, height - bar_height, vu_width, bar_height, color)
+        painter.end()
+
+class WavFile:
+    """Archivo WAV mapeado en memoria; las lecturas son vistas NumPy sin copia"""
+
+    FORMAT_PCM = 1
+    FORMAT_FLOAT = 3
+    FORMAT_EXTENSIBLE = 0xFFFE
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+
+        fmt = data = None
+        for chunk_id, start, size in iter_riff_chunks(self._mm):
+            if chunk_id == b'fmt ' and size >= 16:
+                fmt = self._mm[start:start + min(size, 26)]
+            elif chunk_id == b'data':
+                data = (start, size)
+        if fmt is None or data is None:
+            self.close()
+            raise ValueError("El archivo WAV no tiene chunks fmt/data")
+
+        tag, self.channels, self.rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+        if tag == WavFile.FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            tag = struct.unpack('<H', fmt[24:26])[0]  # Primeros bytes del GUID del subformato
+        dtypes = {
+            (WavFile.FORMAT_PCM, 8): np.uint8,
+            (WavFile.FORMAT_PCM, 16): np.dtype('<i2'),
+            (WavFile.FORMAT_PCM, 24): np.uint8,  # Se reagrupa de 3 en 3 al convertir
+            (WavFile.FORMAT_PCM, 32): np.dtype('<i4'),
+            (WavFile.FORMAT_FLOAT, 32): np.dtype('<f4'),
+            (WavFile.FORMAT_FLOAT, 64): np.dtype('<f8'),
+        }
+        if (tag, bits) not in dtypes or not self.channels or not self.rate:
+            self.close()
+            raise ValueError(f"Formato WAV no soportado (formato {tag}, {bits} bits)")
+        if block_align != self.channels * bits // 8:
+            self.close()  # Las muestras se leen empaquetadas: otro tamaño de bloque las desalinearía
+            raise ValueError(f"Tamaño de bloque WAV inválido ({block_align} bytes)")
+        self.bits = bits
+        self.frames = data[1] // block_align
+        if bits == 24:
+            shape = (self.frames, self.channels, 3)
+        else:
+            shape = (self.frames, self.channels)
+        count = self.frames * self.channels * (3 if bits == 24 else 1)
+        self.samples = np.frombuffer(self._mm, dtype=dtypes[(tag, bits)], count=count,
+                                     offset=data[0]).reshape(shape)
+
+    @property
+    def duration(self):
+        return self.frames / self.rate
+
+    def read(self, start, count):
+        """Vista sin copia de count frames desde start, en el formato del archivo"""
+        return self.samples[start:start + count]
+
+    def read_int16(self, start, count):
+        """Frames como int16; sin copia cuando el archivo ya es PCM de 16 bits"""
+        block = self.read(start, count)
+        if block.dtype == np.int16:
+            return block
+        if self.bits == 8:
+            return ((block.astype(np.int16) - 128) << 8)
+        if self.bits == 24:
+            # El byte más significativo lleva el signo; se descarta el menos significativo
+            return (block[..., 1].astype(np.int16) | (block[..., 2].astype(np.int8).astype(np.int16) << 8))
+        if block.dtype.kind == 'f':
+            return (np.clip(block, -1.0, 1.0) * 32767).astype(np.int16)
+        return (block >> 16).astype(np.int16)
+
+    def close(self):
+        self.samples = None
+        try:
+            self._mm.close()
+        except (AttributeError, BufferError):
+            pass  # Aún quedan vistas vivas; el mapa se libera con ellas
+        self._file.close()
+
+class PolyphaseResampler:
+    """Remuestreo racional up/down con un banco FIR polifásico vectorizado con NumPy.
+
+    El filtro prototipo es un sinc con ventana de Kaiser diseñado a in_rate * up;
+    cada muestra de salida solo evalúa los taps coeficientes de su fase, así que
+    el coste es taps multiplicaciones por muestra y canal sin importar la razón.
+    """
+
+    TAPS = 32  # Coeficientes por fase
+    MAX_PHASES = 4096  # Razones más raras se dejan a SDL
+
+    def __init__(self, in_rate, out_rate, taps=TAPS):
+        g = math.gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.taps = taps
+        length = taps * self.up - 1  # Impar: el centro del filtro cae en una muestra entera
+        cutoff = 0.46 * min(in_rate, out_rate) / (in_rate * self.up)  # Deja margen de transición
+        self._delay = (length - 1) // 2  # Retardo del filtro en muestras del prototipo
+        n = np.arange(length) - self._delay
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, 8.6)
+        prototype = np.append(prototype * (self.up / prototype.sum()), 0.0)  # Ganancia unidad tras intercalar ceros
+        # bank[fase, j] multiplica x[base - (taps - 1 - j)]: orden ascendente de la ventana de entrada
+        self.bank = prototype.reshape(taps, self.up).T[:, ::-1].astype(np.float32).copy()
+
+    @classmethod
+    def supported(cls, in_rate, out_rate):
+        return out_rate // math.gcd(in_rate, out_rate) <= cls.MAX_PHASES
+
+    def output_frames(self, input_frames):
+        return input_frames * self.up // self.down
+
+    def input_span(self, start, count):
+        """Rango [lo, hi) de frames de entrada que necesitan las salidas [start, start + count)"""
+        first = (start * self.down + self._delay) // self.up
+        last = ((start + count - 1) * self.down + self._delay) // self.up
+        return first - self.taps + 1, last + 1
+
+    def resample(self, x, lo, start, count):
+        """x: float32 (frames x canales) con la entrada desde el frame lo; devuelve count frames"""
+        t = np.arange(start, start + count, dtype=np.int64) * self.down + self._delay
+        bases, phases = np.divmod(t, self.up)
+        windows = np.lib.stride_tricks.sliding_window_view(x, self.taps, axis=0)  # (n, canales, taps)
+        selected = windows[bases - (self.taps - 1) - lo]
+        return np.matmul(selected, self.bank[phases][:, :, None])[:, :, 0]
+
+    @classmethod
+    def benchmark(cls, in_rate, out_rate, seconds=5.0, channels=2, block=2048):
+        """Segundos de CPU que cuesta remuestrear un segundo de audio"""
+        resampler = cls(in_rate, out_rate)
+        x = np.random.default_rng(0).standard_normal((int(in_rate * seconds), channels)).astype(np.float32)
+        total = resampler.output_frames(len(x))
+        started = time.process_time()
+        for start in range(0, total - block, block):
+            lo, hi = resampler.input_span(start, block)
+            if lo < 0 or hi > len(x):
+                continue
+            resampler.resample(x[lo:hi], lo, start, block)
+        return (time.process_time() - started) / seconds
+
+class TimeStretcher:
+    """Cambio de velocidad sin cambiar el tono por WSOLA (solapamiento y suma por similitud de forma de onda).
+
+    Cada trama de salida toma frame muestras de la entrada cerca de su posición ideal
+    (que avanza hop * speed por trama) y, dentro de ±search, elige la que mejor continúa
+    la trama anterior. La búsqueda correlaciona con NumPy una mezcla mono diezmada y
+    afina a resolución completa; las tramas se suman con ventana de Hann al 50 %.
+    """
+
+    FRAME_SECONDS = 0.03
+    SEARCH_SECONDS = 0.008
+    DECIMATION = 4  # Paso de la búsqueda gruesa
+
+    def __init__(self, channels, rate, origin, speed=1.0):
+        self.channels = channels
+        self.speed = speed
+        self.frame = max(256, int(rate * TimeStretcher.FRAME_SECONDS) // 2 * 2)
+        self.hop = self.frame // 2
+        self.search = int(rate * TimeStretcher.SEARCH_SECONDS)
+        self.window = np.hanning(self.frame + 1)[:-1].astype(np.float32)[:, None]  # Suma 1 al 50 %
+        self._input = np.zeros((0, channels), np.float32)
+        self._origin = origin  # Frame de la fuente de _input[0]
+        self._analysis = 0.0  # Posición ideal de la siguiente trama dentro de _input
+        self._previous = None  # Inicio de la última trama elegida
+        self._tail = np.zeros((self.hop, channels), np.float32)
+
+    def position(self):
+        """Frame de la fuente que corresponde al siguiente audio de salida"""
+        return self._origin + int(self._analysis)
+
+    def process(self, block):
+        """Añade un bloque int16 de la fuente y devuelve el audio estirado que ya está listo"""
+        self._input = np.concatenate((self._input, block.astype(np.float32)))
+        frame, hop, search = self.frame, self.hop, self.search
+        out = []
+        while True:
+            # Redondeo hacia arriba en .5: round() va al par y dependería de lo ya recortado
+            center = int(self._analysis + 0.5)
+            if self._previous is None:
+                if center + frame > len(self._input):
+                    break
+                best = center
+            else:
+                natural = self._previous + hop  # Lo que seguiría sin cortes a la trama anterior
+                low, high = max(0, center - search), center + search
+                if max(natural, high) + frame > len(self._input):
+                    break
+                best = self._best_match(natural, low, high)
+            segment = self._input[best:best + frame] * self.window
+            out.append(segment[:hop] + self._tail)
+            self._tail = segment[hop:]
+            self._previous = best
+            self._analysis += hop * self.speed
+        keep = int(self._analysis) - search
+        if self._previous is not None:
+            keep = min(keep, self._previous + hop)
+        if keep > 0:
+            self._input = self._input[keep:]
+            self._origin += keep
+            self._analysis -= keep
+            if self._previous is not None:
+                self._previous -= keep
+        if not out:
+            return np.zeros((0, self.channels), np.int16)
+        return np.clip(np.rint(np.concatenate(out)), -32768, 32767).astype(np.int16)
+
+    def _best_match(self, natural, low, high):
+        """Inicio en [low, high] cuyo segmento se parece más al que empieza en natural"""
+        frame, step = self.frame, TimeStretcher.DECIMATION
+        template = self._input[natural:natural + frame:step].mean(axis=1)
+        region = self._input[low:high + frame:step].mean(axis=1)
+        correlation = np.correlate(region, template, 'valid')
+        energy = np.convolve(region * region, np.ones(len(template), np.float32), 'valid')
+        coarse = low + step * int(np.argmax(correlation / np.sqrt(energy + 1e-3)))
+        # Afinar a resolución completa alrededor del máximo grueso
+        first, last = max(low, coarse - step + 1), min(high, coarse + step - 1)
+        windows = np.lib.stride_tricks.sliding_window_view(self._input[first:last + frame], frame, axis=0)
+        target = self._input[natural:natural + frame]
+        scores = np.einsum('kcn,nc->k', windows, target) / np.sqrt(
+            np.einsum('kcn,kcn->k', windows, windows) + 1e-3)
+        return first + int(np.argmax(scores))
+
+    @classmethod
+    def benchmark(cls, speed, rate=44100, seconds=5.0, channels=2, block=2048):
+        """Segundos de CPU que cuesta estirar un segundo de audio"""
+        stretcher = cls(channels, rate, 0, speed)
+        x = (np.random.default_rng(0).standard_normal((int(rate * seconds), channels)) * 3000).astype(np.int16)
+        started = time.process_time()
+        for start in range(0, len(x), block):
+            stretcher.process(x[start:start + block])
+        return (time.process_time() - started) / seconds
+
+class ResampledSource:
+    """Envuelve una fuente de StreamOutput y la entrega remuestreada a la frecuencia del mezclador"""
+
+    def __init__(self, source, out_rate):
+        self.source = source
+        self.path = getattr(source, 'path', None)
+        self.resampler = PolyphaseResampler(source.rate, out_rate)
+        self.rate = out_rate
+        self.channels = source.channels
+        self.frames = self.resampler.output_frames(source.frames)
+
+    @property
+    def duration(self):
+        return self.frames / self.rate
+
+    def read_int16(self, start, count):
+        count = min(count, self.frames - start)
+        if count <= 0:
+            return np.zeros((0, self.channels), np.int16)
+        lo, hi = self.resampler.input_span(start, count)
+        block = self.resampler.resample(self._input(lo, hi), lo, start, count)
+        return np.clip(np.rint(block), -32768, 32767).astype(np.int16)
+
+    def _input(self, lo, hi):
+        """Frames [lo, hi) de la fuente en float32, con ceros fuera del archivo"""
+        x = np.zeros((hi - lo, self.channels), np.float32)
+        position, end = max(lo, 0), min(hi, self.source.frames)
+        while position < end:
+            block = self.source.read_int16(position, end - position)
+            if not len(block):
+                break
+            x[position - lo:position - lo + len(block)] = block
+            position += len(block)
+        return x
+
+    def close(self):
+        self.source.close()
+
+class PCMCache:
+    """Caché LRU de bloques PCM decodificados con un límite de memoria en bytes.
+
+    Las pistas fijadas (la que suena) no se expulsan. Solo se sirven pistas completas,
+    así que al expulsar el bloque más antiguo de una pista sale la pista entera y la
+    próxima vez se decodifica de nuevo.
+    Una pista más grande que todo el presupuesto no se guarda, así que ni fijada puede
+    dejar la caché por encima del límite.
+    """
+
+    BLOCK_FRAMES = 65536
+
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self._blocks = OrderedDict()  # (ruta, índice) -> ndarray, del más antiguo al más reciente
+        self._tracks = {}  # ruta -> {'mtime', 'rate', 'channels', 'frames', 'blocks'}
+        self._pinned = {}  # ruta -> número de fuentes abiertas
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def fits(self, nbytes):
+        """Indica si una pista de nbytes cabe en el presupuesto"""
+        return nbytes <= self.budget
+
+    def store_track(self, path, mtime, rate, samples):
+        """Guarda una pista decodificada partida en bloques independientes; False si no cabe"""
+        frames, channels = samples.shape
+        num_blocks = (frames + PCMCache.BLOCK_FRAMES - 1) // PCMCache.BLOCK_FRAMES
+        with self._lock:
+            self._drop_track(path)
+            if not self.fits(samples.nbytes):
+                return False
+            self._tracks[path] = {'mtime': mtime, 'rate': rate, 'channels': channels,
+                                  'frames': frames, 'blocks': num_blocks}
+            for i in range(num_blocks):
+                # Copia propia: así expulsar un bloque libera su memoria de verdad
+                block = np.array(samples[i * PCMCache.BLOCK_FRAMES:(i + 1) * PCMCache.BLOCK_FRAMES])
+                self._blocks[(path, i)] = block
+                self.bytes_used += block.nbytes
+            self._evict()
+            return True
+
+    def lookup(self, path, mtime, rate, channels):
+        """Devuelve los datos de la pista si está completa y coincide con el formato actual"""
+        with self._lock:
+            track = self._tracks.get(path)
+            if (track is None or track['mtime'] != mtime
+                    or track['rate'] != rate or track['channels'] != channels):
+                self.misses += 1
+                return None
+            self.hits += 1
+            for i in range(track['blocks']):
+                self._blocks.move_to_end((path, i))
+            return dict(track)
+
+    def get_block(self, path, index):
+        with self._lock:
+            block = self._blocks.get((path, index))
+            if block is not None:
+                self._blocks.move_to_end((path, index))
+            return block
+
+    def pin(self, path):
+        with self._lock:
+            self._pinned[path] = self._pinned.get(path, 0) + 1
+
+    def unpin(self, path):
+        with self._lock:
+            count = self._pinned.get(path, 0) - 1
+            if count > 0:
+                self._pinned[path] = count
+            else:
+                self._pinned.pop(path, None)
+                self._evict()
+
+    def set_budget(self, budget_bytes):
+        """Cambia el límite; la pista fijada que ya no quepa se libera al soltarla"""
+        with self._lock:
+            self.budget = budget_bytes
+            self._evict()
+
+    def clear(self):
+        """Vacía la caché (por ejemplo al cambiar el formato del mezclador)"""
+        with self._lock:
+            for path in list(self._tracks):
+                if path not in self._pinned:
+                    self._drop_track(path)
+
+    def stats(self):
+        with self._lock:
+            return {'bytes_used': self.bytes_used, 'budget': self.budget, 'tracks': len(self._tracks),
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'evicted_bytes': self.evicted_bytes}
+
+    def _drop_track(self, path):
+        """Quita una pista con todos sus bloques; devuelve los bytes liberados"""
+        track = self._tracks.pop(path, None)
+        if track is None:
+            return 0
+        freed = 0
+        for i in range(track['blocks']):
+            block = self._blocks.pop((path, i), None)
+            if block is not None:
+                freed += block.nbytes
+        self.bytes_used -= freed
+        return freed
+
+    def _evict(self):
+        if self.bytes_used <= self.budget:
+            return
+        for path, _ in list(self._blocks):
+            if self.bytes_used <= self.budget:
+                break
+            if path in self._pinned or path not in self._tracks:
+                continue  # Fijada, o ya expulsada por un bloque anterior
+            self.evicted_bytes += self._drop_track(path)
+            self.evictions += 1
+
+class DecodedSource:
+    """Fuente para StreamOutput que lee una pista decodificada desde PCMCache"""
+
+    def __init__(self, cache, path, track):
+        self.cache = cache
+        self.path = path
+        self.rate = track['rate']
+        self.channels = track['channels']
+        self.frames = track['frames']
+        cache.pin(path)
+        self._closed = False
+
+    @property
+    def duration(self):
+        return self.frames / self.rate
+
+    def read_int16(self, start, count):
+        """Vista de hasta count frames; nunca cruza el final de un bloque"""
+        index, offset = divmod(start, PCMCache.BLOCK_FRAMES)
+        block = self.cache.get_block(self.path, index)
+        if block is None:
+            return np.zeros((0, self.channels), np.int16)
+        return block[offset:offset + count]
+
+    def read_before(self, end, count):
+        """Hasta count frames que terminan en end, dentro de un mismo bloque"""
+        index = (end - 1) // PCMCache.BLOCK_FRAMES
+        start = max(index * PCMCache.BLOCK_FRAMES, end - count)
+        return self.read_int16(start, end - start)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.cache.unpin(self.path)
+
+class MusicOutput:
+    """Salida basada en pygame.mixer.music: SDL lee y decodifica el archivo internamente"""
+
+    def __init__(self):
+        self.offset = 0  # Segundos desde los que arrancó el último play()
+
+    def load(self, filename):
+        pygame.mixer.music.load(filename)
+
+    def play(self, start=0):
+        pygame.mixer.music.play(start=start)
+        self.offset = start
+
+    def pause(self):
+        pygame.mixer.music.pause()
+
+    def unpause(self):
+        pygame.mixer.music.unpause()
+
+    def stop(self):
+        pygame.mixer.music.stop()
+
+    def unload(self):
+        pygame.mixer.music.unload()
+
+    def get_busy(self):
+        return pygame.mixer.music.get_busy()
+
+    def position(self):
+        """Posición en segundos (get_pos cuenta desde el último play)"""
+        return self.offset + max(0, pygame.mixer.music.get_pos()) / 1000.0
+
+    def set_volume(self, volume):
+        pygame.mixer.music.set_volume(volume)
+
+class StreamOutput:
+    """Salida PCM propia: un hilo envía bloques a un canal reservado de pygame.mixer.
+
+    La fuente entrega vistas NumPy (por ejemplo WavFile sobre el mmap), las etapas de
+    processors se aplican bloque a bloque y la única copia es la que hace SDL al crear
+    cada Sound. El seek es inmediato porque solo mueve el cursor de lectura.
+    """
+
+    CHANNEL = 0
+    BLOCK_FRAMES = 2048
+    POLL_INTERVAL = 0.005
+
+    def __init__(self):
+        self.source = None
+        self.processors = []  # Etapas DSP: función(bloque int16) -> bloque int16
+        self._lock = threading.RLock()
+        self._thread = None
+        self._running = False
+        self._active = False  # Hay una reproducción en curso (aunque esté en pausa)
+        self._paused = False
+        self._volume = 1.0
+        self._channel = None
+        self._cursor = 0  # Siguiente frame de la fuente a enviar
+        self._inflight = deque()  # [Sound, frame inicial, frames, datos] en el canal
+        self._played = None  # Último bloque ya reproducido (para el visualizador)
+        self._block_started = 0.0
+        self._paused_at = 0.0
+        self.block_frames = StreamOutput.BLOCK_FRAMES  # Nunca menor que el búfer del dispositivo
+        self.underruns = 0  # Veces que el canal se quedó sin audio con la fuente sin terminar
+        self.speed = 1.0
+        self._stretcher = None  # TimeStretcher mientras la velocidad no es 1
+
+    @staticmethod
+    def supports(source):
+        """Indica si la fuente puede enviarse sin remuestrear al mezclador actual"""
+        init = pygame.mixer.get_init()
+        return init is not None and init[1] == -16 and source.rate == init[0]
+
+    def load(self, source):
+        self.stop()
+        if self.source is not None and self.source is not source:
+            self.source.close()
+        self.source = source
+
+    def play(self, start=0):
+        """Empieza (o salta) a start segundos"""
+        with self._lock:
+            if self._channel is None:
+                pygame.mixer.set_reserved(StreamOutput.CHANNEL + 1)
+                self._channel = pygame.mixer.Channel(StreamOutput.CHANNEL)
+            self._channel.stop()
+            self._channel.set_volume(self._volume)
+            self._inflight.clear()
+            self._played = None
+            self._cursor = max(0, min(int(start * self.source.rate), self.source.frames))
+            self._stretcher = None
+            self._active = True
+            self._paused = False
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='StreamOutput', daemon=True)
+            self._thread.start()
+
+    def pause(self):
+        with self._lock:
+            if self._active and not self._paused:
+                self._channel.pause()
+                self._paused = True
+                self._paused_at = time.monotonic()
+
+    def unpause(self):
+        with self._lock:
+            if self._active and self._paused:
+                self._block_started += time.monotonic() - self._paused_at
+                self._channel.unpause()
+                self._paused = False
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        with self._lock:
+            if self._channel is not None:
+                self._channel.stop()
+            self._channel = None  # pygame.mixer puede reiniciarse después de parar
+            self._inflight.clear()
+            self._played = None
+            self._active = False
+            self._paused = False
+
+    def unload(self):
+        self.stop()
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def get_busy(self):
+        return self._active and not self._paused
+
+    def set_speed(self, speed):
+        """Cambia la velocidad en vivo: afecta al siguiente bloque que se envíe"""
+        with self._lock:
+            if speed == self.speed:
+                return
+            if self._stretcher is not None:
+                self._cursor = self._stretcher.position()  # Lo que el estirador tenía leído se vuelve a leer
+                self._stretcher = None
+            self.speed = speed
+
+    def set_volume(self, volume):
+        self._volume = volume
+        with self._lock:
+            if self._channel is not None:
+                self._channel.set_volume(volume)
+
+    def position(self):
+        """Posición en segundos del audio que está sonando"""
+        with self._lock:
+            if self.source is None:
+                return 0.0
+            if not self._inflight:
+                return self._cursor / self.source.rate
+            _, start, frames, _, speed = self._inflight[0]
+            now = self._paused_at if self._paused else time.monotonic()
+            played = min(frames, int((now - self._block_started) * self.source.rate))
+            return (start + max(0, played) * speed) / self.source.rate
+
+    def stats(self):
+        """Subejecuciones y frames en cola por delante de lo que está sonando"""
+        with self._lock:
+            rate = self.source.rate if self.source is not None else 0
+            queued = 0
+            if self._inflight and rate:
+                now = self._paused_at if self._paused else time.monotonic()
+                played = min(self._inflight[0][2], int((now - self._block_started) * rate))
+                queued = sum(block[2] for block in self._inflight) - max(0, played)
+            return {'underruns': self.underruns, 'queued_frames': queued,
+                    'capacity_frames': 2 * self.block_frames, 'rate': rate}
+
+    def pcm_window(self, frames):
+        """Últimas muestras enviadas a la salida (frames x canales) o None"""
+        with self._lock:
+            if not self._inflight or self.source is None:
+                return None
+            _, _, block_frames, data, _ = self._inflight[0]
+            elapsed = int((time.monotonic() - self._block_started) * self.source.rate)
+            end = max(1, min(block_frames, elapsed))
+            if end >= frames or self._played is None:
+                return data[max(0, end - frames):end]
+            return np.concatenate((self._played[len(self._played) - (frames - end):], data[:end]))
+
+    def _run(self):
+        while self._running:
+            with self._lock:
+                if self._active and not self._paused:
+                    self._pump()
+            time.sleep(StreamOutput.POLL_INTERVAL)
+
+    def _pump(self):
+        """Avanza el estado del canal y deja siempre un bloque en cola"""
+        channel = self._channel
+        # Detectar el paso al bloque encolado
+        if len(self._inflight) > 1 and channel.get_sound() is self._inflight[1][0]:
+            self._played = self._inflight.popleft()[3]
+            self._block_started = time.monotonic()
+        if self._inflight and not channel.get_busy():
+            if self._cursor < self.source.frames:
+                self.underruns += 1  # El hilo no llegó a encolar el siguiente bloque a tiempo
+            self._played = self._inflight.popleft()[3]
+            self._inflight.clear()
+
+        if channel.get_queue() is None and len(self._inflight) < 2:
+            block = self._next_block()
+            if block is not None:
+                sound = pygame.mixer.Sound(buffer=block[3])
+                if channel.get_busy():
+                    channel.queue(sound)
+                else:
+                    channel.play(sound)
+                    self._block_started = time.monotonic()
+                block[0] = sound
+                self._inflight.append(block)
+            elif not self._inflight:
+                self._active = False  # Fin de la fuente
+
+    def _next_block(self):
+        if self._cursor >= self.source.frames:
+            return None
+        if self.speed == 1.0:
+            start = self._cursor
+            data = self.source.read_int16(start, self.block_frames)
+            self._cursor += len(data)
+        else:
+            start, data = self._stretch_block()
+            if not len(data):
+                return None
+        data = self._adapt_channels(data)
+        for processor in self.processors:
+            data = processor(data)
+        return [None, start, len(data), np.ascontiguousarray(data), self.speed]
+
+    def _stretch_block(self):
+        """Lee de la fuente hasta tener un bloque de salida estirado a la velocidad actual"""
+        if self._stretcher is None:
+            self._stretcher = TimeStretcher(self.source.channels, self.source.rate, self._cursor, self.speed)
+        start = self._stretcher.position()
+        pieces = []
+        produced = 0
+        while produced < self.block_frames and self._cursor < self.source.frames:
+            data = self.source.read_int16(self._cursor, self.block_frames)
+            if not len(data):
+                break
+            self._cursor += len(data)
+            pieces.append(self._stretcher.process(data))
+            produced += len(pieces[-1])
+        if not pieces:
+            return start, np.zeros((0, self.source.channels), np.int16)
+        return start, np.concatenate(pieces)
+
+    def _adapt_channels(self, data):
+        """Ajusta el número de canales al del mezclador"""
+        out_channels = pygame.mixer.get_init()[2]
+        channels = data.shape[1]
+        if channels == out_channels:
+            return data
+        if channels == 1:
+            return np.repeat(data, out_channels, axis=1)
+        if out_channels == 1:
+            return data.mean(axis=1, dtype=np.float32).astype(np.int16).reshape(-1, 1)
+        # Multicanal a estéreo: canales pares a la izquierda, impares a la derecha
+        left = data[:, 0::2].mean(axis=1, dtype=np.float32)
+        right = data[:, 1::2].mean(axis=1, dtype=np.float32)
+        mixed = np.stack((left, right), axis=1).astype(np.int16)
+        if out_channels > 2:
+            mixed = np.concatenate((mixed, np.zeros((len(mixed), out_channels - 2), np.int16)), axis=1)
+        return mixed
+
+class NetworkStream(QThread):
+    """Descarga una URL HTTP(S) o Icecast/Shoutcast en segundo plano hacia un búfer de lectura anticipada.
+
+    Habla HTTP/1.0 directamente sobre el socket porque Shoutcast responde con la línea
+    de estado «ICY 200 OK», que http.client rechaza. Los metadatos ICY que llegan cada
+    icy-metaint bytes se separan del audio y el título se emite con title_changed. Si la
+    conexión se corta o deja de recibir datos, vuelve a conectar con espera creciente
+    (con Range si es un archivo de tamaño conocido) sin tocar el hilo de la interfaz.
+    """
+    ready = pyqtSignal()  # Ya hay audio suficiente por delante para (re)empezar
+    stalled = pyqtSignal()  # El decodificador se quedó sin datos
+    reconnected = pyqtSignal()
+    title_changed = pyqtSignal(str)
+    status = pyqtSignal(str)
+
+    CHUNK = 16384
+    STALL_TIMEOUT = 5.0  # Segundos sin datos antes de dar la conexión por perdida
+    READ_WAIT = 0.1  # Lo máximo que el hilo de audio espera datos antes de declarar un corte
+    KEEP_BEHIND = 65536  # Bytes ya leídos que se conservan para los saltos atrás del decodificador
+    MAX_REDIRECTS = 5
+    MAX_FAILURES = 3  # Intentos seguidos sin recibir nada antes de rendirse
+    LIVE_SIZE = (1 << 31) - 1  # Tamaño que se anuncia a SDL para una emisión sin fin
+    ICY_TITLE = re.compile(r"StreamTitle='(.*?)';", re.S)
+
+    def __init__(self, url, read_ahead, parent=None):
+        super().__init__(parent)
+        self.url = url
+        self.read_ahead = read_ahead
+        self.prebuffer = max(NetworkStream.CHUNK, read_ahead // 4)
+        self._cond = threading.Condition()
+        self._data = bytearray()
+        self._base = 0  # Posición en el flujo de _data[0]
+        self._socket = None
+        self._closed = False
+        self._want_ready = False
+        self.received = 0  # Bytes de audio recibidos: posición del final del búfer
+        self.consumed = 0  # Hasta dónde ha leído el decodificador
+        self.length = None  # Content-Length si es un archivo de tamaño conocido
+        self.live = False  # Emisión Icecast/Shoutcast: un corte se arregla reconectando
+        self.content_type = ''
+        self.name = ''
+        self.title = ''
+        self.complete = False  # Se recibió el archivo entero
+        self.failed = False
+        self.starving = False  # El lector se quedó sin datos y espera a ready
+        self.reconnects = 0
+
+    def close(self):
+        """Detiene la descarga sin esperar al hilo; cerrar el socket desbloquea la lectura"""
+        with self._cond:
+            self._closed = True
+            sock = self._socket
+            self._cond.notify_all()
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def wait_ready(self):
+        """Pide la señal ready en cuanto haya prebuffer bytes sin leer (o el archivo esté completo)"""
+        with self._cond:
+            self.starving = False
+            ready = self.complete or self.received - self.consumed >= self.prebuffer
+            self._want_ready = not ready
+        if ready:
+            self.ready.emit()
+
+    def reader(self):
+        """Archivo para pygame.mixer.music que empieza en lo que aún no se ha leído"""
+        return StreamReader(self, self.consumed)
+
+    def namehint(self):
+        """Formato para SDL según el Content-Type o la extensión de la URL"""
+        kind = self.content_type.split(';')[0].strip().lower()
+        hint = {'audio/mpeg': 'mp3', 'audio/mp3': 'mp3', 'audio/ogg': 'ogg', 'application/ogg': 'ogg',
+                'audio/flac': 'flac', 'audio/x-flac': 'flac', 'audio/wav': 'wav', 'audio/x-wav': 'wav',
+                'audio/wave': 'wav'}.get(kind)
+        if hint is None:
+            extension = os.path.splitext(urllib.parse.urlsplit(self.url).path)[1].lower()
+            hint = extension[1:] if extension in ('.mp3', '.ogg', '.flac', '.wav') else 'mp3'
+        return hint
+
+    def run(self):
+        failures = 0
+        delay = 0.5
+        while not self._closed:
+            received = self.received
+            try:
+                self._download()
+            except (OSError, ValueError) as e:
+                if not self._closed:
+                    print(f"Error en el flujo {self.url}: {e}")  # Debug
+            if self._closed or self.complete:
+                break
+            if self.received > received:
+                failures, delay = 0, 0.5
+            else:
+                failures += 1
+                if self.received == 0 and failures >= NetworkStream.MAX_FAILURES:
+                    self.failed = True
+                    self.status.emit("No se pudo conectar con la emisión")
+                    break
+            self.reconnects += 1
+            self.status.emit(f"Reconectando ({self.reconnects})...")
+            with self._cond:
+                self._cond.wait(delay)
+            delay = min(delay * 2, 10.0)
+        with self._cond:
+            self._cond.notify_all()  # Despierta al lector si esperaba datos
+
+    def _download(self):
+        resume = self.received if self.length is not None else 0
+        sock, fp, headers, partial = self._connect(resume)
+        if self.reconnects:
+            self.reconnected.emit()
+        try:
+            if self.received == 0:
+                self.live = any(key.startswith('icy-') for key in headers)
+                length = headers.get('content-length', '')
+                self.length = int(length) if length.isdigit() and not self.live else None
+                self.content_type = headers.get('content-type', '')
+                self.name = headers.get('icy-name', '')
+                if self.name and not self.title:
+                    self.title_changed.emit(self.name)
+            metaint = int(headers.get('icy-metaint', '0') or 0)
+            skip = resume if resume and not partial else 0  # El servidor ignoró el Range
+            until_meta = metaint
+            while True:
+                with self._cond:
+                    while not self._closed and self.received - self.consumed >= self.read_ahead:
+                        self._cond.wait(0.5)
+                    if self._closed:
+                        return
+                chunk = fp.read1(min(NetworkStream.CHUNK, until_meta) if metaint else NetworkStream.CHUNK)
+                if not chunk:
+                    if not self.live and (self.length is None or self.received >= self.length):
+                        self._store(b'', complete=True)
+                    return
+                if metaint:
+                    until_meta -= len(chunk)
+                    if until_meta == 0:
+                        self._read_metadata(fp)
+                        until_meta = metaint
+                if skip:
+                    dropped = min(skip, len(chunk))
+                    chunk, skip = chunk[dropped:], skip - dropped
+                if chunk:
+                    self._store(chunk)
+                    if self.complete:
+                        return
+        finally:
+            with self._cond:
+                self._socket = None
+            fp.close()
+            sock.close()
+
+    def _connect(self, offset):
+        """Abre la conexión siguiendo redirecciones; devuelve (socket, archivo, cabeceras, parcial)"""
+        url = self.url
+        for _ in range(NetworkStream.MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            secure = parts.scheme.lower() == 'https'
+            if not parts.hostname:
+                raise ValueError(f"URL sin servidor: {url}")
+            sock = socket.create_connection((parts.hostname, parts.port or (443 if secure else 80)),
+                                            timeout=NetworkStream.STALL_TIMEOUT)
+            if secure:
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+            with self._cond:
+                if self._closed:
+                    sock.close()
+                    raise ConnectionAbortedError("Flujo cerrado")
+                self._socket = sock
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            lines = [f"GET {path} HTTP/1.0", f"Host: {parts.netloc.rpartition('@')[2]}",
+                     "User-Agent: HeroMusicPlayer", "Accept: */*", "Icy-MetaData: 1"]
+            if offset:
+                lines.append(f"Range: bytes={offset}-")
+            sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+            fp = sock.makefile('rb')
+            status = fp.readline(1024).decode('latin-1').split(None, 2)
+            if len(status) < 2 or not status[0].startswith(('HTTP/', 'ICY')) or not status[1].isdigit():
+                fp.close()
+                sock.close()
+                raise ValueError(f"Respuesta no válida de {url}")
+            code = int(status[1])
+            headers = {}
+            while True:
+                line = fp.readline(8192).decode('latin-1').strip()
+                if not line:
+                    break
+                key, _, value = line.partition(':')
+                headers[key.strip().lower()] = value.strip()
+            if code in (200, 206):
+                return sock, fp, headers, code == 206
+            fp.close()
+            sock.close()
+            if code in (301, 302, 303, 307, 308) and 'location' in headers:
+                url = urllib.parse.urljoin(url, headers['location'])
+                continue
+            raise OSError(f"HTTP {code} en {url}")
+        raise OSError(f"Demasiadas redirecciones en {self.url}")
+
+    def _read_metadata(self, fp):
+        size = fp.read(1)
+        if not size:
+            raise ConnectionError("Conexión cerrada en los metadatos ICY")
+        meta = fp.read(size[0] * 16).rstrip(b'\0') if size[0] else b''
+        if not meta:
+            return
+        try:
+            text = meta.decode('utf-8')
+        except UnicodeDecodeError:
+            text = meta.decode('latin-1')  # Muchos servidores antiguos no usan UTF-8
+        match = NetworkStream.ICY_TITLE.search(text)
+        if match and match.group(1) and match.group(1) != self.title:
+            self.title = match.group(1)
+            self.title_changed.emit(self.title)
+
+    def _store(self, chunk, complete=False):
+        with self._cond:
+            self._data += chunk
+            self.received += len(chunk)
+            self.complete = complete or (self.length is not None and self.received >= self.length)
+            keep = self.consumed - NetworkStream.KEEP_BEHIND
+            if keep - self._base >= NetworkStream.KEEP_BEHIND:  # Recorta por tramos, no en cada bloque
+                del self._data[:keep - self._base]
+                self._base = keep
+            ready = self._want_ready and (self.complete or self.received - self.consumed >= self.prebuffer)
+            if ready:
+                self._want_ready = False
+            self._cond.notify_all()
+        if ready:
+            self.ready.emit()
+
+class StreamReader(io.RawIOBase):
+    """Archivo de solo lectura sobre el búfer de NetworkStream para pygame.mixer.music.
+
+    SDL necesita poder saltar: al cargar mide el tamaño y busca etiquetas al final, y el
+    decodificador retrocede unos bytes al sincronizar tramas. Lo que cae muy por delante
+    de lo descargado (las etiquetas del final de una emisión sin fin) se responde con
+    ceros, y si el búfer se vacía la lectura devuelve 0 bytes tras READ_WAIT: el hilo de
+    audio nunca se queda bloqueado esperando a la red.
+    """
+
+    def __init__(self, stream, start):
+        super().__init__()
+        self.stream = stream
+        self.start = start
+        self.size = stream.length - start if stream.length is not None else NetworkStream.LIVE_SIZE
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.pos = max(0, offset)
+        return self.pos
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self.size - self.pos)
+        if count <= 0:
+            return 0
+        stream = self.stream
+        position = self.start + self.pos
+        with stream._cond:
+            if position >= stream.received + stream.read_ahead or position < stream._base:
+                buffer[:count] = bytes(count)  # Sondeo de etiquetas lejos del audio
+                self.pos += count
+                return count
+            # Solo se entregan lecturas completas: pygame convierte una lectura corta en fin de archivo
+            deadline = time.monotonic() + NetworkStream.READ_WAIT
+            while (stream.received - position < count and not stream.complete and not stream.failed
+                   and not stream._closed):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                stream._cond.wait(remaining)
+            available = stream.received - position
+            if available >= count or (stream.complete and available > 0):
+                count = min(count, available)
+                offset = position - stream._base
+                buffer[:count] = stream._data[offset:offset + count]
+                self.pos += count
+                stream.consumed = position + count
+                stream._cond.notify_all()  # El hilo de descarga puede tener sitio otra vez
+                return count
+            if stream.complete or stream._closed:
+                return 0
+            stream.starving = True
+        stream.stalled.emit()
+        return 0
+
+class NetworkOutput(QObject):
+    """Salida para URLs: NetworkStream descarga y pygame.mixer.music decodifica desde su búfer.
+
+    Mientras se llena el búfer (al empezar o tras un corte) get_busy sigue siendo verdadero
+    para que la cola no avance; el audio se retoma en cuanto vuelve a haber prebuffer bytes.
+    """
+    status_changed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.read_ahead = 256 * 1024
+        self.url = None
+        self.stream = None
+        self._buffering = False
+        self._paused = False
+        self._played = 0.0  # Segundos reproducidos antes del tramo actual
+        self._started = None  # Inicio (monotonic) del tramo que suena
+
+    def load(self, url):
+        self.stop()
+        self.url = url
+
+    def play(self, start=0):
+        """Conecta y arranca en cuanto hay búfer (una emisión no admite saltos: start se ignora)"""
+        self.stop()
+        self._played = 0.0
+        stream = self.stream = NetworkStream(self.url, self.read_ahead, self)
+        stream.ready.connect(self._on_ready)
+        stream.stalled.connect(self._on_stalled)
+        stream.title_changed.connect(self.status_changed.emit)
+        stream.status.connect(self.status_changed.emit)
+        stream.reconnected.connect(self._on_reconnected)
+        stream.finished.connect(stream.deleteLater)
+        self._buffering = True
+        self.status_changed.emit("Conectando...")
+        stream.start()
+        stream.wait_ready()
+
+    def _on_ready(self):
+        if self.sender() is not self.stream or not self._buffering or self._paused:
+            return
+        self._buffering = False
+        try:
+            pygame.mixer.music.load(self.stream.reader(), self.stream.namehint())
+            pygame.mixer.music.play()
+        except pygame.error as e:
+            print(f"No se pudo decodificar {self.url}: {e}")  # Debug
+            self.stream.failed = True
+            self.stream.close()
+            self.status_changed.emit("Formato de emisión no admitido")
+            return
+        self._started = time.monotonic()
+        self.status_changed.emit(self.stream.title or self.stream.name or self.url)
+
+    def _on_reconnected(self):
+        if self.sender() is self.stream and not self._buffering:
+            self.status_changed.emit(self.stream.title or self.stream.name or self.url)
+
+    def _on_stalled(self):
+        if self.sender() is not self.stream or self._buffering:
+            return
+        self._stop_clock()
+        self._buffering = True
+        pygame.mixer.music.stop()
+        self.status_changed.emit("Almacenando en búfer...")
+        self.stream.wait_ready()
+
+    def _stop_clock(self):
+        if self._started is not None:
+            self._played += time.monotonic() - self._started
+            self._started = None
+
+    def pause(self):
+        if self.stream is not None and not self._paused:
+            self._paused = True
+            if not self._buffering:
+                self._stop_clock()
+                pygame.mixer.music.pause()
+
+    def unpause(self):
+        if self.stream is not None and self._paused:
+            self._paused = False
+            if self._buffering:
+                self.stream.wait_ready()
+            else:
+                pygame.mixer.music.unpause()
+                self._started = time.monotonic()
+
+    def stop(self):
+        if self.stream is not None:
+            pygame.mixer.music.stop()
+            pygame.mixer.music.unload()  # Suelta el lector antes de cerrar el flujo
+            self.stream.close()
+            self.stream = None
+        self._buffering = False
+        self._paused = False
+        self._started = None
+
+    def unload(self):
+        self.stop()
+        self.url = None
+
+    def shutdown(self):
+        """Cierra y espera todas las descargas (al salir de la aplicación)"""
+        self.unload()
+        for stream in self.findChildren(NetworkStream):
+            stream.close()
+            stream.wait(2000)
+
+    def get_busy(self):
+        stream = self.stream
+        if stream is None or self._paused or stream.failed:
+            return False
+        # Primero SDL: espera a que el hilo de audio suelte el lector, que marca starving antes
+        playing = pygame.mixer.music.get_busy()
+        return playing or self._buffering or stream.starving
+
+    def position(self):
+        if self._started is None:
+            return self._played
+        return self._played + time.monotonic() - self._started
+
+    def set_volume(self, volume):
+        pygame.mixer.music.set_volume(volume)
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav')
+STREAM_SCHEMES = ('http://', 'https://')
+
+def is_stream_url(path):
+    """Indica si la entrada de la lista es una emisión o archivo remoto (HTTP/Icecast)"""
+    return path.lower().startswith(STREAM_SCHEMES)
+
+def is_playable(path):
+    return is_stream_url(path) or path.lower().endswith(AUDIO_EXTENSIONS + ('.cue',))
+
+def url_to_entry(url):
+    """Entrada de la lista para un QUrl soltado: ruta local o la URL tal cual"""
+    return url.toLocalFile() if url.isLocalFile() else url.toString()
+
+def native_sample_rate(path):
+    """Frecuencia de muestreo original del archivo (0 si no se puede leer)"""
+    try:
+        audio = mutagen.File(path)
+    except Exception as e:  # mutagen lanza errores variados con archivos dañados
+        print(f"Error al leer la frecuencia de {path}: {e}")  # Debug
+        return 0
+    return int(getattr(getattr(audio, 'info', None), 'sample_rate', 0) or 0)
+
+def read_track_info(path):
+    """Lee duración, bitrate y etiquetas básicas de un archivo de audio"""
+    info = {'title': '', 'artist': '', 'album': '', 'genre': '', 'duration': 0.0, 'bitrate': 0}
+    if is_stream_url(path):
+        parts = urllib.parse.urlsplit(path)
+        info['title'] = (parts.hostname or '') + parts.path.rstrip('/')  # Sin red al agregarla
+        return info
+    try:
+        audio = mutagen.File(path, easy=True)
+    except Exception as e:  # mutagen lanza errores variados con archivos dañados
+        print(f"Error al leer etiquetas de {path}: {e}")  # Debug
+        return info
+    if audio is None:
+        return info
+    info['duration'] = float(getattr(audio.info, 'length', 0) or 0)
+    info['bitrate'] = int(getattr(audio.info, 'bitrate', 0) or 0)
+    for key, frame in (('title', 'TIT2'), ('artist', 'TPE1'), ('album', 'TALB'), ('genre', 'TCON')):
+        try:
+            values = audio.get(key) or audio.get(frame)
+        except (KeyError, ValueError):
+            values = None
+        if values:
+            info[key] = str(values[0]) if isinstance(values, list) else str(values)
+    return info
+
+CUE_TRACK_KEY = re.compile(r'^(.+\.cue)#(\d+)$', re.IGNORECASE)
+CUE_FRAMES = 75  # Los INDEX de una hoja CUE van en mm:ss:ff, con 75 cuadros por segundo
+CUE_STAMP = re.compile(r'^(\d+):(\d{1,2}):(\d{1,2})$')
+
+def cue_track_key(cue_path, number):
+    """Entrada de la lista de una pista virtual: la hoja CUE y el número de pista"""
+    return f"{cue_path}#{number:02d}"
+
+def split_cue_track_key(path):
+    """(hoja CUE, número) de una pista virtual, o None si la entrada es un archivo o una URL"""
+    match = CUE_TRACK_KEY.match(path)
+    if match is None or is_stream_url(path):
+        return None
+    return match.group(1), int(match.group(2))
+
+class CueTrack:
+    """Pista virtual de una hoja CUE: el tramo [start, end) de un archivo de audio"""
+    __slots__ = ('key', 'number', 'audio', 'start', 'end', 'title', 'artist', 'album', 'genre', 'bitrate')
+
+    def __init__(self, key, number, audio, start):
+        self.key = key
+        self.number = number
+        self.audio = audio
+        self.start = start
+        self.end = start
+        self.title = self.artist = self.album = self.genre = ''
+        self.bitrate = 0
+
+    def info(self):
+        """Datos con el formato de read_track_info para el registro de la lista"""
+        return {'title': self.title or f"Pista {self.number:02d}", 'artist': self.artist,
+                'album': self.album, 'genre': self.genre, 'duration': self.end - self.start,
+                'bitrate': self.bitrate}
+
+def resolve_cue_audio(base, name):
+    """Archivo de audio de una línea FILE; si no existe, el del mismo nombre con otra extensión"""
+    path = os.path.join(base, name.replace('\\', '/'))
+    if path.lower().endswith(AUDIO_EXTENSIONS) and os.path.exists(path):
+        return path
+    stem = os.path.splitext(path)[0]
+    for extension in AUDIO_EXTENSIONS:
+        if os.path.exists(stem + extension):
+            return stem + extension
+    return None
+
+def cue_value(text):
+    """Valor de un comando CUE, entre comillas o no"""
+    text = text.strip()
+    if text.startswith('"') and text.rfind('"') > 0:
+        return text[1:text.rfind('"')]
+    return text
+
+def parse_cue_sheet(path):
+    """Lee una hoja CUE y devuelve sus pistas (CueTrack) con los tramos ya resueltos.
+
+    Cada pista acaba en el INDEX 01 de la siguiente del mismo archivo, así las
+    contiguas no dejan huecos entre sí; la última acaba con el archivo. Las líneas
+    mal formadas se ignoran (un TRACK sin número deja sin pista lo que le sigue).
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = raw.decode('cp1252', errors='replace')  # Hojas antiguas generadas en Windows
+    base = os.path.dirname(path)
+    album = {'title': '', 'artist': '', 'genre': ''}
+    tracks = []
+    audio = None
+    number = None
+    pending = {}  # TITLE y PERFORMER de la pista abierta, que pueden ir antes o después del INDEX
+    for line in text.splitlines():
+        command, _, rest = line.strip().partition(' ')
+        command = command.upper()
+        if command == 'FILE':
+            parts = rest.split()
+            name = cue_value(rest) if rest.strip().startswith('"') else ' '.join(parts[:-1] or parts)
+            audio = resolve_cue_audio(base, name) if name else None
+            number = None
+        elif command == 'TRACK':
+            parts = rest.split()
+            number = int(parts[0]) if parts and parts[0].isdigit() else None
+            pending = {}
+        elif command in ('TITLE', 'PERFORMER'):
+            field = 'title' if command == 'TITLE' else 'artist'
+            if number is None:
+                album[field] = cue_value(rest)
+            else:
+                pending[field] = cue_value(rest)
+                if tracks and tracks[-1].number == number:
+                    setattr(tracks[-1], field, pending[field])
+        elif command == 'REM' and rest.upper().startswith('GENRE '):
+            album['genre'] = cue_value(rest[6:])
+        elif command == 'INDEX' and number is not None and audio is not None:
+            parts = rest.split()
+            stamp = CUE_STAMP.match(parts[1]) if len(parts) >= 2 and parts[0].isdigit() and int(parts[0]) == 1 else None
+            if stamp is None or (tracks and tracks[-1].number == number and tracks[-1].audio == audio):
+                continue  # INDEX 00 (pausa previa), repetido o sin posición válida
+            minutes, seconds, frames = (int(part) for part in stamp.groups())
+            track = CueTrack(cue_track_key(path, number), number, audio,
+                             minutes * 60 + seconds + frames / CUE_FRAMES)
+            track.title = pending.get('title', '')
+            track.artist = pending.get('artist', '')
+            tracks.append(track)
+    lengths = {}
+    for i, track in enumerate(tracks):
+        if track.audio not in lengths:
+            info = read_track_info(track.audio)
+            lengths[track.audio] = (info['duration'], info['bitrate'])
+        duration, track.bitrate = lengths[track.audio]
+        following = tracks[i + 1] if i + 1 < len(tracks) else None
+        track.end = following.start if following is not None and following.audio == track.audio else duration
+        track.artist = track.artist or album['artist']
+        track.album = album['title']
+        track.genre = album['genre']
+    return [track for track in tracks if track.end > track.start]
+
+class CueIndex:
+    """Hojas CUE ya leídas, por ruta y validadas por su fecha de modificación.
+
+    Arrancar una pista virtual o pasar a la siguiente solo cuesta un stat de la hoja
+    y una consulta al diccionario: ni la hoja ni el archivo de audio se vuelven a leer.
+    """
+
+    def __init__(self):
+        self._sheets = {}  # ruta de la hoja -> (mtime_ns, {número: CueTrack})
+
+    def tracks(self, cue_path):
+        """Pistas de la hoja en orden; solo se vuelve a leer si cambió"""
+        try:
+            mtime = os.stat(cue_path).st_mtime_ns
+        except OSError:
+            self._sheets.pop(cue_path, None)
+            return []
+        cached = self._sheets.get(cue_path)
+        if cached is None or cached[0] != mtime:
+            try:
+                sheet = parse_cue_sheet(cue_path)
+            except (OSError, ValueError, IndexError) as e:
+                print(f"Error al leer la hoja CUE {cue_path}: {e}")  # Debug
+                sheet = []
+            cached = self._sheets[cue_path] = (mtime, {track.number: track for track in sheet})
+        return list(cached[1].values())
+
+    def locate(self, path):
+        """CueTrack de una entrada de la lista, o None si no es una pista virtual"""
+        parts = split_cue_track_key(path)
+        if parts is None:
+            return None
+        self.tracks(parts[0])
+        cached = self._sheets.get(parts[0])
+        return cached[1].get(parts[1]) if cached is not None else None
+
+PLAYLIST_COLUMNS = ("Título", "Artista", "Álbum", "Duración", "Bitrate", "Ruta")
+DIGIT_RUNS = re.compile(r'(\d+)')
+
+def natural_sort_key(text):
+    """Clave de orden natural según el idioma: 'Pista 2' va antes que 'Pista 10'"""
+    # re.split con grupo alterna texto y números, así cada posición compara siempre el mismo tipo
+    parts = DIGIT_RUNS.split(text.casefold())
+    return tuple(int(part) if i % 2 else locale.strxfrm(part) for i, part in enumerate(parts))
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+class Track:
+    """Registro compacto de una pista de la lista.
+
+    La ruta es la clave que comparten la lista, la cola y el índice de búsqueda,
+    así que se guarda una sola vez; artista y álbum se internan porque se repiten.
+    """
+    __slots__ = ('path', 'title', 'artist', 'album', 'duration', 'bitrate', 'sort_keys')
+
+    def __init__(self, path, info):
+        self.path = path
+        self.sort_keys = None  # Claves de orden por columna, se calculan al ordenar
+        self.set_info(info)
+
+    def set_info(self, info):
+        self.title = info['title'] or os.path.splitext(os.path.basename(self.path))[0]
+        self.artist = sys.intern(info['artist'])
+        self.album = sys.intern(info['album'])
+        self.duration = info['duration']
+        self.bitrate = info['bitrate']
+        self.sort_keys = None
+
+    def column_text(self, column):
+        if column == 0:
+            return self.title
+        if column == 1:
+            return self.artist
+        if column == 2:
+            return self.album
+        if column == 3:
+            return format_duration(self.duration) if self.duration else ''
+        if column == 4:
+            return f"{self.bitrate // 1000} kbps" if self.bitrate else ''
+        return self.path
+
+class TrackStore:
+    """Registros de las pistas de la lista indexados por ruta; lo comparten la tabla y el motor"""
+
+    def __init__(self):
+        self._tracks = {}
+        self._shared_keys = {}  # Claves de orden de artistas y álbumes, que se repiten
+
+    def __contains__(self, path):
+        return path in self._tracks
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __getitem__(self, path):
+        return self._tracks[path]
+
+    def get(self, path):
+        return self._tracks.get(path)
+
+    def add(self, path, info):
+        track = self._tracks.get(path)
+        if track is None:
+            track = self._tracks[path] = Track(path, info)
+        else:
+            track.set_info(info)
+        return track
+
+    def put(self, track):
+        """Vuelve a guardar un registro quitado antes (deshacer)"""
+        self._tracks[track.path] = track
+
+    def remove(self, path):
+        return self._tracks.pop(path, None)
+
+    def sort_key(self, track, column):
+        """Clave de orden de una columna, calculada una sola vez por pista"""
+        if column == 3:
+            return track.duration
+        if column == 4:
+            return track.bitrate
+        keys = track.sort_keys
+        if keys is None:
+            keys = track.sort_keys = [None, None, None, None, None, None]
+        key = keys[column]
+        if key is None:
+            if column in (1, 2):
+                text = track.artist if column == 1 else track.album
+                key = self._shared_keys.get(text)
+                if key is None:
+                    key = self._shared_keys[text] = natural_sort_key(text)
+            else:
+                key = natural_sort_key(track.title if column == 0 else track.path)
+            keys[column] = key
+        return key
+
+    def memory_usage(self):
+        """Bytes aproximados de los registros (ruta, etiquetas y claves incluidas) y bytes por pista"""
+        seen = set()
+        total = sys.getsizeof(self._tracks)
+
+        def size(obj):
+            if id(obj) in seen:
+                return 0
+            seen.add(id(obj))
+            if isinstance(obj, (tuple, list)):
+                return sys.getsizeof(obj) + sum(size(item) for item in obj)
+            return sys.getsizeof(obj)
+
+        for track in self._tracks.values():
+            total += sys.getsizeof(track) + size(track.path) + size(track.title)
+            total += size(track.artist) + size(track.album)
+            if track.sort_keys is not None:
+                total += size(track.sort_keys)
+        return total, total // max(1, len(self._tracks))
+
+class MusicLibrary:
+    """Biblioteca de música persistente en SQLite (library.db junto a setting.json)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY, parent TEXT, root TEXT, mtime_ns INTEGER);
+        CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+        CREATE TABLE IF NOT EXISTS tracks (
+            path TEXT PRIMARY KEY, dir TEXT, size INTEGER, mtime_ns INTEGER,
+            title TEXT, artist TEXT, album TEXT, duration REAL, bitrate INTEGER,
+            genre TEXT, added INTEGER);
+        CREATE INDEX IF NOT EXISTS tracks_dir ON tracks(dir);
+        CREATE TABLE IF NOT EXISTS silence (
+            path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,
+            sound_start REAL, sound_end REAL, duration REAL, gaps TEXT);
+        CREATE TABLE IF NOT EXISTS history_tracks (id INTEGER PRIMARY KEY, path TEXT UNIQUE);
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY, track INTEGER, time INTEGER, event INTEGER, position REAL);
+        CREATE INDEX IF NOT EXISTS history_time ON history(time);
+        CREATE TABLE IF NOT EXISTS play_stats (
+            track INTEGER PRIMARY KEY, starts INTEGER, finishes INTEGER, skips INTEGER, last_played INTEGER);
+        CREATE INDEX IF NOT EXISTS play_stats_starts ON play_stats(starts);
+        CREATE INDEX IF NOT EXISTS play_stats_last ON play_stats(last_played);
+        CREATE INDEX IF NOT EXISTS play_stats_skip_rate ON play_stats(skips * 1.0 / starts);
+        CREATE TABLE IF NOT EXISTS smart_playlists (id INTEGER PRIMARY KEY, name TEXT, rules TEXT);
+        CREATE TABLE IF NOT EXISTS smart_members (
+            playlist INTEGER, path TEXT, PRIMARY KEY (playlist, path)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS playlists (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE IF NOT EXISTS playlist_items (
+            playlist INTEGER, position INTEGER, path TEXT, title TEXT, artist TEXT, album TEXT,
+            duration REAL, bitrate INTEGER, PRIMARY KEY (playlist, position)) WITHOUT ROWID;
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_data_path('library.db')
+        self.conn = MusicLibrary.connect(self.db_path)
+
+    @staticmethod
+    def connect(db_path):
+        """Abre una conexión (una por hilo) con WAL para leer mientras se indexa"""
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(MusicLibrary.SCHEMA)
+        if 'genre' not in {row[1] for row in conn.execute("PRAGMA table_info(tracks)")}:
+            # Biblioteca anterior a las listas inteligentes: se agregan las columnas y se fuerza
+            # a releer una vez las etiquetas (size = -1 no coincide con ningún archivo)
+            conn.execute("ALTER TABLE tracks ADD COLUMN genre TEXT")
+            conn.execute("ALTER TABLE tracks ADD COLUMN added INTEGER")
+            conn.execute("UPDATE tracks SET added = mtime_ns / 1000000000, size = -1")
+            conn.execute("UPDATE dirs SET mtime_ns = 0")
+            conn.commit()
+        return conn
+
+    def roots(self):
+        return [row[0] for row in self.conn.execute("SELECT path FROM roots ORDER BY path")]
+
+    def add_root(self, path):
+        self.conn.execute("INSERT OR IGNORE INTO roots VALUES (?)", (os.path.abspath(path),))
+        self.conn.commit()
+
+    def remove_root(self, path):
+        self.conn.execute("DELETE FROM roots WHERE path = ?", (path,))
+        self.conn.commit()
+
+    def track_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def track_paths(self):
+        return [row[0] for row in self.conn.execute("SELECT path FROM tracks ORDER BY path")]
+
+    def track_info(self, path):
+        """Datos indexados de una pista, o None si no está en la biblioteca"""
+        row = self.conn.execute(
+            "SELECT title, artist, album, duration, bitrate FROM tracks WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('title', 'artist', 'album', 'duration', 'bitrate'), row))
+
+    def all_track_info(self):
+        """Diccionario ruta -> datos de todas las pistas, en una sola consulta"""
+        return {row[0]: dict(zip(('title', 'artist', 'album', 'duration', 'bitrate'), row[1:]))
+                for row in self.conn.execute(
+                    "SELECT path, title, artist, album, duration, bitrate FROM tracks")}
+
+    def silence_info(self, path):
+        """Silencios analizados de una pista, o None si faltan o el archivo cambió desde el análisis"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        row = self.conn.execute(
+            "SELECT sound_start, sound_end, duration, gaps FROM silence "
+            "WHERE path = ? AND size = ? AND mtime_ns = ?", (path, st.st_size, st.st_mtime_ns)).fetchone()
+        if row is None:
+            return None
+        return SilenceInfo(row[0], row[1], row[2], [tuple(gap) for gap in json.loads(row[3])])
+
+    # Vistas del historial: cada una recorre un índice de play_stats y se corta en limit
+    # (el + de 'skips' evita que SQLite filtre por el índice de starts y tenga que ordenar)
+    HISTORY_ORDERS = {
+        'plays': "ORDER BY s.starts DESC",
+        'recent': "ORDER BY s.last_played DESC",
+        'skips': "WHERE +s.starts >= 3 ORDER BY s.skips * 1.0 / s.starts DESC",
+    }
+
+    def play_stats(self, order='plays', limit=100):
+        """Filas (ruta, reproducciones, completas, saltadas, última vez) del historial"""
+        return self.conn.execute(
+            "SELECT t.path, s.starts, s.finishes, s.skips, s.last_played FROM play_stats s "
+            "JOIN history_tracks t ON t.id = s.track " + MusicLibrary.HISTORY_ORDERS[order] + " LIMIT ?",
+            (limit,)).fetchall()
+
+    def play_totals(self):
+        """(reproducciones, saltadas) de todo el historial"""
+        row = self.conn.execute("SELECT SUM(starts), SUM(skips) FROM play_stats").fetchone()
+        return row[0] or 0, row[1] or 0
+
+    def directories(self):
+        return [row[0] for row in self.conn.execute("SELECT path FROM dirs")]
+
+    def close(self):
+        self.conn.close()
+
+class LibraryIndexer(QThread):
+    """Mantiene la biblioteca al día en segundo plano.
+
+    La primera vez recorre cada carpeta raíz completa; después solo vuelve a listar
+    las carpetas cuyo mtime cambió (al arrancar) o que QFileSystemWatcher marca como
+    modificadas, así que los archivos sin cambios nunca se vuelven a leer.
+    """
+    status = pyqtSignal(str)
+    tracks_changed = pyqtSignal(list, list)  # rutas nuevas o modificadas, rutas eliminadas
+    dirs_found = pyqtSignal(list)
+    dirs_gone = pyqtSignal(list)
+
+    BATCH_SIZE = 500
+
+    def __init__(self, db_path, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.jobs = queue.Queue()
+        self._added = []
+        self._removed = []
+
+    def enqueue(self, kind, path=None):
+        """Encola un trabajo: 'startup', 'root', 'dir', 'remove_root' o 'full'"""
+        self.jobs.put((kind, path))
+
+    def stop(self):
+        self.jobs.put(None)
+        self.wait()
+
+    def run(self):
+        conn = MusicLibrary.connect(self.db_path)
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                kind, path = job
+                try:
+                    if kind == 'startup':
+                        self._startup(conn)
+                    elif kind == 'full':
+                        for root in self._roots(conn):
+                            self._scan_tree(conn, root, root, force=True)
+                    elif kind == 'root':
+                        self._scan_tree(conn, path, path)
+                    elif kind == 'remove_root':
+                        self._remove_tree(conn, path)
+                    elif kind == 'dir':
+                        root = self._root_of(conn, path)
+                        if root is not None:
+                            self._rescan_dir(conn, root, path)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Error al indexar {path}: {e}")  # Debug
+                conn.commit()
+                self._flush()
+                if self.jobs.empty():
+                    count = conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+                    self.status.emit(f"{count} pistas en la biblioteca")
+        finally:
+            conn.close()
+
+    def _roots(self, conn):
+        return [row[0] for row in conn.execute("SELECT path FROM roots")]
+
+    def _root_of(self, conn, path):
+        row = conn.execute("SELECT root FROM dirs WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def _startup(self, conn):
+        """Compara el mtime de cada carpeta conocida y relista solo las que cambiaron"""
+        known_roots = {row[0] for row in conn.execute("SELECT DISTINCT root FROM dirs")}
+        for root in self._roots(conn):
+            if root not in known_roots:
+                self._scan_tree(conn, root, root)
+        for path, root, mtime_ns in conn.execute("SELECT path, root, mtime_ns FROM dirs").fetchall():
+            try:
+                changed = os.stat(path).st_mtime_ns != mtime_ns
+            except OSError:
+                changed = True
+            if changed:
+                self._rescan_dir(conn, root, path)
+        self.dirs_found.emit([row[0] for row in conn.execute("SELECT path FROM dirs")])
+
+    def _scan_tree(self, conn, root, top, force=False):
+        self.status.emit(f"Indexando {top}...")
+        pending = [top]
+        while pending:
+            path = pending.pop()
+            pending.extend(self._rescan_dir(conn, root, path, force=force, recurse=False))
+        self.dirs_found.emit([row[0] for row in conn.execute(
+            "SELECT path FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (top, top + os.sep, top + chr(ord(os.sep) + 1)))])
+
+    def _rescan_dir(self, conn, root, path, force=False, recurse=True):
+        """Sincroniza una carpeta con la base de datos; devuelve las subcarpetas nuevas"""
+        try:
+            st = os.stat(path)
+            entries = list(os.scandir(path))
+        except OSError:
+            self._remove_tree(conn, path)
+            return []
+
+        known = {row[0]: (row[1], row[2]) for row in conn.execute(
+            "SELECT path, size, mtime_ns FROM tracks WHERE dir = ?", (path,))}
+        known_dirs = {row[0] for row in conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,))}
+        seen = set()
+        seen_dirs = set()
+        new_dirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    seen_dirs.add(entry.path)
+                    if entry.path not in known_dirs or force:
+                        new_dirs.append(entry.path)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    seen.add(entry.path)
+                    est = entry.stat()
+                    if force or known.get(entry.path) != (est.st_size, est.st_mtime_ns):
+                        info = read_track_info(entry.path)
+                        # Al volver a leer una pista se conserva la fecha en que entró a la biblioteca
+                        conn.execute(
+                            "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+                            "dir = excluded.dir, size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                            "title = excluded.title, artist = excluded.artist, album = excluded.album, "
+                            "duration = excluded.duration, bitrate = excluded.bitrate, genre = excluded.genre",
+                            (entry.path, path, est.st_size, est.st_mtime_ns, info['title'], info['artist'],
+                             info['album'], info['duration'], info['bitrate'], info['genre'], int(time.time())))
+                        self._added.append(entry.path)
+            except OSError:
+                continue
+
+        for gone in known.keys() - seen:
+            conn.execute("DELETE FROM tracks WHERE path = ?", (gone,))
+            conn.execute("DELETE FROM silence WHERE path = ?", (gone,))
+            self._removed.append(gone)
+        for gone in known_dirs - seen_dirs:
+            self._remove_tree(conn, gone)
+        conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                     (path, os.path.dirname(path) if path != root else None, root, st.st_mtime_ns))
+
+        if len(self._added) + len(self._removed) >= LibraryIndexer.BATCH_SIZE:
+            conn.commit()
+            self._flush()
+        if recurse:
+            for sub in new_dirs:
+                self._scan_tree(conn, root, sub, force=force)
+        return new_dirs
+
+    def _remove_tree(self, conn, top):
+        """Elimina una carpeta, sus subcarpetas y sus pistas"""
+        # Rango de prefijo: todas las rutas que empiezan por top + separador
+        low, high = top + os.sep, top + chr(ord(os.sep) + 1)
+        self._removed.extend(row[0] for row in conn.execute(
+            "SELECT path FROM tracks WHERE dir = ? OR (dir >= ? AND dir < ?)", (top, low, high)))
+        gone_dirs = [row[0] for row in conn.execute(
+            "SELECT path FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (top, low, high))]
+        conn.execute("DELETE FROM tracks WHERE dir = ? OR (dir >= ? AND dir < ?)", (top, low, high))
+        conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (top, low, high))
+        conn.execute("DELETE FROM silence WHERE path >= ? AND path < ?", (low, high))
+        if gone_dirs:
+            self.dirs_gone.emit(gone_dirs)
+
+    def _flush(self):
+        if self._added or self._removed:
+            self.tracks_changed.emit(self._added, self._removed)
+            self._added = []
+            self._removed = []
+
+class SilenceInfo:
+    """Tramo con sonido de una pista y huecos largos de silencio, en segundos"""
+    __slots__ = ('sound_start', 'sound_end', 'duration', 'gaps')
+
+    def __init__(self, sound_start, sound_end, duration, gaps):
+        self.sound_start = sound_start
+        self.sound_end = sound_end
+        self.duration = duration
+        self.gaps = gaps  # [(inicio, fin), ...] ordenados
+
+    def effective_length(self, skip_gaps=False):
+        length = self.sound_end - self.sound_start
+        if skip_gaps:
+            length -= sum(end - start for start, end in self.gaps)
+        return max(0.0, length)
+
+    def gap_at(self, position, tolerance=0.0):
+        """Fin del hueco que contiene position (o empieza dentro de tolerance), o None"""
+        for start, end in self.gaps:
+            if start - tolerance <= position < end:
+                return end
+        return None
+
+    def next_boundary(self, position, skip_gaps=False):
+        """Siguiente punto en el que hay que saltar o terminar: inicio de hueco o fin del sonido"""
+        if skip_gaps:
+            for start, end in self.gaps:
+                if start > position:
+                    return start
+        return self.sound_end
+
+class SilenceDetector:
+    """Busca silencio al principio, al final y huecos largos con la energía RMS por ventanas.
+
+    Cada bloque se parte en ventanas de WINDOW_SECONDS y se calcula la potencia
+    de todas a la vez; solo se guarda un booleano por ventana, así que la memoria
+    no depende de la longitud de la pista.
+    """
+    WINDOW_SECONDS = 0.05
+    THRESHOLD_DB = -50.0
+    MIN_GAP_SECONDS = 2.0
+    MARGIN_SECONDS = 0.1  # Se deja un poco de silencio para no cortar ataques ni fundidos
+
+    def __init__(self, rate, channels):
+        self.rate = rate
+        self.channels = channels
+        self.window = max(1, int(rate * SilenceDetector.WINDOW_SECONDS))
+        # Potencia media (en unidades int16 al cuadrado) por debajo de la que la ventana es silencio
+        self.limit = (32768.0 * 10 ** (SilenceDetector.THRESHOLD_DB / 20)) ** 2
+        self.frames = 0
+        self._loud = []
+        self._rest = np.zeros((0, channels), dtype=np.int16)
+
+    def feed(self, block):
+        """Procesa un bloque int16 (frames, canales)"""
+        self.frames += len(block)
+        if len(self._rest):
+            block = np.concatenate((self._rest, block))
+        whole = len(block) // self.window * self.window
+        if whole:
+            windows = block[:whole].reshape(-1, self.window * self.channels).astype(np.float32)
+            power = np.einsum('ij,ij->i', windows, windows) / windows.shape[1]
+            self._loud.append(power > self.limit)
+        self._rest = block[whole:]
+
+    def result(self):
+        """SilenceInfo del audio procesado; una pista toda en silencio no se recorta"""
+        if len(self._rest):
+            tail = self._rest.astype(np.float32)
+            self._loud.append(np.array([float(np.mean(tail * tail)) > self.limit]))
+        duration = self.frames / self.rate
+        loud = np.flatnonzero(np.concatenate(self._loud)) if self._loud else np.zeros(0, dtype=np.intp)
+        if not len(loud):
+            return SilenceInfo(0.0, duration, duration, [])
+        step = self.window / self.rate
+        margin = SilenceDetector.MARGIN_SECONDS
+        sound_start = max(0.0, loud[0] * step - margin)
+        sound_end = min(duration, (loud[-1] + 1) * step + margin)
+        # Huecos: saltos entre ventanas con sonido consecutivas más largos que MIN_GAP_SECONDS
+        jumps = np.flatnonzero(np.diff(loud) * step > SilenceDetector.MIN_GAP_SECONDS)
+        gaps = [((loud[i] + 1) * step + margin, loud[i + 1] * step - margin) for i in jumps]
+        return SilenceInfo(sound_start, sound_end, duration,
+                           [(float(start), float(end)) for start, end in gaps if end > start])
+
+def init_silence_process():
+    """Prepara un proceso de análisis: prioridad mínima y un mezclador propio sin dispositivo.
+
+    SDL bloquea su dispositivo de audio mientras decodifica con Sound(), así que los MP3
+    se decodifican aquí, con el controlador 'dummy', y la salida del reproductor no se entera.
+    """
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(19)
+        except OSError:
+            pass
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
     try:
-        with open(config_file, 'w') as f:
-            json.dump(config, f, indent=4)
-        print(f"Configuración guardada en: {config_file}")  # Debug
-    except Exception as e:
-        print(f"Error al guardar la configuración: {e}")  # Debug
+        pygame.mixer.init(frequency=44100, size=-16, channels=2)
+    except pygame.error as e:
+        print(f"Sin mezclador para analizar MP3: {e}")  # Debug
 
-def load_window_state(window_name, default_geometry):
-    """Carga el estado de la ventana desde setting.json"""
-    # Obtener la ruta absoluta del directorio del script
-    config_dir = os.path.dirname(os.path.abspath(__file__))
-    config_file = os.path.join(config_dir, 'setting.json')
-    
+def analyze_silence(path, decode=True):
+    """Analiza los silencios de un archivo; devuelve (ruta, SilenceInfo o None).
+
+    Se ejecuta en el proceso de análisis; con decode=False (en el propio reproductor)
+    solo se analizan los WAV, que se leen mapeados sin pasar por SDL.
+    """
     try:
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-                if window_name in config:
-                    print(f"Configuración cargada para: {window_name}")  # Debug
-                    return config[window_name]
-    except Exception as e:
-        print(f"Error al cargar la configuración: {e}")  # Debug
-    
-    print(f"Usando configuración por defecto para: {window_name}")  # Debug
-    return {
-        'x': default_geometry[0],
-        'y': default_geometry[1],
-        'width': default_geometry[2],
-        'height': default_geometry[3],
-        'state': 0
+        if path.lower().endswith('.wav'):
+            source = WavFile(path)
+            try:
+                detector = SilenceDetector(source.rate, source.channels)
+                for start in range(0, source.frames, SilenceScanner.BLOCK_FRAMES):
+                    detector.feed(source.read_int16(start, SilenceScanner.BLOCK_FRAMES))
+            finally:
+                source.close()
+            return path, detector.result()
+        init = pygame.mixer.get_init()
+        if not decode or init is None or init[1] != -16:
+            return path, None
+        sound = pygame.mixer.Sound(path)
+        samples = pygame.sndarray.samples(sound)
+        if samples.ndim == 1:
+            samples = samples.reshape(-1, 1)
+        detector = SilenceDetector(init[0], samples.shape[1])
+        for start in range(0, len(samples), SilenceScanner.BLOCK_FRAMES):
+            detector.feed(samples[start:start + SilenceScanner.BLOCK_FRAMES])
+        return path, detector.result()
+    except (OSError, ValueError, pygame.error) as e:
+        print(f"Error al analizar silencios de {path}: {e}")  # Debug
+        return path, None
+
+class SilenceScanner(QThread):
+    """Analiza en segundo plano los silencios de cada pista una sola vez y los guarda en library.db.
+
+    Trabaja pista a pista en un proceso aparte de prioridad mínima: primero la que
+    suena, luego las de la lista y por último el resto de la biblioteca. Lo ya
+    analizado se queda en la base de datos, así que un análisis interrumpido sigue
+    donde se quedó.
+    """
+    analyzed = pyqtSignal(str)
+    status = pyqtSignal(str)
+
+    PRIORITY_CURRENT = 0
+    PRIORITY_PLAYLIST = 1
+    PRIORITY_LIBRARY = 2
+    BLOCK_FRAMES = 1 << 18
+    DUTY_CYCLE = 0.5  # Fracción máxima del tiempo ocupada analizando (el resto se espera)
+
+    def __init__(self, db_path, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.jobs = queue.PriorityQueue()
+        self._queued = {}  # ruta -> mejor prioridad pendiente (None = barrido de la biblioteca)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._stopping = False
+        self._pool = None
+
+    def enqueue(self, paths, priority):
+        """Encola pistas; una ya pendiente solo se vuelve a encolar si sube de prioridad"""
+        with self._lock:
+            for path in paths:
+                if ((path is not None and (is_stream_url(path) or split_cue_track_key(path) is not None))
+                        or self._queued.get(path, priority + 1) <= priority):
+                    continue
+                self._queued[path] = priority
+                self._seq += 1
+                self.jobs.put((priority, self._seq, path))
+
+    def enqueue_library(self):
+        """Pide un barrido de las pistas de la biblioteca sin analizar o modificadas"""
+        self.enqueue([None], SilenceScanner.PRIORITY_LIBRARY)
+
+    def stop(self):
+        self._stopping = True
+        self.jobs.put((-1, 0, None))
+        self.wait()
+
+    def run(self):
+        conn = MusicLibrary.connect(self.db_path)
+        analyzed = 0
+        try:
+            while True:
+                if self.jobs.empty():
+                    self._close_pool()  # Sin trabajo no se mantiene vivo el proceso
+                priority, _, path = self.jobs.get()
+                if self._stopping:
+                    break
+                with self._lock:
+                    if self._queued.get(path) != priority:
+                        continue  # Ya se atendió con más prioridad
+                    del self._queued[path]
+                began = time.perf_counter()
+                try:
+                    if path is None:
+                        self.enqueue(self._pending_library(conn), SilenceScanner.PRIORITY_LIBRARY)
+                    elif self._analyze(conn, path):
+                        analyzed += 1
+                        self.analyzed.emit(path)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Error al analizar silencios de {path}: {e}")  # Debug
+                if self.jobs.empty():
+                    if analyzed:
+                        count = conn.execute("SELECT COUNT(*) FROM silence").fetchone()[0]
+                        self.status.emit(f"Silencios analizados en {count} pistas")
+                        analyzed = 0
+                elif priority == SilenceScanner.PRIORITY_LIBRARY:
+                    # El barrido de la biblioteca no tiene prisa: deja la máquina libre a ratos
+                    time.sleep((time.perf_counter() - began) * (1 / SilenceScanner.DUTY_CYCLE - 1))
+        finally:
+            self._close_pool()
+            conn.close()
+
+    def _pending_library(self, conn):
+        return [row[0] for row in conn.execute(
+            "SELECT t.path FROM tracks t LEFT JOIN silence s ON s.path = t.path "
+            "WHERE s.path IS NULL OR s.size != t.size OR s.mtime_ns != t.mtime_ns")]
+
+    def _analyze(self, conn, path):
+        """Analiza una pista si no lo estaba ya; devuelve True si guardó un resultado nuevo"""
+        st = os.stat(path)
+        if conn.execute("SELECT 1 FROM silence WHERE path = ? AND size = ? AND mtime_ns = ?",
+                        (path, st.st_size, st.st_mtime_ns)).fetchone():
+            return False
+        info = self._run_analysis(path)
+        if info is None:
+            return False
+        conn.execute("INSERT OR REPLACE INTO silence VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (path, st.st_size, st.st_mtime_ns, info.sound_start, info.sound_end,
+                      info.duration, json.dumps(info.gaps)))
+        conn.commit()
+        return True
+
+    def _run_analysis(self, path):
+        try:
+            if self._pool is None:
+                # "spawn" evita heredar con fork el estado de Qt y SDL del proceso principal
+                self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=init_silence_process)
+            return self._pool.submit(analyze_silence, path).result()[1]
+        except (OSError, RuntimeError, BrokenProcessPool) as e:
+            print(f"Error en el proceso de análisis, se sigue en este hilo: {e}")  # Debug
+            self._close_pool()
+            return analyze_silence(path, decode=False)[1]
+
+    def _close_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+class PlayHistory(QThread):
+    """Historial de reproducciones de solo anexado en library.db.
+
+    Desde la reproducción solo se encola el evento; este hilo los escribe por lotes
+    en una transacción y mantiene a la vez los totales por pista de play_stats, que
+    son los que consultan las vistas. La compactación borra los eventos sueltos más
+    antiguos que RETENTION_DAYS sin tocar los totales.
+    """
+    recorded = pyqtSignal(list)  # Rutas de los eventos de cada lote escrito
+
+    START, FINISH, SKIP, STOP = range(4)
+    RETENTION_DAYS = 365
+    COMPACT_EVERY = 1000  # Eventos escritos entre compactaciones
+
+    def __init__(self, db_path, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.events = queue.Queue()
+
+    def record(self, path, event, position=0.0):
+        """Anota un evento; no toca la base de datos en el hilo que llama"""
+        self.events.put((int(time.time()), path, event, float(position)))
+
+    def stop(self):
+        self.events.put(None)
+        self.wait()
+
+    def run(self):
+        conn = MusicLibrary.connect(self.db_path)
+        track_ids = {}
+        written = 0
+        try:
+            self._compact(conn)
+            running = True
+            while running:
+                batch = [self.events.get()]
+                while True:
+                    try:
+                        batch.append(self.events.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in batch:
+                    running = False
+                    batch = [event for event in batch if event is not None]
+                try:
+                    for stamp, path, event, position in batch:
+                        track = track_ids.get(path)
+                        if track is None:
+                            conn.execute("INSERT OR IGNORE INTO history_tracks (path) VALUES (?)", (path,))
+                            track = conn.execute("SELECT id FROM history_tracks WHERE path = ?", (path,)).fetchone()[0]
+                            track_ids[path] = track
+                        conn.execute("INSERT INTO history (track, time, event, position) VALUES (?, ?, ?, ?)",
+                                     (track, stamp, event, position))
+                        conn.execute(
+                            "INSERT INTO play_stats VALUES (?, ?, ?, ?, ?) ON CONFLICT(track) DO UPDATE SET "
+                            "starts = starts + excluded.starts, finishes = finishes + excluded.finishes, "
+                            "skips = skips + excluded.skips, last_played = MAX(last_played, excluded.last_played)",
+                            (track, int(event == PlayHistory.START), int(event == PlayHistory.FINISH),
+                             int(event == PlayHistory.SKIP), stamp if event == PlayHistory.START else 0))
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Error al guardar el historial: {e}")  # Debug
+                    conn.rollback()
+                    continue
+                if batch:
+                    self.recorded.emit([path for _, path, _, _ in batch])
+                written += len(batch)
+                if written >= PlayHistory.COMPACT_EVERY:
+                    self._compact(conn)
+                    written = 0
+        finally:
+            conn.close()
+
+    def _compact(self, conn):
+        """Borra los eventos caducados (sus totales ya están en play_stats) y recorta el WAL"""
+        try:
+            limit = int(time.time()) - PlayHistory.RETENTION_DAYS * 86400
+            conn.execute("DELETE FROM history WHERE time < ?", (limit,))
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            print(f"Error al compactar el historial: {e}")  # Debug
+
+class SmartPlaylists:
+    """Listas inteligentes: reglas guardadas en library.db y su contenido materializado.
+
+    Las reglas se traducen a una condición SQL sobre la biblioteca y el historial.
+    Una lista se evalúa entera solo al crearla o editarla; después, cada cambio de la
+    biblioteca o del historial vuelve a evaluar solo las rutas afectadas y devuelve
+    qué entra y qué sale de cada lista.
+    """
+    FIELDS = {
+        'artist': ("Artista", 'text', "COALESCE(t.artist, '')"),
+        'album': ("Álbum", 'text', "COALESCE(t.album, '')"),
+        'genre': ("Género", 'text', "COALESCE(t.genre, '')"),
+        'title': ("Título", 'text', "COALESCE(t.title, '')"),
+        'duration': ("Duración (min)", 'number', "t.duration / 60.0"),
+        'plays': ("Reproducciones", 'number', "COALESCE(s.starts, 0)"),
+        'skips': ("Saltos", 'number', "COALESCE(s.skips, 0)"),
+        'added': ("Agregada hace (días)", 'number', "(CAST(strftime('%s', 'now') AS INTEGER) - t.added) / 86400.0"),
+    }
+    TEXT_OPS = {
+        'contains': ("contiene", "instr(lower({0}), lower(?)) > 0"),
+        'excludes': ("no contiene", "instr(lower({0}), lower(?)) = 0"),
+        'is': ("es", "lower({0}) = lower(?)"),
+        'is_not': ("no es", "lower({0}) != lower(?)"),
+    }
+    NUMBER_OPS = {
+        '<': ("menos de", "{0} < ?"),
+        '>': ("más de", "{0} > ?"),
+        '=': ("igual a", "{0} = ?"),
     }
+    HISTORY_FIELDS = {'plays', 'skips'}
+    RELATIVE_FIELDS = {'added'}  # Cambian con el paso del tiempo, no con los datos
+    SOURCE = ("FROM tracks t LEFT JOIN history_tracks h ON h.path = t.path "
+              "LEFT JOIN play_stats s ON s.track = h.id")
+    CHUNK = 500
 
-def load_stylesheet():
-    """Carga el archivo CSS del tema oscuro"""
-    style_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dark_theme.css')
-    try:
-        with open(style_file, 'r') as f:
-            return f.read()
-    except Exception as e:
-        print(f"Error al cargar el tema: {e}")
-        return ""
+    def __init__(self, conn):
+        self.conn = conn
+        self._compiled = None  # id -> (reglas, condición SQL, parámetros); se rehace al guardar una lista
 
-def get_icon_path():
-    """Obtiene la ruta absoluta del ícono"""
-    # Intenta diferentes ubicaciones posibles
-    possible_paths = [
-        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icons', 'icon.png'),
-        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'icons', 'icon.png'),
-        os.path.abspath(os.path.join('icons', 'icon.png')),
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            print(f"Ícono encontrado en: {path}")  # Debug
-            return path
-            
-    print("No se encontró el archivo icon.png en ninguna ubicación")  # Debug
-    return None
+    @staticmethod
+    def compile(rules):
+        """Condición SQL y parámetros de unas reglas {'match': 'all'|'any', 'conditions': [...]}"""
+        clauses, params = [], []
+        for field, op, value in rules.get('conditions', []):
+            _, kind, expr = SmartPlaylists.FIELDS[field]
+            ops = SmartPlaylists.TEXT_OPS if kind == 'text' else SmartPlaylists.NUMBER_OPS
+            clauses.append(ops[op][1].format(expr))
+            params.append(value)
+        joiner = ' AND ' if rules.get('match', 'all') == 'all' else ' OR '
+        return '(' + (joiner.join(clauses) or '1') + ')', params
+
+    @staticmethod
+    def uses(rules, fields):
+        return any(condition[0] in fields for condition in rules.get('conditions', []))
+
+    def all(self):
+        """[(id, nombre, reglas)] en orden de creación"""
+        return [(row[0], row[1], json.loads(row[2]))
+                for row in self.conn.execute("SELECT id, name, rules FROM smart_playlists ORDER BY id")]
+
+    def compiled(self):
+        """{id: (reglas, condición SQL, parámetros)}; las reglas se leen y traducen una sola vez"""
+        if self._compiled is None:
+            self._compiled = {playlist_id: (rules,) + SmartPlaylists.compile(rules)
+                              for playlist_id, _, rules in self.all()}
+        return self._compiled
+
+    def create(self, name, rules):
+        playlist_id = self.conn.execute("INSERT INTO smart_playlists (name, rules) VALUES (?, ?)",
+                                        (name, json.dumps(rules))).lastrowid
+        self.compiled()[playlist_id] = (rules,) + SmartPlaylists.compile(rules)
+        self.materialize(playlist_id)
+        return playlist_id
+
+    def update(self, playlist_id, name, rules):
+        self.conn.execute("UPDATE smart_playlists SET name = ?, rules = ? WHERE id = ?",
+                          (name, json.dumps(rules), playlist_id))
+        self.compiled()[playlist_id] = (rules,) + SmartPlaylists.compile(rules)
+        self.materialize(playlist_id)
+
+    def delete(self, playlist_id):
+        self.conn.execute("DELETE FROM smart_members WHERE playlist = ?", (playlist_id,))
+        self.conn.execute("DELETE FROM smart_playlists WHERE id = ?", (playlist_id,))
+        self.conn.commit()
+        self.compiled().pop(playlist_id, None)
+
+    def members(self, playlist_id):
+        return [row[0] for row in self.conn.execute(
+            "SELECT path FROM smart_members WHERE playlist = ? ORDER BY path", (playlist_id,))]
+
+    def materialize(self, playlist_id):
+        """Evalúa la lista completa una vez (al crearla o cambiar sus reglas)"""
+        _, where, params = self.compiled()[playlist_id]
+        self.conn.execute("DELETE FROM smart_members WHERE playlist = ?", (playlist_id,))
+        self.conn.execute(f"INSERT INTO smart_members SELECT ?, t.path {SmartPlaylists.SOURCE} WHERE {where}",
+                          [playlist_id] + params)
+        self.conn.commit()
+
+    def refresh_relative(self):
+        """Reevalúa las listas con reglas de tiempo relativo (una vez por sesión)"""
+        for playlist_id, (rules, _, _) in list(self.compiled().items()):
+            if SmartPlaylists.uses(rules, SmartPlaylists.RELATIVE_FIELDS):
+                self.materialize(playlist_id)
+
+    def update_paths(self, paths, fields=None):
+        """Reevalúa solo las rutas indicadas (nuevas, cambiadas o eliminadas).
+
+        Con fields solo se miran las listas cuyas reglas usan alguno de esos campos.
+        Devuelve {id: (rutas que entran, rutas que salen)} de las listas que cambiaron.
+        """
+        changes = {}
+        for playlist_id, (rules, where, params) in self.compiled().items():
+            if fields is not None and not SmartPlaylists.uses(rules, fields):
+                continue
+            added, dropped = [], []
+            for i in range(0, len(paths), SmartPlaylists.CHUNK):
+                chunk = list(paths[i:i + SmartPlaylists.CHUNK])
+                marks = ','.join('?' * len(chunk))
+                matching = {row[0] for row in self.conn.execute(
+                    f"SELECT t.path {SmartPlaylists.SOURCE} WHERE t.path IN ({marks}) AND {where}", chunk + params)}
+                current = {row[0] for row in self.conn.execute(
+                    f"SELECT path FROM smart_members WHERE playlist = ? AND path IN ({marks})", [playlist_id] + chunk)}
+                added.extend(sorted(matching - current))
+                dropped.extend(sorted(current - matching))
+            if added or dropped:
+                self.conn.executemany("INSERT INTO smart_members VALUES (?, ?)", [(playlist_id, p) for p in added])
+                self.conn.executemany("DELETE FROM smart_members WHERE playlist = ? AND path = ?",
+                                      [(playlist_id, p) for p in dropped])
+                changes[playlist_id] = (added, dropped)
+        self.conn.commit()
+        return changes
+
+class Playlists:
+    """Listas normales guardadas en library.db.
+
+    Cada fila guarda la ruta y los datos que mostraba la tabla, así una lista se carga
+    con una sola consulta sin releer etiquetas (las de la biblioteca, si la pista está
+    en ella, mandan). Mientras no se muestra, en el reproductor es solo su id y su nombre.
+    """
+    DEFAULT_NAME = "Lista de reproducción"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def all(self):
+        """[(id, nombre)] en orden de creación; siempre hay al menos una"""
+        rows = self.conn.execute("SELECT id, name FROM playlists ORDER BY id").fetchall()
+        if not rows:
+            rows = [(self.create(Playlists.DEFAULT_NAME), Playlists.DEFAULT_NAME)]
+        return rows
+
+    def create(self, name):
+        playlist_id = self.conn.execute("INSERT INTO playlists (name) VALUES (?)", (name,)).lastrowid
+        self.conn.commit()
+        return playlist_id
+
+    def rename(self, playlist_id, name):
+        self.conn.execute("UPDATE playlists SET name = ? WHERE id = ?", (name, playlist_id))
+        self.conn.commit()
+
+    def delete(self, playlist_id):
+        self.conn.execute("DELETE FROM playlist_items WHERE playlist = ?", (playlist_id,))
+        self.conn.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
+        self.conn.commit()
+
+    def items(self, playlist_id):
+        """[(ruta, datos con el formato de read_track_info)] en el orden de la lista"""
+        return [(row[0], {'title': row[1] or '', 'artist': row[2] or '', 'album': row[3] or '',
+                          'duration': row[4] or 0.0, 'bitrate': row[5] or 0})
+                for row in self.conn.execute(
+                    "SELECT i.path, COALESCE(t.title, i.title), COALESCE(t.artist, i.artist), "
+                    "COALESCE(t.album, i.album), COALESCE(t.duration, i.duration), COALESCE(t.bitrate, i.bitrate) "
+                    "FROM playlist_items i LEFT JOIN tracks t ON t.path = i.path "
+                    "WHERE i.playlist = ? ORDER BY i.position", (playlist_id,))]
+
+    def save(self, playlist_id, tracks):
+        """Reemplaza el contenido guardado por los registros (Track) en orden"""
+        self.conn.execute("DELETE FROM playlist_items WHERE playlist = ?", (playlist_id,))
+        self.conn.executemany("INSERT INTO playlist_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              [(playlist_id, position, track.path, track.title, track.artist, track.album,
+                                track.duration, track.bitrate) for position, track in enumerate(tracks)])
+        self.conn.commit()
+
+NON_WORD = re.compile(r'[\W_]+')
+COMBINING_MARKS = re.compile(r'[\u0300-\u036f]')
+
+class SearchIndex:
+    """Índice invertido de tokens con búsqueda por prefijo para filtrar mientras se escribe.
+
+    Los tokens se guardan ordenados y cada término de la consulta se resuelve con
+    bisect sobre ese rango de prefijo. Si la consulta nueva refina la anterior (el
+    caso típico al escribir), solo se filtran los resultados previos.
+    """
+
+    REFINE_LIMIT = 5000  # Por encima de esto es más barato intersectar postings
+
+    def __init__(self):
+        self._postings = {}  # token -> conjunto de claves
+        self._tokens = []  # Tokens ordenados
+        self._new_tokens = []  # Tokens aún no insertados en _tokens (se ordenan al buscar)
+        self._doc_tokens = {}  # clave -> tupla de tokens
+        self._last_terms = None
+        self._last_result = None
+
+    @staticmethod
+    def tokenize(text):
+        """Minúsculas, sin acentos y partido en palabras"""
+        text = text.casefold()
+        if not text.isascii():
+            text = COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', text))
+        return [token for token in NON_WORD.split(text) if token]
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def __contains__(self, key):
+        return key in self._doc_tokens
+
+    def add(self, key, *fields):
+        """Indexa (o reindexa) una clave con los textos indicados"""
+        if key in self._doc_tokens:
+            self.remove(key)
+        tokens = tuple(set(self.tokenize(' '.join(field for field in fields if field))))
+        self._doc_tokens[key] = tokens
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                self._new_tokens.append(token)
+            postings.add(key)
+        self._last_terms = None
+
+    def remove(self, key):
+        tokens = self._doc_tokens.pop(key, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            postings = self._postings[token]
+            postings.discard(key)
+            if not postings:
+                del self._postings[token]
+                self.merge_pending()
+                i = bisect.bisect_left(self._tokens, token)
+                del self._tokens[i]
+        self._last_terms = None
+
+    def search(self, query):
+        """Claves que contienen todos los términos como prefijo de alguna palabra (None = sin filtro)"""
+        terms = self.tokenize(query)
+        if not terms:
+            return None
+        self.merge_pending()
+        previous = self._last_terms
+        if (previous is not None and self._last_result is not None and len(terms) >= len(previous)
+                and all(terms[i].startswith(previous[i]) for i in range(len(previous)))
+                and len(self._last_result) <= SearchIndex.REFINE_LIMIT):
+            result = {key for key in self._last_result if self._matches(key, terms)}
+        else:
+            result = None
+            # Los términos largos son los más selectivos: empezar por ellos
+            for term in sorted(terms, key=len, reverse=True):
+                lo, hi = self._prefix_range(term)
+                if any(len(self._postings[token]) == len(self._doc_tokens) for token in self._tokens[lo:hi]):
+                    continue  # El término aparece en todas las pistas: no filtra nada
+                matches = set().union(*(self._postings[token] for token in self._tokens[lo:hi]))
+                result = matches if result is None else result & matches
+                if not result:
+                    break
+        self._last_terms = terms
+        self._last_result = result
+        return result
+
+    def merge_pending(self):
+        """Inserta los tokens pendientes: uno a uno si son pocos, con un sort si es una carga masiva"""
+        if not self._new_tokens:
+            return
+        if len(self._new_tokens) < 64:
+            for token in self._new_tokens:
+                bisect.insort(self._tokens, token)
+        else:
+            self._tokens.extend(self._new_tokens)
+            self._tokens.sort()
+        self._new_tokens = []
+
+    def _prefix_range(self, term):
+        """Rango [lo, hi) de _tokens que empiezan por term"""
+        lo = bisect.bisect_left(self._tokens, term)
+        return lo, bisect.bisect_left(self._tokens, term + '\uffff', lo)
+
+    def _matches(self, key, terms):
+        tokens = self._doc_tokens.get(key, ())
+        return all(any(token.startswith(term) for token in tokens) for term in terms)
+
+def row_runs(rows):
+    """Agrupa filas ascendentes en rangos contiguos [inicio, fin)"""
+    runs = []
+    for row in rows:
+        if runs and runs[-1][1] == row:
+            runs[-1][1] = row + 1
+        else:
+            runs.append([row, row + 1])
+    return runs
+
+class PlaylistModel(QAbstractTableModel):
+    """Modelo de la tabla de la lista: cada celda se lee del registro de la pista, sin copias en la vista.
+
+    playlist es la lista de rutas en el orden visible (la misma que usa la cola) y
+    todas las ediciones pasan por aquí para avisar a la vista por rangos.
+    """
+
+    def __init__(self, playlist, tracks, parent=None):
+        super().__init__(parent)
+        self.playlist = playlist
+        self.tracks = tracks
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.playlist)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(PLAYLIST_COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return self.tracks[self.playlist[index.row()]].column_text(index.column())
+        if role == Qt.ToolTipRole:
+            return self.playlist[index.row()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return PLAYLIST_COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled  # Solo se suelta entre filas, nunca encima
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def take_range(self, start, stop):
+        """Quita las filas [start, stop) y devuelve sus rutas"""
+        self.beginRemoveRows(QModelIndex(), start, stop - 1)
+        keys = self.playlist[start:stop]
+        del self.playlist[start:stop]
+        self.endRemoveRows()
+        return keys
+
+    def insert_range(self, start, keys):
+        if not keys:
+            return
+        self.beginInsertRows(QModelIndex(), start, start + len(keys) - 1)
+        self.playlist[start:start] = keys
+        self.endInsertRows()
+
+    def set_order(self, keys):
+        """Reemplaza el orden completo (ordenar por columna)"""
+        self.beginResetModel()
+        self.playlist[:] = keys
+        self.endResetModel()
+
+    def rows_changed(self, first, last):
+        self.dataChanged.emit(self.index(first, 0), self.index(last, len(PLAYLIST_COLUMNS) - 1))
+
+class PlaylistTable(QTableView):
+    """Tabla de la lista; el arrastre interno no mueve filas, avisa para que lo haga el reproductor"""
+    rows_dropped = pyqtSignal(list, int)  # filas arrastradas, fila de destino
+
+    def selected_rows(self):
+        """Filas seleccionadas y visibles, en orden ascendente"""
+        return sorted(index.row() for index in self.selectionModel().selectedRows()
+                      if not self.isRowHidden(index.row()))
+
+    def current_row(self):
+        index = self.currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def dropEvent(self, event):
+        if event.source() is not self:
+            event.ignore()
+            return
+        index = self.indexAt(event.pos())
+        position = self.dropIndicatorPosition()
+        if not index.isValid() or position == QTableView.OnViewport:
+            target = self.model().rowCount()
+        else:
+            target = index.row()
+            if position == QTableView.BelowItem:
+                target += 1
+        # CopyAction evita que la vista borre las filas de origen al terminar el arrastre
+        event.setDropAction(Qt.CopyAction)
+        event.accept()
+        rows = self.selected_rows()
+        if rows:
+            self.rows_dropped.emit(rows, target)
+
+class PlaylistState:
+    """Una lista de la ventana de listas con todo lo que depende de su contenido.
+
+    El reproductor expone la lista mostrada en self.playlist, self.tracks, self.queue...
+    (ver AudioPlayer.bind_playlist_state); la que suena puede ser otra y sigue con su cola.
+    Las demás quedan descargadas: solo el nombre y el id con el que se leen de library.db.
+    """
+    __slots__ = ('name', 'smart_id', 'playlist_id', 'owner', 'playlist', 'tracks', 'model', 'queue',
+                 'search_index', 'undo_stack', 'redo_stack', 'loaded', 'dirty')
+
+    def __init__(self, name, owner, smart_id=None, playlist_id=None):
+        self.name = name
+        self.smart_id = smart_id  # Lista inteligente (solo lectura) o None
+        self.playlist_id = playlist_id  # Lista normal guardada en library.db
+        self.owner = owner  # Padre Qt de los modelos
+        self.model = None
+        self.unload()
+
+    def unload(self):
+        """Libera las filas, los registros y el índice; la lista se vuelve a leer al mostrarla"""
+        if self.model is not None:
+            self.model.deleteLater()
+        self.playlist = []
+        self.tracks = TrackStore()
+        self.model = PlaylistModel(self.playlist, self.tracks, self.owner)
+        self.queue = PlayQueue(self.playlist)
+        self.search_index = SearchIndex()
+        self.undo_stack = deque(maxlen=100)  # Ediciones de la lista que se pueden deshacer
+        self.redo_stack = []
+        self.loaded = False
+        self.dirty = False  # Cambios aún no guardados en library.db
 
 class PlaylistWindow(QWidget):
     play_signal = pyqtSignal(str)
     add_file_signal = pyqtSignal(str)
+    queue_signal = pyqtSignal(int, bool)  # fila, True = reproducir a continuación
+    remove_rows_signal = pyqtSignal(list)
+    crop_rows_signal = pyqtSignal(list)  # Conserva solo estas filas
+    move_rows_signal = pyqtSignal(list, int)  # filas, desplazamiento (-1 arriba, +1 abajo)
+    drop_rows_signal = pyqtSignal(list, int)  # filas, fila de destino
+    undo_signal = pyqtSignal()
+    redo_signal = pyqtSignal()
+    find_duplicates_signal = pyqtSignal()
+    history_signal = pyqtSignal()
+    list_changed_signal = pyqtSignal(int)  # pestaña elegida
+    new_list_signal = pyqtSignal()
+    rename_list_signal = pyqtSignal(int)
+    delete_list_signal = pyqtSignal(int)
+    new_smart_signal = pyqtSignal()
+    edit_smart_signal = pyqtSignal(int)
+    delete_smart_signal = pyqtSignal(int)
+    search_signal = pyqtSignal(str)
+    sort_signal = pyqtSignal(int, bool)  # columna, True = descendente
 
     def __init__(self):
         super().__init__()
@@ -118,10 +3488,20 @@ class PlaylistWindow(QWidget):
         
         # Definir atributos de la clase primero
         self.btn_add = QPushButton()
+        self.btn_url = QPushButton()
         self.btn_up = QPushButton()
         self.btn_down = QPushButton()
         self.btn_remove = QPushButton()
-        self.playlist = QListWidget()
+        self.btn_crop = QPushButton()
+        self.btn_undo = QPushButton()
+        self.btn_redo = QPushButton()
+        self.btn_duplicates = QPushButton()
+        self.btn_history = QPushButton()
+        self.btn_new_list = QPushButton()
+        self.btn_smart = QPushButton()
+        self.tabs = QTabBar()
+        self.search_box = QLineEdit()
+        self.playlist = PlaylistTable()
         
         self.init_ui()  # Primero inicializamos la UI
         self.load_saved_geometry()  # Luego cargamos la geometría
@@ -136,6 +3516,10 @@ class PlaylistWindow(QWidget):
         self.btn_add.setIcon(QIcon.fromTheme('list-add'))
         self.btn_add.setToolTip('Agregar audio')
         self.btn_add.clicked.connect(self.add_audio)
+
+        self.btn_url.setIcon(QIcon.fromTheme('network-wireless'))
+        self.btn_url.setToolTip('Agregar URL (HTTP, Icecast, Shoutcast)')
+        self.btn_url.clicked.connect(self.add_url)
         
         self.btn_up.setIcon(QIcon.fromTheme('go-up'))
         self.btn_up.setToolTip('Mover arriba')
@@ -146,28 +3530,99 @@ class PlaylistWindow(QWidget):
         self.btn_down.clicked.connect(self.move_down)
         
         self.btn_remove.setIcon(QIcon.fromTheme('list-remove'))
-        self.btn_remove.setToolTip('Eliminar audio')
+        self.btn_remove.setToolTip('Eliminar seleccionados (Supr)')
         self.btn_remove.clicked.connect(self.remove_audio)
+
+        self.btn_crop.setIcon(QIcon.fromTheme('edit-cut'))
+        self.btn_crop.setToolTip('Recortar: conservar solo la selección')
+        self.btn_crop.clicked.connect(self.crop_audio)
+
+        self.btn_undo.setIcon(QIcon.fromTheme('edit-undo'))
+        self.btn_undo.setToolTip('Deshacer (Ctrl+Z)')
+        self.btn_undo.clicked.connect(self.undo_signal.emit)
+
+        self.btn_redo.setIcon(QIcon.fromTheme('edit-redo'))
+        self.btn_redo.setToolTip('Rehacer (Ctrl+Shift+Z)')
+        self.btn_redo.clicked.connect(self.redo_signal.emit)
+        self.set_undo_state(False, False)
+        
+        # Atajos de edición
+        for keys, slot in ((QKeySequence.Delete, self.remove_audio), (QKeySequence.Undo, self.undo_signal.emit),
+                           (QKeySequence.Redo, self.redo_signal.emit), ("Alt+Up", self.move_up),
+                           ("Alt+Down", self.move_down)):
+            shortcut = QShortcut(QKeySequence(keys), self.playlist)
+            shortcut.setContext(Qt.WidgetWithChildrenShortcut)  # No roba teclas al buscador
+            shortcut.activated.connect(slot)
+        
+        self.btn_duplicates.setIcon(QIcon.fromTheme('edit-find'))
+        self.btn_duplicates.setToolTip('Buscar duplicados')
+        self.btn_duplicates.clicked.connect(self.find_duplicates_signal.emit)
+
+        self.btn_history.setIcon(QIcon.fromTheme('document-open-recent'))
+        self.btn_history.setToolTip('Historial de reproducción')
+        self.btn_history.clicked.connect(self.history_signal.emit)
+
+        self.btn_new_list.setIcon(QIcon.fromTheme('document-new'))
+        self.btn_new_list.setToolTip('Nueva lista')
+        self.btn_new_list.clicked.connect(self.new_list_signal.emit)
+
+        self.btn_smart.setIcon(QIcon.fromTheme('edit-find-replace'))
+        self.btn_smart.setToolTip('Nueva lista inteligente')
+        self.btn_smart.clicked.connect(self.new_smart_signal.emit)
         
         # Configurar tamaño de botones (sin estilos individuales)
-        for button in [self.btn_add, self.btn_up, self.btn_down, self.btn_remove]:
+        for button in [self.btn_add, self.btn_url, self.btn_up, self.btn_down, self.btn_remove, self.btn_crop,
+                       self.btn_undo, self.btn_redo, self.btn_duplicates, self.btn_history, self.btn_new_list,
+                       self.btn_smart]:
             button.setFixedSize(button_size, button_size)
             button.setIconSize(QSize(icon_size, icon_size))
     
-        # Configurar lista
-        self.playlist.setDragDropMode(QListWidget.InternalMove)
+        # Configurar lista (el modelo lo asigna el reproductor con set_model)
+        self.playlist.verticalHeader().hide()
+        self.playlist.verticalHeader().setDefaultSectionSize(22)  # Filas de alto fijo: no se mide cada una
+        self.playlist.setShowGrid(False)
+        self.playlist.setWordWrap(False)
+        self.playlist.setSelectionMode(QTableView.ExtendedSelection)
+        self.playlist.setSelectionBehavior(QTableView.SelectRows)
+        self.playlist.setDragDropMode(QTableView.InternalMove)
         self.playlist.setDefaultDropAction(Qt.MoveAction)
-        self.playlist.itemDoubleClicked.connect(self.play_item)
+        self.playlist.doubleClicked.connect(self.play_item)
+        self.playlist.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.playlist.customContextMenuRequested.connect(self.show_context_menu)
+        self.playlist.rows_dropped.connect(self.drop_rows)
+
+        # Ordenar al pulsar una cabecera; el orden lo aplica el reproductor con claves precalculadas
+        header = self.playlist.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        header.sortIndicatorChanged.connect(self.on_sort_indicator_changed)
         
         # Crear layout de botones
         button_layout = QHBoxLayout()
-        for button in [self.btn_add, self.btn_up, self.btn_down, self.btn_remove]:
+        for button in [self.btn_add, self.btn_url, self.btn_up, self.btn_down, self.btn_remove, self.btn_crop,
+                       self.btn_undo, self.btn_redo, self.btn_duplicates, self.btn_history, self.btn_new_list,
+                       self.btn_smart]:
             button_layout.addWidget(button)
         button_layout.addStretch()
         
+        # Pestañas de las listas (primero las normales, después las inteligentes)
+        self.tabs.setExpanding(False)
+        self.tabs.setDocumentMode(True)
+        self.tabs.currentChanged.connect(self.list_changed_signal.emit)
+        self.tabs.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tabs.customContextMenuRequested.connect(self.show_tab_menu)
+
+        # Buscador
+        self.search_box.setPlaceholderText("Buscar título, artista o álbum...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.search_signal.emit)
+        
         # Layout principal
         layout = QVBoxLayout()
         layout.addLayout(button_layout)
+        layout.addWidget(self.tabs)
+        layout.addWidget(self.search_box)
         layout.addWidget(self.playlist)
         self.setLayout(layout)
         
@@ -195,7 +3650,9 @@ class PlaylistWindow(QWidget):
         # Configurar tamaño de botones
         button_size = 24
         icon_size = 16
-        for button in [self.btn_add, self.btn_up, self.btn_down, self.btn_remove]:
+        for button in [self.btn_add, self.btn_url, self.btn_up, self.btn_down, self.btn_remove, self.btn_crop,
+                       self.btn_undo, self.btn_redo, self.btn_duplicates, self.btn_history, self.btn_new_list,
+                       self.btn_smart]:
             button.setFixedSize(button_size, button_size)
             button.setIconSize(QSize(icon_size, icon_size))
             # Eliminar el setStyleSheet individual de los botones
@@ -208,16 +3665,108 @@ class PlaylistWindow(QWidget):
             event.ignore()
 
     def dropEvent(self, event: QDropEvent):
-        """Procesa los archivos soltados"""
-        files = [url.toLocalFile() for url in event.mimeData().urls()]
+        """Procesa los archivos y enlaces soltados"""
+        files = [url_to_entry(url) for url in event.mimeData().urls()]
         for file_path in files:
-            if file_path.lower().endswith(('.mp3', '.wav')):
+            if is_playable(file_path):
                 self.add_file_signal.emit(file_path)
 
-    def play_item(self, item):
+    def set_model(self, model):
+        self.playlist.setModel(model)
+        for column, width in enumerate((180, 120, 120, 60, 70)):
+            self.playlist.setColumnWidth(column, width)
+        self.playlist.horizontalHeader().setStretchLastSection(True)
+
+    def add_tab(self, name, smart=False, index=-1):
+        """Agrega la pestaña de una lista (al final si index es -1) sin cambiar la mostrada; devuelve su índice"""
+        self.tabs.blockSignals(True)
+        index = self.tabs.insertTab(index, QIcon.fromTheme('edit-find-replace') if smart else QIcon(), name)
+        self.tabs.blockSignals(False)
+        self.tabs.setTabData(index, smart)
+        if smart:
+            self.tabs.setTabToolTip(index, "Lista inteligente: se actualiza sola según sus reglas")
+        return index
+
+    def set_read_only(self, read_only):
+        """Las listas inteligentes no se editan a mano"""
+        for button in [self.btn_add, self.btn_url, self.btn_up, self.btn_down, self.btn_remove, self.btn_crop]:
+            button.setEnabled(not read_only)
+        self.playlist.setDragDropMode(QTableView.NoDragDrop if read_only else QTableView.InternalMove)
+
+    def show_tab_menu(self, pos):
+        """Menú de las pestañas: crear una lista y editar o eliminar la pulsada"""
+        index = self.tabs.tabAt(pos)
+        menu = QMenu(self)
+        new_action = menu.addAction("Nueva lista")
+        rename_action = delete_action = edit_smart_action = delete_smart_action = None
+        if index >= 0 and self.tabs.tabData(index):
+            menu.addSeparator()
+            edit_smart_action = menu.addAction("Editar reglas...")
+            delete_smart_action = menu.addAction("Eliminar lista inteligente")
+        elif index >= 0:
+            menu.addSeparator()
+            rename_action = menu.addAction("Renombrar...")
+            delete_action = menu.addAction("Eliminar lista")
+            # Siempre queda al menos una lista normal donde agregar pistas
+            delete_action.setEnabled(sum(not self.tabs.tabData(i) for i in range(self.tabs.count())) > 1)
+        action = menu.exec_(self.tabs.mapToGlobal(pos))
+        if action is None:
+            return
+        if action == new_action:
+            self.new_list_signal.emit()
+        elif action == rename_action:
+            self.rename_list_signal.emit(index)
+        elif action == delete_action:
+            self.delete_list_signal.emit(index)
+        elif action == edit_smart_action:
+            self.edit_smart_signal.emit(index)
+        elif action == delete_smart_action:
+            self.delete_smart_signal.emit(index)
+
+    def play_item(self, index):
         """Emite la señal para reproducir el archivo seleccionado"""
-        index = self.playlist.row(item)
-        self.play_signal.emit(str(index))
+        self.play_signal.emit(str(index.row()))
+
+    def on_sort_indicator_changed(self, column, order):
+        if column >= 0:
+            self.sort_signal.emit(column, order == Qt.DescendingOrder)
+
+    def clear_sort_indicator(self):
+        """El usuario reordenó a mano: la lista deja de estar ordenada por columna"""
+        header = self.playlist.horizontalHeader()
+        header.blockSignals(True)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        header.blockSignals(False)
+
+    def set_undo_state(self, can_undo, can_redo):
+        self.btn_undo.setEnabled(can_undo)
+        self.btn_redo.setEnabled(can_redo)
+
+    def drop_rows(self, rows, target):
+        self.clear_sort_indicator()
+        self.drop_rows_signal.emit(rows, target)
+
+    def show_context_menu(self, pos):
+        """Muestra el menú de cola para la fila bajo el cursor"""
+        index = self.playlist.indexAt(pos)
+        if not index.isValid():
+            return
+        row = index.row()
+        menu = QMenu(self)
+        play_next_action = menu.addAction("Reproducir a continuación")
+        enqueue_action = menu.addAction("Agregar a la cola")
+        menu.addSeparator()
+        remove_action = menu.addAction("Quitar seleccionadas")
+        crop_action = menu.addAction("Conservar solo la selección")
+        action = menu.exec_(self.playlist.viewport().mapToGlobal(pos))
+        if action == play_next_action:
+            self.queue_signal.emit(row, True)
+        elif action == enqueue_action:
+            self.queue_signal.emit(row, False)
+        elif action == remove_action:
+            self.remove_audio()
+        elif action == crop_action:
+            self.crop_audio()
 
     def add_audio(self):
         """Abre diálogo para seleccionar archivo"""
@@ -225,48 +3774,266 @@ class PlaylistWindow(QWidget):
             self, 
             "Selecciona un archivo de audio", 
             "", 
-            "Audio Files (*.mp3 *.wav)"
+            "Audio Files (*.mp3 *.wav *.cue)"
         )
         if filename:
             self.add_file_signal.emit(filename)
 
-    def move_up(self):
-        current = self.playlist.currentRow()
-        if current > 0:
-            item = self.playlist.takeItem(current)
-            self.playlist.insertItem(current - 1, item)
-            self.playlist.setCurrentRow(current - 1)
-            if isinstance(self.parent(), AudioPlayer):
-                self.parent().sync_playlist_with_widget()
+    def add_url(self):
+        """Pide la URL de una emisión o de un archivo remoto"""
+        url, ok = QInputDialog.getText(self, "Agregar URL", "URL de la emisión o del archivo (http/https):")
+        url = url.strip()
+        if ok and url:
+            if is_stream_url(url):
+                self.add_file_signal.emit(url)
+            else:
+                QMessageBox.warning(self, "Error", "Solo se admiten URLs http:// y https://")
+
+    def move_up(self):
+        rows = self.playlist.selected_rows()
+        if rows:
+            self.clear_sort_indicator()
+            self.move_rows_signal.emit(rows, -1)
+
+    def move_down(self):
+        rows = self.playlist.selected_rows()
+        if rows:
+            self.clear_sort_indicator()
+            self.move_rows_signal.emit(rows, 1)
+
+    def remove_audio(self):
+        rows = self.playlist.selected_rows()
+        if rows:
+            self.remove_rows_signal.emit(rows)
+
+    def crop_audio(self):
+        rows = self.playlist.selected_rows()
+        if rows:
+            self.crop_rows_signal.emit(rows)
+
+    def closeEvent(self, event):
+        """Guardar geometría y estado al cerrar"""
+        save_window_state('playlist', self.geometry(), self.windowState())
+        event.accept()
+
+
+class DuplicatesDialog(QDialog):
+    """Muestra los grupos de pistas duplicadas y permite quitarlas de la lista"""
+    remove_signal = pyqtSignal(list)
+
+    def __init__(self, exact_groups, similar_groups, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Pistas duplicadas")
+        icon_path = get_icon_path()
+        if icon_path:
+            self.setWindowIcon(QIcon(icon_path))
+        self.exact_groups = exact_groups
+        self.similar_groups = similar_groups
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        for title, groups in (("Idénticas", exact_groups), ("Posibles duplicados (huella de audio)", similar_groups)):
+            if not groups:
+                continue
+            root = QTreeWidgetItem([f"{title}: {len(groups)} grupos"])
+            self.tree.addTopLevelItem(root)
+            for group in groups:
+                group_item = QTreeWidgetItem([os.path.basename(group[0])])
+                group_item.setToolTip(0, group[0])
+                for path in group:
+                    child = QTreeWidgetItem([path])
+                    child.setToolTip(0, path)
+                    group_item.addChild(child)
+                root.addChild(group_item)
+            root.setExpanded(True)
+
+        self.btn_merge = QPushButton("Quitar duplicados de la lista")
+        self.btn_merge.setToolTip("Conserva la primera aparición de cada grupo de pistas idénticas")
+        self.btn_merge.setEnabled(bool(exact_groups))
+        self.btn_merge.clicked.connect(self.merge_duplicates)
+
+        layout = QVBoxLayout()
+        if not exact_groups and not similar_groups:
+            layout.addWidget(QLabel("No se encontraron duplicados"))
+        layout.addWidget(self.tree)
+        layout.addWidget(self.btn_merge)
+        self.setLayout(layout)
+        self.resize(500, 350)
+
+    def merge_duplicates(self):
+        """Emite las rutas sobrantes de cada grupo idéntico"""
+        to_remove = [path for group in self.exact_groups for path in group[1:]]
+        self.remove_signal.emit(to_remove)
+        self.accept()
+
+class HistoryWindow(QWidget):
+    """Vista del historial junto a la lista: más escuchadas, recientes y más saltadas"""
+    play_signal = pyqtSignal(str)
+
+    VIEWS = (("Más escuchadas", 'plays'), ("Escuchadas recientemente", 'recent'), ("Más saltadas", 'skips'))
+    LIMIT = 200
+
+    def __init__(self, library):
+        super().__init__()
+        self.setWindowTitle("Historial de reproducción")
+        icon_path = get_icon_path()
+        if icon_path:
+            self.setWindowIcon(QIcon(icon_path))
+        self.library = library
+
+        self.view_combo = QComboBox()
+        for text, order in HistoryWindow.VIEWS:
+            self.view_combo.addItem(text, order)
+        self.view_combo.currentIndexChanged.connect(self.refresh)
+        self.totals_label = QLabel()
+        self.tree = QTreeWidget()
+        self.tree.setRootIsDecorated(False)
+        self.tree.setHeaderLabels(["Pista", "Veces", "Completas", "Saltadas", "Saltos", "Última vez"])
+        self.tree.setColumnWidth(0, 220)
+        self.tree.itemDoubleClicked.connect(lambda item, column: self.play_signal.emit(item.toolTip(0)))
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.view_combo)
+        layout.addWidget(self.tree)
+        layout.addWidget(self.totals_label)
+        self.setLayout(layout)
+        self.load_saved_geometry()
+
+    def load_saved_geometry(self):
+        """Carga la geometría guardada del archivo JSON"""
+        try:
+            state = load_window_state('history', (520, 200, 460, 400))
+            self.setGeometry(state['x'], state['y'], state['width'], state['height'])
+            if state['state']:
+                self.setWindowState(Qt.WindowState(state['state']))
+        except Exception as e:
+            print(f"Error al cargar geometría: {e}")
+
+    def refresh(self):
+        """Vuelve a consultar la vista elegida (solo si la ventana está a la vista)"""
+        if not self.isVisible():
+            return
+        try:
+            rows = self.library.play_stats(self.view_combo.currentData(), HistoryWindow.LIMIT)
+            plays, skips = self.library.play_totals()
+        except sqlite3.Error as e:
+            print(f"Error al leer el historial: {e}")  # Debug
+            return
+        self.tree.clear()
+        items = []
+        for path, starts, finishes, skips_count, last_played in rows:
+            name = os.path.basename(path) if not is_stream_url(path) else path
+            rate = f"{100 * skips_count // starts} %" if starts else ''
+            last = time.strftime('%Y-%m-%d %H:%M', time.localtime(last_played)) if last_played else ''
+            item = QTreeWidgetItem([name, str(starts), str(finishes), str(skips_count), rate, last])
+            item.setToolTip(0, path)
+            items.append(item)
+        self.tree.addTopLevelItems(items)
+        rate = f" · {100 * skips // plays} % saltadas" if plays else ''
+        self.totals_label.setText(f"{plays} reproducciones{rate}")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def closeEvent(self, event):
+        """Guardar geometría al cerrar"""
+        save_window_state('history', self.geometry(), self.windowState())
+        event.accept()
+
+class SmartPlaylistDialog(QDialog):
+    """Nombre y reglas de una lista inteligente"""
 
-    def move_down(self):
-        current = self.playlist.currentRow()
-        if current < self.playlist.count() - 1:
-            item = self.playlist.takeItem(current)
-            self.playlist.insertItem(current + 1, item)
-            self.playlist.setCurrentRow(current + 1)
-            if isinstance(self.parent(), AudioPlayer):
-                self.parent().sync_playlist_with_widget()
+    def __init__(self, name='', rules=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Lista inteligente")
+        icon_path = get_icon_path()
+        if icon_path:
+            self.setWindowIcon(QIcon(icon_path))
+        rules = rules or {'match': 'all', 'conditions': [['artist', 'contains', '']]}
 
-    def remove_audio(self):
-        current = self.playlist.currentRow()
-        if current >= 0:
-            self.playlist.takeItem(current)
-            if isinstance(self.parent(), AudioPlayer):
-                self.parent().sync_playlist_with_widget()
+        self.name_edit = QLineEdit(name)
+        self.name_edit.setPlaceholderText("Nombre de la lista")
+        self.match_combo = QComboBox()
+        self.match_combo.addItem("Cumplir todas las condiciones", 'all')
+        self.match_combo.addItem("Cumplir alguna condición", 'any')
+        self.match_combo.setCurrentIndex(max(0, self.match_combo.findData(rules.get('match', 'all'))))
+        self.rules_layout = QVBoxLayout()
+        self.rule_rows = []  # (fila, campo, operador, valor)
+        for field, op, value in rules.get('conditions', []):
+            self.add_rule(field, op, value)
 
-    def closeEvent(self, event):
-        """Guardar geometría y estado al cerrar"""
-        save_window_state('playlist', self.geometry(), self.windowState())
-        event.accept()
+        btn_add_rule = QPushButton("Agregar condición")
+        btn_add_rule.clicked.connect(lambda: self.add_rule())
+        btn_ok = QPushButton("Aceptar")
+        btn_ok.clicked.connect(self.accept)
+        btn_cancel = QPushButton("Cancelar")
+        btn_cancel.clicked.connect(self.reject)
+        buttons = QHBoxLayout()
+        buttons.addWidget(btn_add_rule)
+        buttons.addStretch()
+        buttons.addWidget(btn_ok)
+        buttons.addWidget(btn_cancel)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.name_edit)
+        layout.addWidget(self.match_combo)
+        layout.addLayout(self.rules_layout)
+        layout.addStretch()
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.resize(480, 260)
+
+    def add_rule(self, field='artist', op='contains', value=''):
+        row = QWidget()
+        row_layout = QHBoxLayout(row)
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        field_combo = QComboBox()
+        for key, (label, _, _) in SmartPlaylists.FIELDS.items():
+            field_combo.addItem(label, key)
+        op_combo = QComboBox()
+        value_edit = QLineEdit(str(value) if value != '' else '')
+        btn_remove = QPushButton()
+        btn_remove.setIcon(QIcon.fromTheme('list-remove'))
+        btn_remove.setToolTip('Quitar condición')
+        btn_remove.setFixedSize(24, 24)
+        entry = (row, field_combo, op_combo, value_edit)
+        field_combo.currentIndexChanged.connect(lambda index: self.fill_ops(op_combo, field_combo.currentData()))
+        btn_remove.clicked.connect(lambda: self.remove_rule(entry))
+        field_combo.setCurrentIndex(max(0, field_combo.findData(field)))
+        self.fill_ops(op_combo, field_combo.currentData())
+        op_combo.setCurrentIndex(max(0, op_combo.findData(op)))
+        for widget in (field_combo, op_combo):
+            row_layout.addWidget(widget)
+        row_layout.addWidget(value_edit, 1)
+        row_layout.addWidget(btn_remove)
+        self.rules_layout.addWidget(row)
+        self.rule_rows.append(entry)
+
+    @staticmethod
+    def fill_ops(op_combo, field):
+        op_combo.clear()
+        ops = SmartPlaylists.TEXT_OPS if SmartPlaylists.FIELDS[field][1] == 'text' else SmartPlaylists.NUMBER_OPS
+        for key, (label, _) in ops.items():
+            op_combo.addItem(label, key)
 
-    def sync_playlist_with_widget(self):
-        """Sincroniza la lista interna con el orden visual del QListWidget."""
-        new_playlist = []
-        for i in range(self.playlist_window.playlist.count()):
-            item = self.playlist_window.playlist.item(i)
-            new_playlist.append(item.toolTip())  # Obtiene la ruta completa del archivo
-        self.playlist = new_playlist  # Actualiza la lista interna
+    def remove_rule(self, entry):
+        self.rule_rows.remove(entry)
+        entry[0].deleteLater()
+
+    def definition(self):
+        """(nombre, reglas); las condiciones numéricas con un valor no válido se descartan"""
+        conditions = []
+        for _, field_combo, op_combo, value_edit in self.rule_rows:
+            field, value = field_combo.currentData(), value_edit.text().strip()
+            if SmartPlaylists.FIELDS[field][1] == 'number':
+                try:
+                    value = float(value.replace(',', '.'))
+                except ValueError:
+                    continue
+            conditions.append([field, op_combo.currentData(), value])
+        name = self.name_edit.text().strip() or "Lista inteligente"
+        return name, {'match': self.match_combo.currentData(), 'conditions': conditions}
 
 class AudioPlayer(QWidget):
     def __init__(self):
@@ -275,14 +4042,16 @@ class AudioPlayer(QWidget):
         # Establecer el título de la ventana
         self.setWindowTitle("Hero Music Player")  # Añadir esta línea
     
-        # Inicializar pygame.mixer al inicio
+        self.settings = QSettings('Player', 'AudioPlayer')
+        # Reloj común de los refrescos de la interfaz (barra, visualizador, estadísticas)
+        self.refresh = RefreshScheduler(self)
+
+        # Inicializar pygame.mixer al inicio con la configuración de salida guardada
         try:
-            pygame.mixer.init()
+            self.init_mixer()
         except pygame.error:
             QMessageBox.warning(self, "Error", "No se pudo inicializar el sistema de audio")
         
-        self.settings = QSettings('Player', 'AudioPlayer')
-        
         # Crear el tray icon primero
         self.tray_icon = QSystemTrayIcon(self)
         
@@ -342,9 +4111,38 @@ class AudioPlayer(QWidget):
         self.btn_playlist = QPushButton()
         self.btn_playlist.setIcon(QIcon.fromTheme('view-list'))
         
+        self.btn_prev = QPushButton()
+        self.btn_prev.setIcon(QIcon.fromTheme('media-skip-backward'))
+        self.btn_prev.setToolTip('Anterior')
+        
+        self.btn_next = QPushButton()
+        self.btn_next.setIcon(QIcon.fromTheme('media-skip-forward'))
+        self.btn_next.setToolTip('Siguiente')
+        
+        self.btn_shuffle = QPushButton()
+        self.btn_shuffle.setIcon(QIcon.fromTheme('media-playlist-shuffle'))
+        self.btn_shuffle.setToolTip('Aleatorio')
+        self.btn_shuffle.setCheckable(True)
+        
+        self.btn_repeat = QPushButton()
+        self.btn_repeat.setIcon(QIcon.fromTheme('media-playlist-repeat'))
+        self.btn_repeat.setToolTip('Repetir: desactivado')
+        
         self.volume_button = QPushButton()
         self.volume_button.setIcon(QIcon.fromTheme('audio-volume-high'))
         self.volume_button.setToolTip('Volumen')
+
+        # Velocidad de reproducción (conserva el tono)
+        self.speed_button = QPushButton()
+        self.speed_button.setToolTip('Velocidad (conserva el tono)')
+        self.speed_menu = QMenu(self)
+        for speed in (0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0):
+            action = self.speed_menu.addAction(f"{speed:g}×")
+            action.setData(speed)
+            action.setCheckable(True)
+            action.triggered.connect(lambda checked, speed=speed: self.set_playback_speed(speed))
+        self.speed_button.setMenu(self.speed_menu)
+        self.speed_button.setFixedHeight(button_size)
         
         self.btn_config = QPushButton()
         self.btn_config.setIcon(QIcon.fromTheme('preferences-system'))
@@ -352,7 +4150,8 @@ class AudioPlayer(QWidget):
 
         # Configurar tamaño de todos los botones
         for button in [self.btn_load, self.btn_play, self.btn_pause, 
-                      self.btn_stop, self.btn_playlist, 
+                      self.btn_stop, self.btn_prev, self.btn_next,
+                      self.btn_shuffle, self.btn_repeat, self.btn_playlist, 
                       self.volume_button, self.btn_config]:
             button.setFixedSize(button_size, button_size)
             button.setIconSize(QSize(icon_size, icon_size))
@@ -362,6 +4161,10 @@ class AudioPlayer(QWidget):
         self.btn_play.clicked.connect(self.play_audio)
         self.btn_pause.clicked.connect(self.pause_audio)
         self.btn_stop.clicked.connect(self.stop_audio)
+        self.btn_prev.clicked.connect(self.play_previous)
+        self.btn_next.clicked.connect(self.play_next)
+        self.btn_shuffle.toggled.connect(self.toggle_shuffle)
+        self.btn_repeat.clicked.connect(self.cycle_repeat)
         self.btn_playlist.clicked.connect(self.show_playlist)
         self.btn_config.clicked.connect(self.show_config)
         
@@ -379,10 +4182,25 @@ class AudioPlayer(QWidget):
             print(f"Error al cargar geometría: {e}")
 
         self.setMinimumSize(400, 150)  # Tamaño mínimo para que se vean todos los controles
-        pygame.mixer.init()
         self.current_file = None
         self.is_paused = False
         self.audio_length = 0
+        self.silence = None  # SilenceInfo de la pista actual si se saltan silencios
+        self.silence_scanner = None
+        self.cue_index = CueIndex()
+        self.segment = None  # CueTrack que suena: un tramo del archivo cargado
+        self.current_media = None  # Archivo cargado en la salida (el de la hoja si es una pista virtual)
+        # Salidas de audio: SDL decodifica con music; los WAV van por la ruta PCM mapeada
+        self.music_output = MusicOutput()
+        self.stream_output = StreamOutput() if np is not None else None
+        if self.stream_output is not None:
+            self.stream_output.block_frames = max(StreamOutput.BLOCK_FRAMES, self.mixer_buffer)
+        self.playback_speed = 1.0
+        self.output = self.music_output
+        self.pcm_cache = None
+        if np is not None:
+            cache_mb = self.settings.value('pcm_cache_mb', 256, type=int)
+            self.pcm_cache = PCMCache(cache_mb * 1024 * 1024)
 
         # Definir tamaños de botones e iconos al inicio
         button_size = 24
@@ -390,7 +4208,8 @@ class AudioPlayer(QWidget):
 
         # Configurar botones sin estilos individuales
         for button in [self.btn_load, self.btn_play, self.btn_pause, 
-                      self.btn_stop, self.btn_playlist, 
+                      self.btn_stop, self.btn_prev, self.btn_next,
+                      self.btn_shuffle, self.btn_repeat, self.btn_playlist, 
                       self.volume_button, self.btn_config]:
             button.setFixedSize(button_size, button_size)
             button.setIconSize(QSize(icon_size, icon_size))
@@ -486,14 +4305,19 @@ class AudioPlayer(QWidget):
         
         # Layout central para los botones de control
         center_layout = QHBoxLayout()
+        center_layout.addWidget(self.btn_prev)
         center_layout.addWidget(self.btn_play)
         center_layout.addWidget(self.btn_pause)
         center_layout.addWidget(self.btn_stop)
+        center_layout.addWidget(self.btn_next)
+        center_layout.addWidget(self.btn_shuffle)
+        center_layout.addWidget(self.btn_repeat)
         center_layout.addWidget(self.btn_playlist)
         
         # Layout derecho para volumen y configuración
         right_layout = QHBoxLayout()
         right_layout.addStretch()
+        right_layout.addWidget(self.speed_button)
         right_layout.addWidget(self.volume_button)
         right_layout.addWidget(self.btn_config)
         
@@ -505,20 +4329,137 @@ class AudioPlayer(QWidget):
         # Layout principal
         layout = QVBoxLayout()
         layout.addWidget(self.label)
+        self.spectrum = None
+        self.pcm_decoder = None
+        if self.pcm_cache is not None:
+            self.pcm_decoder = PCMDecoder(self.pcm_cache, self)
+            self.pcm_decoder.decoded.connect(self.on_track_decoded)
+            self.pcm_decoder.done.connect(lambda _: self.update_speed_button())  # También si no cupo
+            self.pcm_decoder.status.connect(self.config_window.decode_status.setText)
+            QApplication.instance().aboutToQuit.connect(self.pcm_decoder.stop)
+        self.music_pcm = None  # DecodedSource de la pista que suena por music (visualizador)
+        self.pinned_file = None  # Pista actual fijada en la caché PCM
+        # Emisiones HTTP/Icecast: descarga con lectura anticipada y decodificación de SDL
+        self.network_output = NetworkOutput(self)
+        self.network_output.status_changed.connect(self.on_stream_status)
+        QApplication.instance().aboutToQuit.connect(self.network_output.shutdown)
+        if np is not None:
+            self.spectrum = SpectrumWidget(self.pcm_window, self.refresh, self)
+            if pygame.mixer.get_init():
+                self.spectrum.analyzer.set_sample_rate(pygame.mixer.get_init()[0])
+            self.spectrum.setVisible(False)
+            layout.addWidget(self.spectrum)
         layout.addWidget(self.seekbar)
         layout.addLayout(buttons_layout)
         self.setLayout(layout)
+        self.set_spectrum_enabled(self.settings.value('show_spectrum', False, type=bool))
 
-        self.timer = QTimer()
-        self.timer.setInterval(500)
-        self.timer.timeout.connect(self.update_seekbar)
+        self.refresh.register('seekbar', self.update_seekbar, 500, self)
+        # Guardar una lista grande no debe retrasar el arranque de una pista: va en un tick aparte
+        self.refresh.register('release_playlists', self.release_idle_playlists, 5000)
+        # El final de pista se detecta aparte con un disparo único al terminar la duración,
+        # así la cola avanza aunque la ventana esté oculta y la barra no se refresque
+        self.end_timer = QTimer(self)
+        self.end_timer.setSingleShot(True)
+        self.end_timer.timeout.connect(self.check_track_end)
+        self.speed_button.setEnabled(self.stream_output is not None)  # El estirado necesita NumPy
+        self.set_playback_speed(self.settings.value('playback_speed', 1.0, type=float))
 
         # Agregamos la lista de reproducción
         self.playlist_window = PlaylistWindow()
-        self.playlist = []
+        # Las listas se guardan en library.db y solo se cargan la mostrada y la que suena. Cada
+        # lista cargada lleva sus registros de pistas (compartidos por la tabla y el motor de la
+        # cola, que lee el orden de la lista, modificada siempre en sitio) y su índice de búsqueda
+        self.library = MusicLibrary()
+        self.playlists = Playlists(self.library.conn)
+        self.playlist_states = []
+        for playlist_id, name in self.playlists.all():
+            self.playlist_states.append(PlaylistState(name, self, playlist_id=playlist_id))
+            self.playlist_window.add_tab(name)
+        shown_id = self.settings.value('playlist', 0, type=int)
+        index = next((i for i, state in enumerate(self.playlist_states) if state.playlist_id == shown_id), 0)
+        state = self.playlist_states[index]
+        self.load_playlist_state(state)
+        self.playing = state  # Lista cuya cola sigue la reproducción
+        self.bind_playlist_state(state)
+        self.playlist_window.tabs.blockSignals(True)
+        self.playlist_window.tabs.setCurrentIndex(index)
+        self.playlist_window.tabs.blockSignals(False)
+        self.playlist_window.set_model(self.playlist_model)
+        QApplication.instance().aboutToQuit.connect(self.save_playlists)
+        self.update_repeat_button()
+        self.btn_shuffle.setChecked(self.settings.value('shuffle', False, type=bool))
         # Conectar señales
         self.playlist_window.play_signal.connect(self.play_from_playlist)
         self.playlist_window.add_file_signal.connect(self.add_file_to_playlist)
+        self.playlist_window.queue_signal.connect(self.queue_from_playlist)
+        self.playlist_window.remove_rows_signal.connect(self.remove_playlist_rows)
+        self.playlist_window.crop_rows_signal.connect(self.crop_playlist_rows)
+        self.playlist_window.move_rows_signal.connect(self.shift_playlist_rows)
+        self.playlist_window.drop_rows_signal.connect(self.drop_playlist_rows)
+        self.playlist_window.undo_signal.connect(self.undo_playlist_edit)
+        self.playlist_window.redo_signal.connect(self.redo_playlist_edit)
+        self.playlist_window.find_duplicates_signal.connect(self.find_duplicates)
+        self.playlist_window.history_signal.connect(self.show_history)
+        self.playlist_window.list_changed_signal.connect(self.switch_playlist)
+        self.playlist_window.new_list_signal.connect(self.new_playlist)
+        self.playlist_window.rename_list_signal.connect(self.rename_playlist)
+        self.playlist_window.delete_list_signal.connect(self.delete_playlist)
+        self.playlist_window.new_smart_signal.connect(self.new_smart_playlist)
+        self.playlist_window.edit_smart_signal.connect(self.edit_smart_playlist)
+        self.playlist_window.delete_smart_signal.connect(self.delete_smart_playlist)
+        self.playlist_window.sort_signal.connect(self.sort_playlist)
+        self.duplicate_worker = None
+
+        # Filtro de la lista mostrada
+        self.visible_keys = None  # Claves que pasan el filtro (None = todas)
+        self.row_of = None  # ruta -> fila, se reconstruye tras editar la lista
+        self.playlist_window.search_signal.connect(self.filter_playlist)
+
+        # Biblioteca: indexador en segundo plano y vigilancia de carpetas
+        self.library_indexer = LibraryIndexer(self.library.db_path, self)
+        self.library_watcher = QFileSystemWatcher(self)
+        self.library_watcher.directoryChanged.connect(self.on_library_dir_changed)
+        self.library_indexer.dirs_found.connect(self.watch_library_dirs)
+        self.library_indexer.dirs_gone.connect(self.unwatch_library_dirs)
+        self.library_indexer.status.connect(self.config_window.library_status.setText)
+        self.library_indexer.tracks_changed.connect(self.on_library_tracks_changed)
+        self.changed_library_dirs = set()
+        self.library_rescan_timer = QTimer(self)
+        self.library_rescan_timer.setSingleShot(True)
+        self.library_rescan_timer.setInterval(1000)  # Agrupa ráfagas de eventos
+        self.library_rescan_timer.timeout.connect(self.rescan_changed_library_dirs)
+        self.library_indexer.start()
+        self.library_indexer.enqueue('startup')
+        QApplication.instance().aboutToQuit.connect(self.library_indexer.stop)
+        self.config_window.load_library_roots()
+
+        # Historial de reproducción: la reproducción solo encola eventos, un hilo los escribe
+        self.history = PlayHistory(self.library.db_path, self)
+        self.history_track = None  # Pista con inicio anotado y sin final todavía
+        self.history_window = HistoryWindow(self.library)
+        self.history_window.play_signal.connect(self.play_from_history)
+        self.history.recorded.connect(self.on_history_recorded)
+        self.history.start()
+        QApplication.instance().aboutToQuit.connect(self.close_history)
+
+        # Listas inteligentes: materializadas en library.db y mantenidas por rutas cambiadas
+        self.smart = SmartPlaylists(self.library.conn)
+        self.smart.refresh_relative()
+        for playlist_id, name, rules in self.smart.all():
+            self.playlist_states.append(PlaylistState(name, self, playlist_id))
+            self.playlist_window.add_tab(name, smart=True)
+
+        # Silencios al principio, al final y dentro de las pistas (se analizan una vez y se guardan)
+        if np is not None:
+            self.silence_scanner = SilenceScanner(self.library.db_path, self)
+            self.silence_scanner.analyzed.connect(self.on_silence_analyzed)
+            self.silence_scanner.status.connect(self.config_window.silence_status.setText)
+            self.silence_scanner.start()
+            QApplication.instance().aboutToQuit.connect(self.silence_scanner.stop)
+            self.library_indexer.tracks_changed.connect(self.on_library_silence_changed)
+            if self.skip_silence():
+                self.silence_scanner.enqueue_library()
 
         self.setAcceptDrops(True)  # Habilitar drops en la ventana principal
 
@@ -526,128 +4467,938 @@ class AudioPlayer(QWidget):
         """Muestra la ventana de la lista de reproducción"""
         self.playlist_window.show()
 
-    def sync_playlist_with_widget(self):
-        """Sincroniza la lista interna con el orden visual del QListWidget."""
-        new_playlist = []
-        for i in range(self.playlist_window.playlist.count()):
-            item = self.playlist_window.playlist.item(i)
-            new_playlist.append(item.toolTip())  # Obtiene la ruta completa del archivo
-        self.playlist = new_playlist  # Actualiza la lista interna
+    def bind_playlist_state(self, state):
+        """Expone una lista en los atributos con los que trabajan la tabla, las ediciones y el buscador"""
+        self.shown = state
+        self.playlist = state.playlist
+        self.tracks = state.tracks
+        self.playlist_model = state.model
+        self.queue = state.queue
+        self.search_index = state.search_index
+        self.undo_stack = state.undo_stack
+        self.redo_stack = state.redo_stack
+        self.row_of = None
+
+    def switch_playlist(self, index):
+        """Muestra otra lista; la que suena sigue con su propia cola"""
+        state = self.playlist_states[index]
+        if state is self.shown:
+            return
+        if not state.loaded:
+            self.load_playlist_state(state)
+        self.bind_playlist_state(state)
+        self.release_hidden_playlists()
+        if state.playlist_id is not None:
+            self.settings.setValue('playlist', state.playlist_id)
+        self.visible_keys = None  # Las filas ocultas son de la vista: el filtro se vuelve a aplicar
+        self.playlist_window.set_model(state.model)
+        self.playlist_window.set_read_only(state.smart_id is not None)
+        self.playlist_window.clear_sort_indicator()
+        self.playlist_window.set_undo_state(bool(self.undo_stack), bool(self.redo_stack))
+        text = self.playlist_window.search_box.text()
+        if text:
+            self.apply_filter(text, full=True)
+        if self.playlist_window.tabs.currentIndex() != index:
+            self.playlist_window.tabs.setCurrentIndex(index)
+
+    def show_editable_playlist(self):
+        """Lo que se agrega a mano va a la lista normal aunque se esté viendo una inteligente"""
+        if self.shown.smart_id is not None:
+            self.switch_playlist(0)
+
+    def new_playlist_queue(self, state):
+        """La cola de una lista recién cargada sigue el aleatorio y la repetición guardados"""
+        state.queue.repeat = self.settings.value('repeat_mode', PlayQueue.REPEAT_OFF, type=int)
+        state.queue.set_shuffle(self.settings.value('shuffle', False, type=bool))
+
+    def load_playlist_state(self, state):
+        """Lee de library.db el contenido de una lista descargada al mostrarla"""
+        self.new_playlist_queue(state)
+        if state.smart_id is not None:
+            self.update_smart_state(state, self.smart.members(state.smart_id), [])
+        else:
+            items = self.playlists.items(state.playlist_id)
+            for filename, info in items:
+                self.index_track(state.tracks.add(filename, info), state.search_index)
+            state.model.insert_range(0, [filename for filename, _ in items])
+            for row, (filename, _) in enumerate(items):
+                state.queue.track_inserted(row, filename)
+            state.search_index.merge_pending()
+        state.loaded = True
+        state.dirty = False
+
+    def save_playlist_state(self, state):
+        if state.playlist_id is not None and state.loaded and state.dirty:
+            self.playlists.save(state.playlist_id, [state.tracks[filename] for filename in state.playlist])
+            state.dirty = False
+
+    def release_hidden_playlists(self):
+        """Guarda y descarga las listas que ni se muestran ni suenan"""
+        for state in self.playlist_states:
+            if state.loaded and state is not self.shown and (state is not self.playing or not self.current_file):
+                self.save_playlist_state(state)
+                state.unload()
+
+    def release_idle_playlists(self):
+        """Disparo único del reloj tras cambiar de lista la reproducción"""
+        self.refresh.set_active('release_playlists', False)
+        self.release_hidden_playlists()
+
+    def save_playlists(self):
+        for state in self.playlist_states:
+            self.save_playlist_state(state)
+
+    def new_playlist(self):
+        """Crea una lista normal vacía, tras las demás normales, y la muestra"""
+        manual = sum(state.smart_id is None for state in self.playlist_states)
+        name, ok = QInputDialog.getText(self.playlist_window, "Nueva lista", "Nombre de la lista:",
+                                        text=f"Lista {manual + 1}")
+        name = name.strip()
+        if not ok or not name:
+            return
+        state = PlaylistState(name, self, playlist_id=self.playlists.create(name))
+        self.new_playlist_queue(state)
+        state.loaded = True
+        self.playlist_states.insert(manual, state)
+        self.switch_playlist(self.playlist_window.add_tab(name, index=manual))
+
+    def rename_playlist(self, index):
+        state = self.playlist_states[index]
+        name, ok = QInputDialog.getText(self.playlist_window, "Renombrar lista", "Nombre de la lista:",
+                                        text=state.name)
+        name = name.strip()
+        if ok and name:
+            state.name = name
+            self.playlists.rename(state.playlist_id, name)
+            self.playlist_window.tabs.setTabText(index, name)
+
+    def delete_playlist(self, index):
+        """Elimina una lista normal (siempre queda al menos una)"""
+        state = self.playlist_states[index]
+        others = [other for other in self.playlist_states if other.smart_id is None and other is not state]
+        if not others:
+            return
+        if QMessageBox.question(self.playlist_window, "Eliminar lista",
+                                f"¿Eliminar la lista «{state.name}»? Los archivos no se borran.") != QMessageBox.Yes:
+            return
+        if state is self.shown:
+            self.switch_playlist(self.playlist_states.index(others[0]))
+        if state is self.playing:
+            self.playing = self.shown  # La pista que suena termina y sigue la lista mostrada
+        self.playlists.delete(state.playlist_id)
+        del self.playlist_states[index]
+        self.playlist_window.tabs.removeTab(index)
+        state.model.deleteLater()
+
+    def update_smart_state(self, state, added, dropped):
+        """Aplica a una lista cargada las rutas que entran (al final) y las que salen"""
+        if dropped:
+            row_of = {filename: i for i, filename in enumerate(state.playlist)}
+            rows = sorted(row_of[filename] for filename in dropped if filename in row_of)
+            keys = [state.playlist[row] for row in rows]
+            for start, stop in reversed(row_runs(rows)):
+                state.model.take_range(start, stop)
+            for row, key in zip(reversed(rows), reversed(keys)):
+                state.queue.track_removed(row, key)
+                state.search_index.remove(key)
+                state.tracks.remove(key)
+        added = [filename for filename in added if filename not in state.tracks]
+        if added:
+            known = self.library.all_track_info() if len(added) > 100 else {}
+            for filename in added:
+                self.load_track(filename, known.get(filename), state)
+            start = len(state.playlist)
+            state.model.insert_range(start, added)
+            for offset, filename in enumerate(added):
+                state.queue.track_inserted(start + offset, filename)
+            state.search_index.merge_pending()
+        if state is self.shown and (added or dropped):
+            self.playlist_edited()
+
+    def apply_smart_changes(self, changes):
+        """Lleva a las listas inteligentes ya cargadas lo que devolvió SmartPlaylists.update_paths"""
+        for state in self.playlist_states:
+            if state.loaded and state.smart_id in changes:
+                self.update_smart_state(state, *changes[state.smart_id])
+
+    def on_history_recorded(self, paths):
+        """Las reproducciones cambian el recuento de las listas que filtran por él"""
+        self.history_window.refresh()
+        self.apply_smart_changes(self.smart.update_paths(list(set(paths)), SmartPlaylists.HISTORY_FIELDS))
+
+    def new_smart_playlist(self):
+        dialog = SmartPlaylistDialog(parent=self.playlist_window)
+        if not dialog.exec_():
+            return
+        name, rules = dialog.definition()
+        state = PlaylistState(name, self, self.smart.create(name, rules))
+        self.playlist_states.append(state)
+        self.switch_playlist(self.playlist_window.add_tab(name, smart=True))
+
+    def edit_smart_playlist(self, index):
+        """Cambia las reglas y vuelve a evaluar la lista entera"""
+        state = self.playlist_states[index]
+        rules = next(rules for playlist_id, _, rules in self.smart.all() if playlist_id == state.smart_id)
+        dialog = SmartPlaylistDialog(state.name, rules, self.playlist_window)
+        if not dialog.exec_():
+            return
+        state.name, rules = dialog.definition()
+        self.smart.update(state.smart_id, state.name, rules)
+        self.playlist_window.tabs.setTabText(index, state.name)
+        if state.loaded:
+            members = self.smart.members(state.smart_id)
+            current = set(state.playlist)
+            self.update_smart_state(state, [p for p in members if p not in current],
+                                    list(current.difference(members)))
+
+    def delete_smart_playlist(self, index):
+        state = self.playlist_states[index]
+        if QMessageBox.question(self.playlist_window, "Eliminar lista inteligente",
+                                f"¿Eliminar la lista «{state.name}»? Las pistas no se borran.") != QMessageBox.Yes:
+            return
+        if state is self.shown:
+            self.switch_playlist(0)
+        if state is self.playing:
+            self.playing = self.shown  # La pista que suena termina y sigue la lista mostrada
+        self.smart.delete(state.smart_id)
+        del self.playlist_states[index]
+        self.playlist_window.tabs.removeTab(index)
+        state.model.deleteLater()
+
+    def show_history(self):
+        """Muestra el historial junto a la lista de reproducción"""
+        if not self.history_window.isVisible():
+            frame = self.playlist_window.frameGeometry()
+            self.history_window.move(frame.right() + 1, frame.top())
+        self.history_window.show()
+        self.history_window.raise_()
+
+    def play_from_history(self, filename):
+        """Reproduce una pista del historial, agregándola a la lista si ya no está"""
+        self.add_file_to_playlist(filename)
+        if filename in self.tracks:
+            self.play_from_playlist(self.playlist.index(filename))
+
+    def log_play_start(self, filename, position):
+        self.history.record(filename, PlayHistory.START, position)
+        self.history_track = filename
+
+    def log_play_end(self, event):
+        """Cierra en el historial la pista abierta con un final, un salto o una parada"""
+        if self.history_track is not None:
+            self.history.record(self.history_track, event, self.playback_position())
+            self.history_track = None
+
+    def close_history(self):
+        self.log_play_end(PlayHistory.STOP)
+        self.history.stop()
+
+    # Ediciones de la lista. Cada edición es un paso reversible aplicado por rangos al
+    # modelo de la tabla (que modifica self.playlist) y a la cola a la vez:
+    #   ('remove', filas, rutas, registros)  <->  ('insert', filas, rutas, registros)
+    #   ('move', filas de origen, filas de destino)  <->  ('move', destino, origen)
+    # Las filas son ascendentes; las de 'insert' y el destino de 'move' son posiciones finales.
+
+    def detach_rows(self, rows):
+        """Saca las filas por rangos y devuelve sus rutas en orden"""
+        runs = [self.playlist_model.take_range(start, stop) for start, stop in reversed(row_runs(rows))]
+        return [key for run in reversed(runs) for key in run]
+
+    def attach_rows(self, rows, keys):
+        """Inserta por rangos en las posiciones finales indicadas"""
+        offset = 0
+        for start, stop in row_runs(rows):
+            self.playlist_model.insert_range(start, keys[offset:offset + stop - start])
+            offset += stop - start
+
+    def apply_playlist_step(self, step):
+        """Aplica un paso de edición y devuelve el paso que lo deshace"""
+        if step[0] == 'remove':
+            _, rows, keys, records = step
+            self.detach_rows(rows)
+            for row, key in zip(reversed(rows), reversed(keys)):
+                self.queue.track_removed(row, key)
+                self.search_index.remove(key)
+                self.tracks.remove(key)
+            self.playlist_window.playlist.clearSelection()
+            inverse = ('insert',) + step[1:]
+        elif step[0] == 'insert':
+            _, rows, keys, records = step
+            for track in records:
+                self.tracks.put(track)
+                self.index_track(track)
+            self.attach_rows(rows, keys)
+            for row, key in zip(rows, keys):
+                self.queue.track_inserted(row, key)
+            self.select_playlist_rows(rows)
+            inverse = ('remove',) + step[1:]
+        else:
+            _, old_rows, new_rows = step
+            self.attach_rows(new_rows, self.detach_rows(old_rows))
+            self.queue.tracks_moved(old_rows, new_rows)
+            self.select_playlist_rows(new_rows)
+            inverse = ('move', new_rows, old_rows)
+        self.playlist_edited()
+        return inverse
+
+    def select_playlist_rows(self, rows):
+        """Selecciona las filas por rangos y lleva la vista a la primera"""
+        view = self.playlist_window.playlist
+        selection = QItemSelection()
+        last_column = len(PLAYLIST_COLUMNS) - 1
+        for start, stop in row_runs(rows):
+            selection.select(self.playlist_model.index(start, 0), self.playlist_model.index(stop - 1, last_column))
+        view.selectionModel().select(selection, QItemSelectionModel.ClearAndSelect | QItemSelectionModel.Rows)
+        if rows:
+            first = self.playlist_model.index(rows[0], 0)
+            view.selectionModel().setCurrentIndex(first, QItemSelectionModel.NoUpdate)
+            view.scrollTo(first)
+
+    def edit_playlist(self, step):
+        """Aplica una edición del usuario y la guarda para poder deshacerla"""
+        if self.shown.smart_id is not None:
+            return  # Las listas inteligentes solo cambian con sus reglas
+        self.undo_stack.append(self.apply_playlist_step(step))
+        self.redo_stack.clear()
+        self.playlist_window.set_undo_state(True, False)
+
+    def undo_playlist_edit(self):
+        if self.undo_stack:
+            self.redo_stack.append(self.apply_playlist_step(self.undo_stack.pop()))
+            self.playlist_window.set_undo_state(bool(self.undo_stack), True)
+
+    def redo_playlist_edit(self):
+        if self.redo_stack:
+            self.undo_stack.append(self.apply_playlist_step(self.redo_stack.pop()))
+            self.playlist_window.set_undo_state(True, bool(self.redo_stack))
+
+    def forget_playlist_edits(self):
+        """Descarta el historial tras un cambio que no se registra (p. ej. ordenar)"""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.playlist_window.set_undo_state(False, False)
+
+    def remove_step(self, rows):
+        keys = [self.playlist[row] for row in rows]
+        return ('remove', rows, keys, [self.tracks[key] for key in keys])
+
+    def remove_playlist_rows(self, rows):
+        if rows:
+            self.edit_playlist(self.remove_step(rows))
+
+    def crop_playlist_rows(self, rows):
+        """Conserva solo las filas indicadas quitando el resto"""
+        keep = set(rows)
+        self.remove_playlist_rows([row for row in range(len(self.playlist)) if row not in keep])
+
+    def shift_playlist_rows(self, rows, delta):
+        """Sube o baja un puesto cada fila seleccionada; los bloques pegados al borde no se mueven"""
+        new_rows = list(rows)
+        if delta < 0:
+            limit = -1
+            for i, row in enumerate(rows):
+                new_rows[i] = limit = max(row - 1, limit + 1)
+        else:
+            limit = len(self.playlist)
+            for i in range(len(rows) - 1, -1, -1):
+                new_rows[i] = limit = min(rows[i] + 1, limit - 1)
+        if new_rows != rows:
+            self.edit_playlist(('move', rows, new_rows))
+
+    def drop_playlist_rows(self, rows, target):
+        """Mueve las filas arrastradas como un bloque delante de la fila target"""
+        start = target - bisect.bisect_left(rows, target)
+        new_rows = list(range(start, start + len(rows)))
+        if new_rows != rows:
+            self.edit_playlist(('move', rows, new_rows))
 
     def play_from_playlist(self, index):
         """Reproduce el archivo desde la lista de reproducción."""
         try:
             index = int(index)
-            # Obtener el archivo directamente del QListWidget
-            if 0 <= index < self.playlist_window.playlist.count():
-                filename = self.playlist_window.playlist.item(index).toolTip()
-                if os.path.exists(filename):
-                    self.current_file = filename
-                    self.label.setText(os.path.basename(filename))
-                    pygame.mixer.music.load(filename)
-                    pygame.mixer.music.play()
-                    self.is_paused = False
-                    self.btn_play.setEnabled(False)
-                    self.btn_pause.setEnabled(True)
-                    self.btn_stop.setEnabled(True)
-                    self.seekbar.setEnabled(True)
-                    self.update_audio_length()
-                    self.timer.start()  # Iniciamos el timer para actualizar la barra
+            if 0 <= index < len(self.playlist):
+                filename = self.playlist[index]
+                if self.entry_available(filename):
+                    self.playing = self.shown
+                    self.queue.jump(filename, index)
+                    self.start_track(filename)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error al reproducir el archivo: {str(e)}")
+
+    def start_track(self, filename):
+        """Carga y reproduce un archivo desde el principio"""
+        self.log_play_end(PlayHistory.SKIP)  # Cambiar de pista con otra sonando es saltarla
+        segment = self.cue_index.locate(filename)
+        loaded = (segment is not None and segment.audio == self.current_media
+                  and (self.output.get_busy() or self.is_paused))
+        self.current_file = filename
+        self.label.setText(self.display_name(filename))
+        self.label.setToolTip(filename)
+        self.silence = self.load_silence(filename)
+        if loaded:
+            # Otra pista de la misma hoja CUE: la salida sigue con el archivo ya cargado y
+            # solo salta si hace falta (al acabar una pista, la siguiente empieza justo ahí)
+            self.segment = segment
+            if self.is_paused or abs(self.playback_position() - segment.start) > 0.5:
+                self.output.play(start=segment.start)
+        else:
+            self.open_output(filename)
+            self.output.play(start=self.sound_start())
+            self.request_decode(self.current_media)
+        self.log_play_start(filename, self.sound_start())
+        # La lista que sonaba antes puede haber quedado oculta: se guarda y descarga más tarde
+        self.refresh.set_active('release_playlists', True)
+        self.is_paused = False
+        self.btn_play.setEnabled(False)
+        self.btn_pause.setEnabled(True)
+        self.btn_stop.setEnabled(True)
+        self.seekbar.setEnabled(True)
+        self.update_audio_length()
+        self.set_progress_active(True)
+        self.update_spectrum_state()
+
+    def open_output(self, filename):
+        """Elige la salida para el archivo y lo carga en ella"""
+        self.output.stop()
+        self.output = self.music_output
+        self.segment = self.cue_index.locate(filename)
+        if self.segment is not None:
+            filename = self.segment.audio  # Pista virtual: se carga el archivo entero de la hoja CUE
+        self.current_media = filename
+        if is_stream_url(filename):
+            self.network_output.read_ahead = self.settings.value('stream_read_ahead', 256, type=int) * 1024
+            self.network_output.load(filename)
+            self.output = self.network_output
+            return
+        self.match_native_rate(filename)
+        self.pin_current(filename)
+        source = self.cached_source(filename)
+        if source is not None:
+            # Pista ya decodificada: arranca sin decodificar nada
+            self.stream_output.load(source)
+            self.output = self.stream_output
+            return
+        if self.stream_output is not None and filename.lower().endswith('.wav'):
+            try:
+                source = WavFile(filename)
+            except (OSError, ValueError) as e:
+                print(f"Se usa pygame.mixer.music para {filename}: {e}")  # Debug
+            else:
+                init = pygame.mixer.get_init()
+                if (not StreamOutput.supports(source) and init is not None and init[1] == -16
+                        and PolyphaseResampler.supported(source.rate, init[0])):
+                    source = ResampledSource(source, init[0])  # Remuestreo propio en vez del de SDL
+                if StreamOutput.supports(source):
+                    self.stream_output.load(source)
+                    self.output = self.stream_output
+                    return
+                source.close()
+        self.music_output.load(filename)
+
+    def on_stream_status(self, text):
+        """Título ICY o estado de la conexión de la emisión que suena"""
+        if self.output is self.network_output:
+            self.label.setText(text)
+
+    def pin_current(self, filename):
+        """Fija la pista actual en la caché PCM para que no se expulse mientras suena"""
+        if self.pcm_cache is None or filename == self.pinned_file:
+            return
+        if self.pinned_file is not None:
+            self.pcm_cache.unpin(self.pinned_file)
+        self.pinned_file = filename
+        self.pcm_cache.pin(filename)
+
+    def cached_source(self, filename):
+        """DecodedSource de la pista si está completa en la caché PCM, o None"""
+        if self.pcm_cache is None or filename.lower().endswith('.wav'):
+            return None
+        init = pygame.mixer.get_init()
+        try:
+            mtime = os.stat(filename).st_mtime_ns
+        except OSError:
+            return None
+        if init is None or init[1] != -16:
+            return None
+        track = self.pcm_cache.lookup(filename, mtime, init[0], init[2])
+        if track is None:
+            return None
+        return DecodedSource(self.pcm_cache, filename, track)
+
+    def request_decode(self, filename):
+        """Decodifica en segundo plano la pista que suena por music para la caché PCM"""
+        if self.music_pcm is not None:
+            self.music_pcm.close()
+            self.music_pcm = None
+        # Sin presupuesto no se guarda nada: el visualizador y la velocidad no tienen PCM
+        init = pygame.mixer.get_init()
+        if (self.output is self.music_output and self.pcm_decoder is not None and self.pcm_cache.budget > 0
+                and init is not None and init[1] == -16):
+            self.pcm_decoder.request(filename, init[0], init[2])
+        elif self.pcm_decoder is not None:
+            self.pcm_decoder.cancel()
+        self.update_speed_button()
+
+    def on_track_decoded(self, filename):
+        """La pista actual ya está en la caché: el visualizador puede leer su PCM"""
+        if filename == self.current_media and self.output is self.music_output and self.music_pcm is None:
+            self.music_pcm = self.cached_source(filename)
+            if self.music_pcm is not None and self.playback_speed != 1.0:
+                self.move_to_pcm_output()
+
+    def move_to_pcm_output(self):
+        """Sigue por la salida PCM, desde donde iba, la pista que sonaba por music ya decodificada"""
+        position = self.playback_position()
+        self.open_output(self.current_file)
+        if self.music_pcm is not None:
+            self.music_pcm.close()
+            self.music_pcm = None
+        self.output.play(start=position)
+        if self.is_paused:
+            self.output.pause()
+        self.update_spectrum_state()
+        self.update_speed_button()
+
+    def set_playback_speed(self, speed):
+        """Cambia la velocidad conservando el tono; en la salida PCM se aplica en vivo"""
+        if self.stream_output is None:
+            return
+        self.playback_speed = speed
+        self.settings.setValue('playback_speed', speed)
+        for action in self.speed_menu.actions():
+            action.setChecked(action.data() == speed)
+        self.stream_output.set_speed(speed)
+        if speed != 1.0 and self.track_loaded() and self.output is self.music_output:
+            # SDL decodifica por su cuenta: se pasa a la salida PCM en cuanto la pista esté decodificada
+            if self.music_pcm is not None:
+                self.move_to_pcm_output()
+            else:
+                self.request_decode(self.current_media)
+        self.update_speed_button()
+        if self.end_timer.isActive():
+            self.arm_end_timer()
+
+    def track_loaded(self):
+        """Hay una pista cargada en la salida (sonando o en pausa), no solo preparada en la etiqueta"""
+        return bool(self.current_file) and (self.output.get_busy() or self.is_paused)
+
+    def update_speed_button(self):
+        """Muestra la velocidad elegida y si todavía no se aplica a la pista que suena.
+
+        Por music la velocidad solo cambia cuando la pista entera está en la caché PCM:
+        mientras se decodifica queda pendiente, y si no cabe suena a velocidad normal.
+        """
+        text = f"{self.playback_speed:g}×"
+        tooltip = 'Velocidad (conserva el tono)'
+        if self.playback_speed != 1.0 and self.track_loaded() and self.output is not self.stream_output:
+            if (self.output is self.music_output and self.pcm_decoder is not None
+                    and self.pcm_decoder.pending == self.current_media):
+                text += " …"
+                tooltip = "Decodificando la pista: la velocidad se aplicará en cuanto termine"
+            elif self.output is self.network_output:
+                text = f"({text})"
+                tooltip = "Las emisiones suenan siempre a velocidad normal"
+            else:
+                text = f"({text})"
+                tooltip = "Esta pista no cabe en la caché PCM: suena a velocidad normal"
+        self.speed_button.setText(text)
+        self.speed_button.setToolTip(tooltip)
+
+    def skip_silence(self):
+        return self.silence_scanner is not None and self.settings.value('skip_silence', False, type=bool)
+
+    def skip_silence_gaps(self):
+        return self.skip_silence() and self.settings.value('skip_silence_gaps', False, type=bool)
+
+    def load_silence(self, filename):
+        """SilenceInfo guardado de la pista, o None; si falta se pide su análisis con prioridad"""
+        if not self.skip_silence() or is_stream_url(filename) or split_cue_track_key(filename) is not None:
+            return None  # Los silencios se analizan por archivo, no por tramo de una hoja CUE
+        info = self.library.silence_info(filename)
+        if info is None:
+            self.silence_scanner.enqueue([filename], SilenceScanner.PRIORITY_CURRENT)
+        return info
+
+    def sound_start(self):
+        if self.silence is not None:
+            return self.silence.sound_start
+        return self.segment.start if self.segment is not None else 0
+
+    def on_silence_analyzed(self, filename):
+        """Aplica el análisis recién terminado a la pista actual si sonaba sin él"""
+        if filename != self.current_file or self.silence is not None or not self.skip_silence():
+            return
+        self.silence = self.library.silence_info(filename)
+        if self.silence is None:
+            return
+        self.update_audio_length()
+        if self.output.get_busy() or self.is_paused:
+            if self.playback_position() < self.silence.sound_start:
+                self.output.play(start=self.silence.sound_start)
+                if self.is_paused:
+                    self.output.pause()
+            if not self.is_paused:
+                self.arm_end_timer()
+
+    def on_library_silence_changed(self, changed, removed):
+        if changed and self.skip_silence():
+            self.silence_scanner.enqueue_library()
+
+    def set_silence_skipping(self):
+        """Aplica los ajustes de salto de silencios y pone a analizar lo que falte"""
+        if self.skip_silence():
+            self.silence_scanner.enqueue(self.playlist, SilenceScanner.PRIORITY_PLAYLIST)
+            self.silence_scanner.enqueue_library()
+        self.silence = self.load_silence(self.current_file) if self.current_file else None
+        if self.current_file:
+            self.update_audio_length()
+        if self.end_timer.isActive():
+            self.arm_end_timer()
+
+    def play_next(self, auto=False):
+        """Salta a la siguiente pista según la cola, el modo aleatorio y la repetición"""
+        filename = self.playing.queue.next(auto=auto)
+        if filename is None:
+            self.stop_audio()
+            return
+        try:
+            self.start_track(filename)
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Error al reproducir el archivo: {str(e)}")
 
+    def play_previous(self):
+        """Vuelve a la pista anterior, o al inicio de la actual si ya avanzó unos segundos"""
+        if self.current_file and self.output.position() > self.sound_start() + 3:
+            self.start_track(self.current_file)
+            return
+        filename = self.playing.queue.previous()
+        if filename is not None:
+            try:
+                self.start_track(filename)
+            except Exception as e:
+                QMessageBox.warning(self, "Error", f"Error al reproducir el archivo: {str(e)}")
+
+    def queue_from_playlist(self, index, play_next):
+        """Agrega una pista de la lista a la cola de reproducción"""
+        if 0 <= index < len(self.playlist):
+            filename = self.playlist[index]
+            self.playing = self.shown  # La cola sigue desde la lista en la que se eligió
+            if play_next:
+                self.queue.play_next(filename)
+            else:
+                self.queue.enqueue(filename)
+
+    def find_duplicates(self):
+        """Lanza la búsqueda de duplicados de la lista en segundo plano"""
+        if self.duplicate_worker is not None or not self.playlist:
+            return
+        fingerprint = self.settings.value('duplicate_fingerprint', False, type=bool)
+        self.duplicate_worker = DuplicateScanWorker(self.playlist, fingerprint, self)
+        self.duplicate_progress = QProgressDialog("Buscando duplicados...", None, 0, len(self.playlist),
+                                                  self.playlist_window)
+        self.duplicate_progress.setWindowTitle("Duplicados")
+        self.duplicate_progress.setMinimumDuration(500)
+        self.duplicate_worker.progress.connect(lambda done, total: self.duplicate_progress.setValue(done))
+        self.duplicate_worker.scan_finished.connect(self.show_duplicates)
+        self.duplicate_worker.start()
+
+    def show_duplicates(self, exact_groups, similar_groups):
+        """Muestra el resultado de la búsqueda de duplicados"""
+        self.duplicate_progress.close()
+        self.duplicate_worker.wait()
+        self.duplicate_worker = None
+        dialog = DuplicatesDialog(exact_groups, similar_groups, self.playlist_window)
+        dialog.remove_signal.connect(self.remove_files_from_playlist)
+        dialog.exec_()
+
+    def remove_files_from_playlist(self, paths):
+        """Quita de la lista todas las filas cuyas rutas se indican"""
+        paths = set(paths)
+        self.remove_playlist_rows([row for row, filename in enumerate(self.playlist) if filename in paths])
+
+    def watch_library_dirs(self, paths):
+        """Agrega carpetas de la biblioteca al QFileSystemWatcher"""
+        watched = set(self.library_watcher.directories())
+        new_paths = [path for path in paths if path not in watched]
+        if new_paths:
+            self.library_watcher.addPaths(new_paths)
+
+    def unwatch_library_dirs(self, paths):
+        watched = set(self.library_watcher.directories())
+        gone = [path for path in paths if path in watched]
+        if gone:
+            self.library_watcher.removePaths(gone)
+
+    def on_library_dir_changed(self, path):
+        """Una carpeta vigilada cambió: se relista al terminar la ráfaga de eventos"""
+        self.changed_library_dirs.add(path)
+        self.library_rescan_timer.start()
+
+    def rescan_changed_library_dirs(self):
+        for path in self.changed_library_dirs:
+            self.library_indexer.enqueue('dir', path)
+        self.changed_library_dirs.clear()
+
+    def add_library_root(self, path):
+        """Agrega una carpeta raíz a la biblioteca y la indexa"""
+        self.library.add_root(path)
+        self.library_indexer.enqueue('root', os.path.abspath(path))
+
+    def remove_library_root(self, path):
+        self.library.remove_root(path)
+        self.library_indexer.enqueue('remove_root', path)
+
+    def add_files_to_playlist(self, filenames):
+        """Agrega varios archivos de una vez comprobando duplicados con el almacén de pistas"""
+        self.show_editable_playlist()
+        known = self.library.all_track_info()
+        new_files = []
+        for filename in self.expand_cue_sheets(filenames):
+            if filename in self.tracks or not self.entry_available(filename):
+                continue
+            self.load_track(filename, known.get(filename))
+            new_files.append(filename)
+        start = len(self.playlist)
+        self.playlist_model.insert_range(start, new_files)
+        for offset, filename in enumerate(new_files):
+            self.queue.track_inserted(start + offset, filename)
+        self.search_index.merge_pending()  # La primera búsqueda no paga la ordenación de la carga
+        if self.skip_silence():
+            self.silence_scanner.enqueue(new_files, SilenceScanner.PRIORITY_PLAYLIST)
+        self.forget_playlist_edits()  # Deshacer podría duplicar una pista vuelta a agregar
+        self.playlist_edited()
+        if not self.current_file and self.playlist:
+            self.prepare_track(new_files[0] if new_files else self.playlist[0])
+
+    def expand_cue_sheets(self, filenames):
+        """Cambia cada hoja CUE por sus pistas virtuales y quita los archivos que ya cubren"""
+        sheets = {filename: self.cue_index.tracks(filename) for filename in filenames
+                  if filename.lower().endswith('.cue') and not is_stream_url(filename)}
+        if not sheets:
+            return filenames
+        covered = {track.audio for tracks in sheets.values() for track in tracks}
+        expanded = []
+        for filename in filenames:
+            if filename in sheets:
+                expanded.extend(track.key for track in sheets[filename])
+            elif filename not in covered:
+                expanded.append(filename)
+        return expanded
+
+    def entry_available(self, filename):
+        """Indica si una entrada se puede agregar o reproducir (las URLs se comprueban al sonar)"""
+        if is_stream_url(filename):
+            return True
+        if split_cue_track_key(filename) is not None:
+            return self.cue_index.locate(filename) is not None
+        return os.path.exists(filename)
+
+    def display_name(self, filename):
+        """Texto de la etiqueta: el título en las pistas virtuales, el nombre del archivo en el resto"""
+        segment = self.cue_index.locate(filename)
+        return segment.info()['title'] if segment is not None else os.path.basename(filename)
+
+    def load_track(self, filename, info=None, state=None):
+        """Crea (o actualiza) el registro de una pista y la agrega al índice de búsqueda"""
+        state = state or self.shown
+        if info is None:
+            segment = self.cue_index.locate(filename)
+            if segment is not None:
+                info = segment.info()
+            else:
+                info = self.library.track_info(filename) or read_track_info(filename)
+        track = state.tracks.add(filename, info)
+        self.index_track(track, state.search_index)
+        return track
+
+    def index_track(self, track, search_index=None):
+        name = os.path.splitext(os.path.basename(track.path))[0]
+        if search_index is None:
+            search_index = self.search_index
+        search_index.add(track.path, track.title, track.artist, track.album, name)
+
+    def on_library_tracks_changed(self, changed, removed):
+        """Actualiza los registros de las pistas cuyas etiquetas cambiaron y las listas inteligentes"""
+        self.apply_smart_changes(self.smart.update_paths(changed + removed))
+        for state in self.playlist_states:
+            if not state.loaded:
+                continue
+            hits = [filename for filename in changed if filename in state.tracks]
+            if not hits:
+                continue
+            if state is self.shown and self.row_of is not None:
+                row_of = self.row_of
+            else:
+                row_of = {filename: i for i, filename in enumerate(state.playlist)}
+            for filename in hits:
+                self.load_track(filename, state=state)
+                row = row_of[filename]
+                state.model.rows_changed(row, row)
+            if state is self.shown:
+                self.playlist_edited()
+
+    def sort_playlist(self, column, descending):
+        """Ordena la lista por una columna con un único sort sobre claves cacheadas en los registros"""
+        if not self.playlist:
+            return
+        tracks = self.tracks
+        keys = [tracks.sort_key(tracks[filename], column) for filename in self.playlist]
+        order = [self.playlist[i] for i in sorted(range(len(keys)), key=keys.__getitem__, reverse=descending)]
+        view = self.playlist_window.playlist
+        current_row = view.current_row()
+        current = self.playlist[current_row] if current_row >= 0 else None
+        self.playlist_model.set_order(order)
+        if current is not None:
+            view.setCurrentIndex(self.playlist_model.index(order.index(current), 0))
+        self.queue.resync()
+        self.forget_playlist_edits()  # Las filas guardadas ya no corresponden
+        self.playlist_edited()
+
+    def playlist_edited(self):
+        """Invalida el mapa de filas, marca la lista para guardarla y vuelve a aplicar el filtro activo"""
+        self.shown.dirty = True
+        self.row_of = None
+        if self.visible_keys is not None:
+            self.visible_keys = None
+            self.apply_filter(self.playlist_window.search_box.text(), full=True)
+
+    def filter_playlist(self, text):
+        """Filtra la lista con el índice; solo toca las filas que cambian de estado"""
+        self.apply_filter(text)
+
+    def apply_filter(self, text, full=False):
+        matches = self.search_index.search(text)
+        widget = self.playlist_window.playlist
+        if self.row_of is None:
+            self.row_of = {filename: i for i, filename in enumerate(self.playlist)}
+        previous = self.visible_keys
+        if full:
+            to_hide = set(self.playlist) if matches is not None else set()
+            to_show = matches if matches is not None else set(self.playlist)
+            to_hide.difference_update(to_show)
+        elif matches is None:
+            to_hide, to_show = (), (set(self.playlist) - previous if previous is not None else ())
+        elif previous is None:
+            to_hide, to_show = set(self.playlist) - matches, ()
+        else:
+            to_hide, to_show = previous - matches, matches - previous
+        widget.setUpdatesEnabled(False)
+        try:
+            for key in to_hide:
+                widget.setRowHidden(self.row_of[key], True)
+            for key in to_show:
+                if key in self.row_of:
+                    widget.setRowHidden(self.row_of[key], False)
+        finally:
+            widget.setUpdatesEnabled(True)
+        self.visible_keys = matches
+
+    def toggle_shuffle(self, enabled):
+        """Activa o desactiva el modo aleatorio"""
+        for state in self.playlist_states:
+            state.queue.set_shuffle(enabled)
+        self.settings.setValue('shuffle', enabled)
+
+    def cycle_repeat(self):
+        """Alterna entre sin repetición, repetir lista y repetir pista"""
+        repeat = (self.queue.repeat + 1) % 3
+        for state in self.playlist_states:
+            state.queue.repeat = repeat
+        self.settings.setValue('repeat_mode', repeat)
+        self.update_repeat_button()
+
+    def update_repeat_button(self):
+        """Actualiza icono y texto del botón de repetición"""
+        if self.queue.repeat == PlayQueue.REPEAT_ONE:
+            self.btn_repeat.setIcon(QIcon.fromTheme('media-playlist-repeat-song'))
+            self.btn_repeat.setToolTip('Repetir: pista actual')
+        elif self.queue.repeat == PlayQueue.REPEAT_ALL:
+            self.btn_repeat.setIcon(QIcon.fromTheme('media-playlist-repeat'))
+            self.btn_repeat.setToolTip('Repetir: toda la lista')
+        else:
+            self.btn_repeat.setIcon(QIcon.fromTheme('media-playlist-repeat'))
+            self.btn_repeat.setToolTip('Repetir: desactivado')
+        self.btn_repeat.setDown(self.queue.repeat != PlayQueue.REPEAT_OFF)
+
     def load_file(self):
         filename, _ = QFileDialog.getOpenFileName(self, "Selecciona un archivo de audio", "", "Audio Files (*.mp3 *.wav)")
         if filename:
             # Agregar el archivo a la lista de reproducción primero
             self.add_file_to_playlist(filename)
-            
-            # Establecer como archivo actual
-            self.current_file = filename
-            display_name = os.path.basename(filename)
-            if len(display_name) > 50:
-                display_name = display_name[:47] + "..."
-            self.label.setText(display_name)
-            self.label.setToolTip(filename)
-            
-            self.btn_play.setEnabled(True)
-            self.btn_pause.setEnabled(True)
-            self.btn_stop.setEnabled(True)
-            self.seekbar.setEnabled(True)
-            self.seekbar.setValue(0)
-            self.stop_audio()
-            
-            try:
-                if filename.lower().endswith('.mp3'):
-                    audio = MP3(filename)
-                else:
-                    audio = WAVE(filename)
-                self.audio_length = int(audio.info.length)
-                self.seekbar.setMaximum(self.audio_length)
-            except Exception:
-                self.audio_length = 0
-                self.seekbar.setMaximum(100)
+            if filename in self.tracks:
+                # Establecer como archivo actual, detenido y listo para Play
+                self.stop_audio()
+                self.prepare_track(filename)
 
     def add_file_to_playlist(self, filename):
         """Agrega un archivo a la lista de reproducción"""
-        # Verificar si el archivo existe en el sistema
-        if not os.path.exists(filename):
+        if filename.lower().endswith('.cue') and not is_stream_url(filename):
+            self.add_files_to_playlist([filename])  # La hoja entra como sus pistas virtuales
+            return
+        # Verificar si el archivo existe en el sistema (las URLs se comprueban al reproducirlas)
+        if not self.entry_available(filename):
             return
+        self.show_editable_playlist()
         
-        # Verificar si el archivo ya está en la lista visual actual
-        for i in range(self.playlist_window.playlist.count()):
-            if self.playlist_window.playlist.item(i).toolTip() == filename:
-                return  # Solo retorna si el archivo está actualmente en la lista
+        # Verificar si el archivo ya está en la lista actual
+        if filename in self.tracks:
+            return  # Solo retorna si el archivo está actualmente en la lista
     
-        # Agregar a la lista interna si no está
-        if filename not in self.playlist:
-            self.playlist.append(filename)
-    
-        # Agregar al widget visual
-        item = QListWidgetItem(os.path.basename(filename))
-        item.setToolTip(filename)
-        self.playlist_window.playlist.addItem(item)
+        # Agregar el registro y la fila (la tabla lee del modelo)
+        self.load_track(filename)
+        self.playlist_model.insert_range(len(self.playlist), [filename])
+        if self.skip_silence():
+            self.silence_scanner.enqueue([filename], SilenceScanner.PRIORITY_PLAYLIST)
+        self.queue.track_inserted(len(self.playlist) - 1, filename)
+        self.forget_playlist_edits()
+        self.playlist_edited()
         
-        # Si es el primer archivo o no hay archivo actual
-        if len(self.playlist) == 1 or not self.current_file:
-            self.current_file = filename
-            display_name = os.path.basename(filename)
-            if len(display_name) > 50:
-                display_name = display_name[:47] + "..."
-            self.label.setText(display_name)
-            self.label.setToolTip(filename)
-            self.btn_play.setEnabled(True)
-            self.btn_pause.setEnabled(True)
-            self.btn_stop.setEnabled(True)
-            self.seekbar.setEnabled(True)
-            
-            try:
-                if filename.lower().endswith('.mp3'):
-                    audio = MP3(filename)
-                else:
-                    audio = WAVE(filename)
-                self.audio_length = int(audio.info.length)
-                self.seekbar.setMaximum(self.audio_length)
-            except Exception:
-                self.audio_length = 0
-                self.seekbar.setMaximum(100)
+        # Si no hay archivo actual, este queda preparado en el reproductor
+        if not self.current_file:
+            self.prepare_track(filename)
+
+    def prepare_track(self, filename):
+        """Deja una pista de la lista mostrada como actual, lista para Play, sin arrancarla"""
+        self.playing = self.shown
+        self.current_file = filename
+        display_name = self.display_name(filename)
+        if len(display_name) > 50:
+            display_name = display_name[:47] + "..."
+        self.label.setText(display_name)
+        self.label.setToolTip(filename)
+        self.btn_play.setEnabled(True)
+        self.btn_pause.setEnabled(True)
+        self.btn_stop.setEnabled(True)
+        self.seekbar.setEnabled(True)
+        track = self.tracks.get(filename)  # La duración ya se leyó al agregarla
+        self.audio_length = int(track.duration) if track is not None else 0
+        self.seekbar.setMaximum(self.audio_length or 100)
 
     def play_audio(self):
         """Reproduce el audio actual o el primero de la lista si no hay actual"""
         if self.is_paused:
-            pygame.mixer.music.unpause()
+            self.output.unpause()
             self.is_paused = False
         else:
             try:
-                # Si no hay archivo actual pero hay archivos en la lista, reproducir el primero
-                if not self.current_file and self.playlist_window.playlist.count() > 0:
-                    first_item = self.playlist_window.playlist.item(0)
-                    self.current_file = first_item.toolTip()
-                    self.label.setText(os.path.basename(self.current_file))
+                # Si no hay archivo actual, retomar la última pista o pedir la siguiente a la cola
+                if not self.current_file and self.playlist:
+                    self.playing = self.shown
+                    if self.queue.has(self.queue.current):
+                        self.current_file = self.queue.current
+                    else:
+                        self.current_file = self.queue.next()
+                    if self.current_file:
+                        self.label.setText(self.display_name(self.current_file))
+                elif self.current_file and self.playing.queue.current != self.current_file:
+                    self.playing.queue.jump(self.current_file)
             
                 if self.current_file:
-                    pygame.mixer.music.load(self.current_file)
-                    pygame.mixer.music.play()
+                    self.open_output(self.current_file)
+                    self.silence = self.load_silence(self.current_file)
+                    self.output.play(start=self.sound_start())
+                    self.log_play_start(self.current_file, self.sound_start())
+                    self.request_decode(self.current_media)
                     self.update_audio_length()  # Actualizar la duración del audio
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Error al reproducir: {str(e)}")
@@ -658,34 +5409,50 @@ class AudioPlayer(QWidget):
         self.btn_pause.setEnabled(True)
         self.btn_stop.setEnabled(True)
         self.seekbar.setEnabled(True)
-        self.timer.start()
+        self.set_progress_active(True)
+        self.update_spectrum_state()
 
     def pause_audio(self):
         """Pausa el audio actual"""
-        if self.current_file and pygame.mixer.music.get_busy():
-            pygame.mixer.music.pause()
+        if self.current_file and self.output.get_busy():
+            self.output.pause()
             self.is_paused = True
-            self.timer.stop()
+            self.set_progress_active(False)
             
             # Actualizar estado de los botones
             self.btn_play.setEnabled(True)
             self.btn_pause.setEnabled(False)
+            self.update_spectrum_state()
 
     def stop_audio(self):
         """Detiene la reproducción y limpia el estado del reproductor"""
+        self.log_play_end(PlayHistory.STOP)
+        self.network_output.unload()
+        if self.stream_output is not None:
+            self.stream_output.unload()
+        if self.music_pcm is not None:
+            self.music_pcm.close()
+            self.music_pcm = None
+        self.output = self.music_output
         pygame.mixer.music.stop()
         pygame.mixer.music.unload()
+        init = pygame.mixer.get_init()
         pygame.mixer.quit()
-        pygame.mixer.init()
+        self.init_mixer(init[0] if init else None)  # Conserva la frecuencia de la última pista
+        self.silence = None
+        self.segment = None
+        self.current_media = None
         
         # Limpiar la interfaz del reproductor pero mantener la lista
         self.label.setText("No hay archivo cargado")
         self.is_paused = False
+        self.seekbar.setMinimum(0)
         self.seekbar.setValue(0)
-        self.timer.stop()
+        self.seekbar.setToolTip('')
+        self.set_progress_active(False)
         
         # Mantener los botones habilitados si hay archivos en la lista
-        if self.playlist_window.playlist.count() > 0:
+        if self.playlist:
             self.btn_play.setEnabled(True)
             self.current_file = None  # Limpiar archivo actual para que play_audio use el primero de la lista
         else:
@@ -695,71 +5462,184 @@ class AudioPlayer(QWidget):
         self.btn_pause.setEnabled(False)
         self.btn_stop.setEnabled(False)
         self.seekbar.setEnabled(False)
+        self.update_spectrum_state()
+        self.update_speed_button()
+
+    def init_mixer(self, frequency=None):
+        """Inicializa pygame.mixer con el búfer, la frecuencia y el dispositivo configurados"""
+        frequency = frequency or self.settings.value('audio_frequency', 44100, type=int)
+        self.mixer_buffer = self.settings.value('audio_buffer', 1024, type=int)
+        device = self.settings.value('audio_device', '', type=str) or None
+        try:
+            pygame.mixer.init(frequency=frequency, size=-16, channels=2, buffer=self.mixer_buffer,
+                              devicename=device)
+        except pygame.error as e:
+            if device is None:
+                raise
+            print(f"No se pudo abrir el dispositivo {device}, se usa el predeterminado: {e}")  # Debug
+            pygame.mixer.init(frequency=frequency, size=-16, channels=2, buffer=self.mixer_buffer)
+
+    def apply_audio_settings(self):
+        """Reabre el mezclador con la configuración nueva y retoma la pista donde iba"""
+        resume = bool(self.current_file) and (self.output.get_busy() or self.is_paused)
+        position = self.playback_position() if resume else 0
+        try:
+            self.reopen_mixer()
+        except pygame.error as e:
+            QMessageBox.warning(self, "Error", f"No se pudo abrir la salida de audio: {str(e)}")
+            return
+        if resume:
+            # La caché PCM está indexada por frecuencia: a otra frecuencia la pista se decodifica de nuevo
+            self.open_output(self.current_file)
+            self.output.play(start=position)
+            if self.is_paused:
+                self.output.pause()
+            self.request_decode(self.current_media)
+        self.update_spectrum_state()
+
+    def reopen_mixer(self, frequency=None):
+        """Cierra las salidas y vuelve a abrir pygame.mixer (a frequency o a la configurada)"""
+        self.network_output.stop()
+        if self.stream_output is not None:
+            self.stream_output.unload()
+        if self.music_pcm is not None:
+            self.music_pcm.close()
+            self.music_pcm = None
+        self.output = self.music_output
+        pygame.mixer.music.stop()
+        pygame.mixer.music.unload()
+        pygame.mixer.quit()
+        self.init_mixer(frequency)
+        if self.stream_output is not None:
+            self.stream_output.block_frames = max(StreamOutput.BLOCK_FRAMES, self.mixer_buffer)
+            self.stream_output.underruns = 0
+        if self.spectrum is not None:
+            self.spectrum.analyzer.set_sample_rate(pygame.mixer.get_init()[0])
+
+    def match_native_rate(self, filename):
+        """Reabre el mezclador a la frecuencia de la pista si está activado y hace falta.
+
+        Solo se reabre al cambiar de frecuencia, así que una serie de pistas con la
+        misma frecuencia se reproduce sin tocar la salida.
+        """
+        if not self.settings.value('native_rate', False, type=bool):
+            return
+        init = pygame.mixer.get_init()
+        rate = native_sample_rate(filename)
+        if init is None or not 8000 <= rate <= 192000 or rate == init[0]:
+            return
+        try:
+            self.reopen_mixer(rate)
+        except pygame.error as e:
+            print(f"No se pudo abrir la salida a {rate} Hz: {e}")  # Debug
+            self.init_mixer(init[0])  # Se queda a la frecuencia anterior y se remuestrea
+
+    def output_stats(self):
+        """Configuración real del mezclador y telemetría de la salida activa"""
+        init = pygame.mixer.get_init()
+        if init is None:
+            return None
+        frequency, _, channels = init
+        stats = {'frequency': frequency, 'channels': channels, 'buffer': self.mixer_buffer,
+                 'latency_ms': 1000.0 * self.mixer_buffer / frequency, 'stream': None}
+        if self.output is self.stream_output:
+            stream = self.stream_output.stats()
+            stats['stream'] = stream
+            if stream['rate']:
+                stats['latency_ms'] += 1000.0 * stream['queued_frames'] / stream['rate']
+        return stats
 
     def seek_audio(self):
         if self.current_file and self.audio_length > 0:
             value = self.seekbar.value()
-            pygame.mixer.music.play(start=int(value))
+            if self.output is self.music_output and self.music_pcm is not None:
+                # La pista ya se decodificó: el salto se sirve desde la caché PCM
+                self.open_output(self.current_file)
+                self.music_pcm.close()
+                self.music_pcm = None
+            self.output.play(start=int(value))
             self.is_paused = False
-            self.timer.start()
+            self.set_progress_active(True)
+            self.update_spectrum_state()
+
+    def playback_position(self):
+        """Posición de reproducción en segundos"""
+        return self.output.position()
+
+    def set_progress_active(self, active):
+        """Activa el refresco de la barra y la espera del final de pista mientras algo suena"""
+        self.refresh.set_active('seekbar', active)
+        if active:
+            self.arm_end_timer()
+        else:
+            self.end_timer.stop()
+
+    def arm_end_timer(self):
+        """Programa la comprobación de fin de pista para cuando se acabe la duración restante.
+
+        Si se saltan silencios, la comprobación se hace al acabar el sonido o al llegar
+        al siguiente hueco largo, que es donde hay que actuar.
+        """
+        position = self.playback_position()
+        if self.silence is not None:
+            remaining = self.silence.next_boundary(position, self.skip_silence_gaps()) - position
+        elif self.segment is not None:
+            remaining = self.segment.end - position
+        else:
+            remaining = self.audio_length - position if self.audio_length > 0 else 1
+        if self.output is self.stream_output:
+            remaining /= self.stream_output.speed
+        self.end_timer.start(max(250, int(remaining * 1000) + 50))
+
+    def check_track_end(self):
+        if not self.output.get_busy():
+            self.track_finished()
+        elif self.segment is not None and self.playback_position() >= self.segment.end - 0.05:
+            self.track_finished()  # Acabó el tramo de la pista virtual aunque el archivo siga
+        elif not self.skip_silence_at(self.playback_position()):
+            self.arm_end_timer()  # La duración era aproximada: volver a mirar más tarde
+
+    def skip_silence_at(self, position):
+        """Salta el hueco o el silencio final en el que está position; devuelve True si actuó"""
+        if self.silence is None:
+            return False
+        if position >= self.silence.sound_end - 0.05:
+            self.track_finished()  # Solo queda silencio: se pasa a la siguiente
+            return True
+        gap_end = self.silence.gap_at(position, 0.05) if self.skip_silence_gaps() else None
+        if gap_end is None:
+            return False
+        self.output.play(start=gap_end)
+        self.arm_end_timer()
+        return True
 
     def update_seekbar(self):
-        if pygame.mixer.music.get_busy() and not self.seekbar.isSliderDown():
-            pos = pygame.mixer.music.get_pos() // 1000
-            self.seekbar.setValue(pos)
-        elif not pygame.mixer.music.get_busy() and not self.seekbar.isSliderDown():
-            self.seekbar.setValue(0)
-            self.timer.stop()
-
-    def move_audio(self, old_index, new_index):
-        """Mueve un archivo de audio en la lista de reproducción"""
-        if 0 <= old_index < len(self.playlist) and 0 <= new_index < len(self.playlist):
-            # Detener la reproducción si es necesario
-            was_playing = pygame.mixer.music.get_busy()
-            if was_playing:
-                pygame.mixer.music.stop()
-                pygame.mixer.music.unload()
-        
-            # Mover el archivo en la lista interna
-            file_to_move = self.playlist.pop(old_index)
-            self.playlist.insert(new_index, file_to_move)
-            
-            # Si el archivo movido es el que se está reproduciendo
-            if self.current_file == file_to_move and was_playing:
-                pygame.mixer.music.load(self.current_file)
-                pygame.mixer.music.play()
+        if self.seekbar.isSliderDown():
+            return
+        if self.output.get_busy():
+            self.seekbar.setValue(int(self.playback_position()))
+        else:
+            self.track_finished()
 
-    def remove_audio(self, index):
-        """Elimina un archivo de la lista de reproducción"""
-        if 0 <= index < len(self.playlist):
-            # Detener reproducción actual si es necesario
-            if pygame.mixer.music.get_busy():
-                pygame.mixer.music.stop()
-                pygame.mixer.unload()
-                pygame.mixer.quit()
-                pygame.mixer.init()
-        
-            # Eliminar el archivo de la lista
-            file_to_remove = self.playlist.pop(index)
-            
-            # Si el archivo eliminado es el que se está reproduciendo
-            if self.current_file == file_to_remove:
-                self.current_file = None
-                self.label.setText("No hay archivo cargado")
-                self.btn_play.setEnabled(False)
-                self.btn_pause.setEnabled(False)
-                self.btn_stop.setEnabled(False)
-                self.seekbar.setEnabled(False)
-                self.seekbar.setValue(0)
-                self.timer.stop()
+    def track_finished(self):
+        self.log_play_end(PlayHistory.FINISH)
+        self.seekbar.setValue(0)
+        self.set_progress_active(False)
+        # La pista terminó sola: continuar con la cola
+        if self.current_file and not self.is_paused:
+            self.play_next(auto=True)
 
     def change_volume(self):
         """Cambia el volumen de reproducción"""
         volume = self.volume_slider.value() / 100.0  # Convertir a rango 0-1
-        pygame.mixer.music.set_volume(volume)
+        self.music_output.set_volume(volume)
+        if self.stream_output is not None:
+            self.stream_output.set_volume(volume)
 
     def show_config(self):
         """Muestra la ventana de configuración"""
+        self.config_window.update_cache_stats()
+        self.config_window.update_playlist_stats()
         self.config_window.exec_()
 
     def quit_application(self):
@@ -777,6 +5657,43 @@ class AudioPlayer(QWidget):
                     event.accept()
             else:
                 event.accept()
+            self.refresh.reschedule()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh.reschedule()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh.reschedule()  # En la bandeja no se refresca nada
+
+    def set_spectrum_enabled(self, enabled):
+        """Activa o desactiva el analizador de espectro"""
+        if self.spectrum is None:
+            return
+        self.spectrum.set_enabled(enabled)
+        self.update_spectrum_state()
+
+    def update_spectrum_state(self):
+        """Sincroniza el visualizador con el estado de reproducción"""
+        if self.spectrum is None:
+            return
+        playing = bool(self.current_file) and not self.is_paused and self.output.get_busy()
+        if (playing and self.spectrum.enabled and self.output is self.music_output
+                and self.music_pcm is None):
+            self.request_decode(self.current_media)
+        self.spectrum.set_playing(playing)
+
+    def pcm_window(self, frames):
+        """Devuelve las últimas muestras reproducidas (frames x canales) o None"""
+        if self.output is self.stream_output:
+            return self.stream_output.pcm_window(frames)
+        if self.music_pcm is None or self.music_pcm.path != self.current_media:
+            return None
+        end = min(int(self.playback_position() * self.music_pcm.rate), self.music_pcm.frames)
+        if end <= 0:
+            return None
+        return self.music_pcm.read_before(end, frames)
 
     def activateFromTray(self, reason):
         """Maneja los clicks en el icono de la bandeja"""
@@ -790,37 +5707,16 @@ class AudioPlayer(QWidget):
         """Acepta el arrastre si son archivos de audio"""
         if event.mimeData().hasUrls():
             for url in event.mimeData().urls():
-                if url.toLocalFile().lower().endswith(('.mp3', '.wav')):
+                if is_playable(url_to_entry(url)):
                     event.accept()
                     return
         event.ignore()
 
     def dropEvent(self, event: QDropEvent):
         """Procesa los archivos soltados"""
-        files = [url.toLocalFile() for url in event.mimeData().urls()]
-        for file_path in files:
-            if file_path.lower().endswith(('.mp3', '.wav')):
-                # Si es el primer archivo, cargarlo en el reproductor
-                if not self.current_file:
-                    self.current_file = file_path
-                    self.label.setText(os.path.basename(file_path))
-                    self.btn_play.setEnabled(True)
-                    self.btn_pause.setEnabled(True)
-                    self.btn_stop.setEnabled(True)
-                    self.seekbar.setEnabled(True)
-                    try:
-                        if file_path.lower().endswith('.mp3'):
-                            audio = MP3(file_path)
-                        else:
-                            audio = WAVE(file_path)
-                        self.audio_length = int(audio.info.length)
-                        self.seekbar.setMaximum(self.audio_length)
-                    except Exception:
-                        self.audio_length = 0
-                        self.seekbar.setMaximum(100)
-                
-                # Agregar el archivo a la lista de reproducción
-                self.add_file_to_playlist(file_path)
+        files = [url_to_entry(url) for url in event.mimeData().urls()]
+        # Si no hay pista actual, la primera soltada queda preparada en el reproductor
+        self.add_files_to_playlist([file_path for file_path in files if is_playable(file_path)])
 
     def show_volume_menu(self):
         """Muestra el menú de volumen debajo del botón"""
@@ -843,10 +5739,12 @@ class AudioPlayer(QWidget):
         """Aplica una ecualización básica usando pygame.mixer"""
         if not self.current_file or not pygame.mixer.music.get_busy():
             return
+        if self.output is not self.music_output:
+            return  # La ruta PCM no necesita recargar el archivo
             
         try:
             # Guardar posición actual
-            current_pos = pygame.mixer.music.get_pos() / 1000.0
+            current_pos = self.playback_position()
             
             # Aplicar cambios básicos de frecuencia
             # Bajo (hasta 250Hz)
@@ -870,34 +5768,36 @@ class AudioPlayer(QWidget):
             pygame.mixer.Channel(2).set_volume(treble_vol)  # Altos
             
             # Recargar y reproducir
-            pygame.mixer.music.load(self.current_file)
-            pygame.mixer.music.play(start=current_pos)
+            self.music_output.load(self.current_media)
+            self.music_output.play(start=current_pos)
             
         except Exception as e:
             print(f"Error al aplicar ecualización: {e}")
 
-    def update_playlist_order(self, old_index, new_index):
-        """Actualiza el orden de la lista interna cuando se mueven elementos"""
-        if 0 <= old_index < len(self.playlist) and 0 <= new_index < len(self.playlist):
-            # Mover el elemento en la lista interna
-            item = self.playlist.pop(old_index)
-            self.playlist.insert(new_index, item)
-            
-            # Si el archivo que se está reproduciendo es el que se movió
-            if self.current_file == item:
-                # Actualizar la interfaz si es necesario
-                self.label.setText(os.path.basename(item))
-
     def update_audio_length(self):
         """Actualiza la duración del audio actual"""
         try:
             if self.current_file:
-                if self.current_file.lower().endswith('.mp3'):
-                    audio = MP3(self.current_file)
+                track = self.tracks.get(self.current_file)
+                if self.segment is not None:
+                    self.audio_length = int(self.segment.end - self.segment.start)
+                elif track is not None and track.duration:
+                    self.audio_length = int(track.duration)  # Ya leída al agregarla a la lista
                 else:
-                    audio = WAVE(self.current_file)
-                self.audio_length = int(audio.info.length)
+                    # Las emisiones no tienen duración: la barra no permite saltos
+                    self.audio_length = int(read_track_info(self.current_file)['duration'])
                 self.seekbar.setMaximum(self.audio_length)
+                self.seekbar.setMinimum(0)
+                self.seekbar.setToolTip('')
+                if self.segment is not None:
+                    # La barra abarca el tramo de la pista dentro del archivo de la hoja CUE
+                    self.seekbar.setRange(int(self.segment.start), math.ceil(self.segment.end))
+                if self.silence is not None:
+                    # La barra abarca solo el tramo con sonido y la ayuda da la duración efectiva
+                    self.seekbar.setRange(int(self.silence.sound_start), math.ceil(self.silence.sound_end))
+                    effective = self.silence.effective_length(self.skip_silence_gaps())
+                    self.seekbar.setToolTip(f"Duración efectiva {format_duration(effective)} "
+                                            f"de {format_duration(self.silence.duration)}")
         except Exception as e:
             print(f"Error al actualizar la duración del audio: {e}")
             self.audio_length = 0
@@ -917,6 +5817,8 @@ class ConfigWindow(QDialog):
 
         self.eq_sliders = {}  # Agregar este atributo para acceder a los sliders
         self.settings = QSettings('Player', 'AudioPlayer')
+        if isinstance(parent, AudioPlayer):
+            parent.refresh.register('output_stats', self.update_output_stats, 500, self)
         self.init_ui()
         self.load_saved_geometry()
         self.load_eq_settings()  # Cargar valores guardados de ecualización
@@ -925,6 +5827,14 @@ class ConfigWindow(QDialog):
         """Guarda las configuraciones cuando cambian"""
         self.settings.setValue('startup', self.startup_check.isChecked())
         self.settings.setValue('minimize_to_tray', self.minimize_check.isChecked())
+        self.settings.setValue('duplicate_fingerprint', self.fingerprint_check.isChecked())
+        self.settings.setValue('show_spectrum', self.spectrum_check.isChecked())
+        self.settings.setValue('pcm_cache_mb', self.cache_spin.value())
+        if isinstance(self.parent(), AudioPlayer) and self.parent().pcm_cache is not None:
+            self.parent().pcm_cache.set_budget(self.cache_spin.value() * 1024 * 1024)
+            self.update_cache_stats()
+        if isinstance(self.parent(), AudioPlayer):
+            self.parent().set_spectrum_enabled(self.spectrum_check.isChecked())
         
         # Configurar inicio automático
         if sys.platform == 'linux':
@@ -950,6 +5860,131 @@ X-GNOME-Autostart-enabled=true
                 if os.path.exists(desktop_file):
                     os.remove(desktop_file)
 
+    def save_silence_settings(self):
+        self.settings.setValue('skip_silence', self.skip_silence_check.isChecked())
+        self.settings.setValue('skip_silence_gaps', self.skip_gaps_check.isChecked())
+        self.skip_gaps_check.setEnabled(self.skip_silence_check.isChecked())
+        if isinstance(self.parent(), AudioPlayer):
+            self.parent().set_silence_skipping()
+
+    def update_cache_stats(self):
+        """Muestra el uso y las estadísticas de expulsión de la caché PCM"""
+        player = self.parent()
+        if not isinstance(player, AudioPlayer) or player.pcm_cache is None:
+            self.cache_stats_label.setText("Caché no disponible (requiere numpy)")
+            return
+        stats = player.pcm_cache.stats()
+        self.cache_stats_label.setText(
+            f"En uso: {stats['bytes_used'] / 2**20:.1f} MB en {stats['tracks']} pistas · "
+            f"aciertos {stats['hits']} · fallos {stats['misses']} · "
+            f"expulsiones {stats['evictions']} ({stats['evicted_bytes'] / 2**20:.1f} MB)")
+
+    def update_playlist_stats(self):
+        """Muestra cuánta memoria ocupan los registros de las pistas de la lista"""
+        player = self.parent()
+        if not isinstance(player, AudioPlayer):
+            return
+        total, per_track = player.tracks.memory_usage()
+        self.playlist_stats_label.setText(
+            f"Lista: {len(player.tracks)} pistas · {total / 2**20:.1f} MB en registros ({per_track} bytes por pista)")
+
+    def load_output_devices(self):
+        """Llena la lista de dispositivos de salida que reporta SDL"""
+        self.device_combo.clear()
+        self.device_combo.addItem("Predeterminado del sistema", '')
+        try:
+            from pygame._sdl2 import audio as sdl_audio
+            names = sdl_audio.get_audio_device_names(False)
+        except (ImportError, pygame.error) as e:
+            print(f"No se pudieron listar los dispositivos de audio: {e}")  # Debug
+            names = []
+        for name in names:
+            self.device_combo.addItem(name, name)
+        index = self.device_combo.findData(self.settings.value('audio_device', '', type=str))
+        self.device_combo.setCurrentIndex(max(0, index))
+
+    def apply_output_settings(self):
+        """Guarda búfer, frecuencia y dispositivo y reabre la salida sin reiniciar"""
+        self.settings.setValue('audio_buffer', self.buffer_combo.currentData())
+        self.settings.setValue('audio_frequency', self.frequency_combo.currentData())
+        self.settings.setValue('audio_device', self.device_combo.currentData())
+        if isinstance(self.parent(), AudioPlayer):
+            self.parent().apply_audio_settings()
+        self.update_output_stats()
+
+    def update_output_stats(self):
+        """Muestra la configuración real del mezclador y la telemetría de la salida"""
+        player = self.parent()
+        stats = player.output_stats() if isinstance(player, AudioPlayer) else None
+        if stats is None:
+            self.output_stats_label.setText("Salida de audio no inicializada")
+            return
+        text = (f"Mezclador: {stats['frequency']} Hz · {stats['channels']} canales · "
+                f"búfer {stats['buffer']} frames\nLatencia estimada: {stats['latency_ms']:.0f} ms")
+        stream = stats['stream']
+        if stream is not None:
+            fill = stream['queued_frames'] / stream['capacity_frames'] if stream['capacity_frames'] else 0
+            text += f"\nLlenado de la cola: {fill:.0%} · subejecuciones: {stream['underruns']}"
+        else:
+            text += "\nSubejecuciones: solo se miden en la salida PCM (WAV y pistas en caché)"
+        self.output_stats_label.setText(text)
+
+    def benchmark_resampler(self):
+        """Mide el remuestreo desde las frecuencias habituales a la del mezclador y el estirado de tiempo"""
+        init = pygame.mixer.get_init()
+        out_rate = init[0] if init else 44100
+        lines = []
+        for in_rate in (44100, 48000, 88200, 96000):
+            if in_rate != out_rate and PolyphaseResampler.supported(in_rate, out_rate):
+                cost = PolyphaseResampler.benchmark(in_rate, out_rate, seconds=2.0)
+                lines.append(f"{in_rate} → {out_rate} Hz: {cost * 1000:.1f} ms de CPU por segundo de audio "
+                             f"({cost:.2%})")
+        for speed in (0.5, 1.5, 2.0):
+            cost = TimeStretcher.benchmark(speed, out_rate, seconds=2.0)
+            lines.append(f"Velocidad {speed:g}×: {cost * 1000:.1f} ms de CPU por segundo de audio ({cost:.2%})")
+        self.benchmark_label.setText("\n".join(lines))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_output_stats()
+        self.set_output_stats_active(True)
+
+    def hideEvent(self, event):
+        self.set_output_stats_active(False)
+        super().hideEvent(event)
+
+    def set_output_stats_active(self, active):
+        player = self.parent()
+        if isinstance(player, AudioPlayer):
+            player.refresh.set_active('output_stats', active)
+
+    def load_library_roots(self):
+        """Muestra las carpetas raíz de la biblioteca"""
+        if isinstance(self.parent(), AudioPlayer):
+            self.library_roots.clear()
+            self.library_roots.addItems(self.parent().library.roots())
+
+    def add_library_root(self):
+        path = QFileDialog.getExistingDirectory(self, "Selecciona una carpeta de música")
+        if path and isinstance(self.parent(), AudioPlayer):
+            self.parent().add_library_root(path)
+            self.load_library_roots()
+
+    def remove_library_root(self):
+        item = self.library_roots.currentItem()
+        if item is not None and isinstance(self.parent(), AudioPlayer):
+            self.parent().remove_library_root(item.text())
+            self.load_library_roots()
+
+    def rescan_library(self):
+        if isinstance(self.parent(), AudioPlayer):
+            self.parent().library_indexer.enqueue('full')
+
+    def add_library_to_playlist(self):
+        if isinstance(self.parent(), AudioPlayer):
+            player = self.parent()
+            player.add_files_to_playlist(player.library.track_paths())
+
     def save_eq_settings(self):
         """Guarda los valores de ecualización"""
         eq_values = {}
@@ -1011,17 +6046,58 @@ X-GNOME-Autostart-enabled=true
         # Contenido de la pestaña "General"
         self.startup_check = QCheckBox("Iniciar con el sistema")
         self.minimize_check = QCheckBox("Minimizar a la bandeja del sistema al minimizar")
+        self.fingerprint_check = QCheckBox("Comparar también la huella de audio al buscar duplicados")
+        self.spectrum_check = QCheckBox("Mostrar analizador de espectro")
+        self.spectrum_check.setEnabled(np is not None)
+        self.cache_spin = QSpinBox()
+        self.cache_spin.setRange(0, 8192)
+        self.cache_spin.setSingleStep(64)
+        self.cache_spin.setSuffix(" MB")
+        self.cache_spin.setEnabled(np is not None)
+        self.cache_stats_label = QLabel()
+        self.playlist_stats_label = QLabel()
+        self.skip_silence_check = QCheckBox("Saltar el silencio al principio y al final de las pistas")
+        self.skip_silence_check.setToolTip("Cada pista se analiza una vez en segundo plano y el resultado "
+                                           "se guarda en la biblioteca")
+        self.skip_silence_check.setEnabled(np is not None)
+        self.skip_gaps_check = QCheckBox("Saltar también los silencios largos dentro de la pista")
+        self.silence_status = QLabel()
+        self.decode_status = QLabel()
 
         # Cargar estado guardado de los checkboxes
         self.startup_check.setChecked(self.settings.value('startup', False, type=bool))
         self.minimize_check.setChecked(self.settings.value('minimize_to_tray', False, type=bool))
+        self.fingerprint_check.setChecked(self.settings.value('duplicate_fingerprint', False, type=bool))
+        self.spectrum_check.setChecked(self.settings.value('show_spectrum', False, type=bool))
+        self.cache_spin.setValue(self.settings.value('pcm_cache_mb', 256, type=int))
+        self.skip_silence_check.setChecked(self.settings.value('skip_silence', False, type=bool))
+        self.skip_gaps_check.setChecked(self.settings.value('skip_silence_gaps', False, type=bool))
+        self.skip_gaps_check.setEnabled(self.skip_silence_check.isEnabled() and self.skip_silence_check.isChecked())
 
         # Conectar señales de cambio
         self.startup_check.stateChanged.connect(self.save_settings)
         self.minimize_check.stateChanged.connect(self.save_settings)
+        self.fingerprint_check.stateChanged.connect(self.save_settings)
+        self.spectrum_check.stateChanged.connect(self.save_settings)
+        self.cache_spin.valueChanged.connect(self.save_settings)
+        self.skip_silence_check.stateChanged.connect(self.save_silence_settings)
+        self.skip_gaps_check.stateChanged.connect(self.save_silence_settings)
 
         general_layout.addWidget(self.startup_check)
         general_layout.addWidget(self.minimize_check)
+        general_layout.addWidget(self.fingerprint_check)
+        general_layout.addWidget(self.spectrum_check)
+        cache_layout = QHBoxLayout()
+        cache_layout.addWidget(QLabel("Caché de audio decodificado:"))
+        cache_layout.addWidget(self.cache_spin)
+        cache_layout.addStretch()
+        general_layout.addLayout(cache_layout)
+        general_layout.addWidget(self.cache_stats_label)
+        general_layout.addWidget(self.decode_status)
+        general_layout.addWidget(self.playlist_stats_label)
+        general_layout.addWidget(self.skip_silence_check)
+        general_layout.addWidget(self.skip_gaps_check)
+        general_layout.addWidget(self.silence_status)
         general_layout.addStretch()
 
         general_tab.setLayout(general_layout)
@@ -1076,6 +6152,86 @@ X-GNOME-Autostart-enabled=true
         eq_tab.setLayout(eq_layout)
     
         
+        # Crear la pestaña "Biblioteca"
+        library_tab = QWidget()
+        library_layout = QVBoxLayout()
+
+        self.library_roots = QListWidget()
+        self.library_status = QLabel("")
+        btn_add_root = QPushButton("Agregar carpeta")
+        btn_add_root.clicked.connect(self.add_library_root)
+        btn_remove_root = QPushButton("Quitar carpeta")
+        btn_remove_root.clicked.connect(self.remove_library_root)
+        btn_rescan = QPushButton("Reescanear todo")
+        btn_rescan.setToolTip("Vuelve a leer todos los archivos, incluidas etiquetas editadas en sitio")
+        btn_rescan.clicked.connect(self.rescan_library)
+        btn_add_to_playlist = QPushButton("Agregar a la lista")
+        btn_add_to_playlist.clicked.connect(self.add_library_to_playlist)
+
+        library_buttons = QHBoxLayout()
+        for button in [btn_add_root, btn_remove_root, btn_rescan, btn_add_to_playlist]:
+            library_buttons.addWidget(button)
+        library_layout.addWidget(QLabel("Carpetas de música:"))
+        library_layout.addWidget(self.library_roots)
+        library_layout.addLayout(library_buttons)
+        library_layout.addWidget(self.library_status)
+        library_tab.setLayout(library_layout)
+
+        # Crear la pestaña "Salida de audio"
+        output_tab = QWidget()
+        output_layout = QVBoxLayout()
+
+        self.buffer_combo = QComboBox()
+        for frames in (256, 512, 1024, 2048, 4096, 8192):
+            self.buffer_combo.addItem(f"{frames} frames", frames)
+        self.buffer_combo.setToolTip("Un búfer mayor resiste mejor la carga de CPU a cambio de más latencia")
+        self.frequency_combo = QComboBox()
+        for frequency in (22050, 44100, 48000, 96000):
+            self.frequency_combo.addItem(f"{frequency} Hz", frequency)
+        self.device_combo = QComboBox()
+        self.read_ahead_combo = QComboBox()
+        for kilobytes in (64, 128, 256, 512, 1024, 2048):
+            self.read_ahead_combo.addItem(f"{kilobytes} KB", kilobytes)
+        self.read_ahead_combo.setToolTip("Datos que se descargan por delante en las emisiones por red; "
+                                         "se aplica a la siguiente emisión")
+        self.read_ahead_combo.setCurrentIndex(max(0, self.read_ahead_combo.findData(
+            self.settings.value('stream_read_ahead', 256, type=int))))
+        self.read_ahead_combo.currentIndexChanged.connect(
+            lambda index: self.settings.setValue('stream_read_ahead', self.read_ahead_combo.currentData()))
+        self.buffer_combo.setCurrentIndex(max(0, self.buffer_combo.findData(
+            self.settings.value('audio_buffer', 1024, type=int))))
+        self.frequency_combo.setCurrentIndex(max(0, self.frequency_combo.findData(
+            self.settings.value('audio_frequency', 44100, type=int))))
+        self.load_output_devices()
+        btn_apply_output = QPushButton("Aplicar")
+        btn_apply_output.clicked.connect(self.apply_output_settings)
+        self.output_stats_label = QLabel()
+        self.native_rate_check = QCheckBox("Abrir la salida a la frecuencia original de cada pista")
+        self.native_rate_check.setToolTip("Evita remuestrear; la salida solo se reabre al cambiar de frecuencia")
+        self.native_rate_check.setChecked(self.settings.value('native_rate', False, type=bool))
+        self.native_rate_check.stateChanged.connect(
+            lambda state: self.settings.setValue('native_rate', self.native_rate_check.isChecked()))
+        btn_benchmark = QPushButton("Medir remuestreo y velocidad")
+        btn_benchmark.setToolTip("CPU que cuestan el remuestreo polifásico y el cambio de velocidad "
+                                 "por segundo de audio")
+        btn_benchmark.setEnabled(np is not None)
+        btn_benchmark.clicked.connect(self.benchmark_resampler)
+        self.benchmark_label = QLabel()
+
+        for text, widget in (("Búfer:", self.buffer_combo), ("Frecuencia:", self.frequency_combo),
+                             ("Dispositivo:", self.device_combo), ("Lectura anticipada en red:", self.read_ahead_combo)):
+            row_layout = QHBoxLayout()
+            row_layout.addWidget(QLabel(text))
+            row_layout.addWidget(widget, 1)
+            output_layout.addLayout(row_layout)
+        output_layout.addWidget(btn_apply_output, alignment=Qt.AlignRight)
+        output_layout.addWidget(self.output_stats_label)
+        output_layout.addWidget(self.native_rate_check)
+        output_layout.addWidget(btn_benchmark, alignment=Qt.AlignLeft)
+        output_layout.addWidget(self.benchmark_label)
+        output_layout.addStretch()
+        output_tab.setLayout(output_layout)
+
         # Crear la pestaña "Acerca de" (código existente)
         about_tab = QWidget()
         about_layout = QVBoxLayout()
@@ -1109,6 +6265,8 @@ X-GNOME-Autostart-enabled=true
         # Agregar todas las pestañas al widget
         tab_widget.addTab(general_tab, "General")
         tab_widget.addTab(eq_tab, "Ecualización")
+        tab_widget.addTab(library_tab, "Biblioteca")
+        tab_widget.addTab(output_tab, "Salida de audio")
         tab_widget.addTab(about_tab, "Acerca de")
     
         # Layout principal
@@ -1133,6 +6291,10 @@ X-GNOME-Autostart-enabled=true
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    try:
+        locale.setlocale(locale.LC_COLLATE, '')  # Orden alfabético según el idioma del sistema
+    except locale.Error:
+        pass
     
     # Aplicar el estilo oscuro
     app.setStyleSheet(load_stylesheet())
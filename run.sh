@@ -26,7 +26,7 @@ install_dependencies() {
     fi
     
     # Instalar dependencias de Python
-    pip3 install PyQt5 pygame mutagen
+    pip3 install PyQt5 pygame mutagen numpy
     
     echo -e "${GREEN}Dependencias instaladas correctamente${NC}"
 }
@@ -35,7 +35,7 @@ install_dependencies() {
 dependencies_needed=false
 
 # Verificar cada dependencia
-for package in "PyQt5" "pygame" "mutagen"; do
+for package in "PyQt5" "pygame" "mutagen" "numpy"; do
     if ! check_python_package "$package"; then
         echo "Falta el paquete: $package"
         dependencies_needed=true
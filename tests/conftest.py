@@ -0,0 +1,25 @@
+import os
+import sys
+import wave
+
+import pytest
+
+# Sin ventanas ni dispositivo de audio: las pruebas corren igual en un servidor
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_wav(tmp_path):
+    """Escribe un WAV PCM de 16 bits; samples es un array int16 (frames x canales) o bytes"""
+    def write(name, samples, rate=44100, channels=2):
+        path = tmp_path / name
+        data = samples if isinstance(samples, bytes) else samples.astype('<i2').tobytes()
+        with wave.open(str(path), 'wb') as f:
+            f.setnchannels(channels)
+            f.setsampwidth(2)
+            f.setframerate(rate)
+            f.writeframes(data)
+        return str(path)
+    return write
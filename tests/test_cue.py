@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+import reproductor as r
+
+RATE = 8000
+
+
+@pytest.fixture
+def album(make_wav):
+    """Archivo de 20 s de silencio para colgarle hojas CUE"""
+    return make_wav('album.wav', bytes(RATE * 20 * 4), rate=RATE)
+
+
+def write_cue(tmp_path, text, name='album.cue', encoding='utf-8'):
+    path = tmp_path / name
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def test_track_boundaries(tmp_path, album):
+    cue = write_cue(tmp_path, '\n'.join([
+        'REM GENRE Jazz',
+        'PERFORMER "Banda"',
+        'TITLE "Disco"',
+        'FILE "album.wav" WAVE',
+        '  TRACK 01 AUDIO',
+        '    TITLE "Uno"',
+        '    INDEX 01 00:00:00',
+        '  TRACK 02 AUDIO',
+        '    TITLE "Dos"',
+        '    PERFORMER "Invitada"',
+        '    INDEX 00 00:04:00',
+        '    INDEX 01 00:05:00',
+        '  TRACK 03 AUDIO',
+        '    INDEX 01 00:12:37',
+        '    TITLE "Tres"',
+    ]))
+    tracks = r.parse_cue_sheet(cue)
+    assert [t.number for t in tracks] == [1, 2, 3]
+    assert [t.key for t in tracks] == [cue + '#01', cue + '#02', cue + '#03']
+    # Cada pista acaba donde empieza la siguiente (INDEX 01, no la pausa del INDEX 00)
+    assert tracks[0].start == 0 and tracks[0].end == 5
+    assert tracks[1].start == 5 and tracks[1].end == pytest.approx(12 + 37 / 75)
+    assert tracks[2].end == pytest.approx(20)  # La última acaba con el archivo
+    assert [t.title for t in tracks] == ['Uno', 'Dos', 'Tres']  # TITLE antes o después del INDEX
+    assert [t.artist for t in tracks] == ['Banda', 'Invitada', 'Banda']
+    assert {t.album for t in tracks} == {'Disco'} and {t.genre for t in tracks} == {'Jazz'}
+    assert tracks[1].info()['duration'] == pytest.approx(7 + 37 / 75)
+
+
+def test_multiple_files(tmp_path, make_wav):
+    make_wav('a.wav', bytes(RATE * 10 * 4), rate=RATE)
+    make_wav('b.wav', bytes(RATE * 8 * 4), rate=RATE)
+    cue = write_cue(tmp_path, '\n'.join([
+        'FILE "a.wav" WAVE',
+        'TRACK 1 AUDIO', 'INDEX 01 00:00:00',
+        'TRACK 2 AUDIO', 'INDEX 01 00:06:00',
+        'FILE "b.flac" WAVE',  # Se busca el mismo nombre con una extensión reproducible
+        'TRACK 3 AUDIO', 'INDEX 01 00:00:00',
+        'TRACK 4 AUDIO', 'INDEX 01 00:03:00',
+    ]))
+    tracks = r.parse_cue_sheet(cue)
+    assert [(os.path.basename(t.audio), t.start, t.end) for t in tracks] == [
+        ('a.wav', 0, 6), ('a.wav', 6, 10), ('b.wav', 0, 3), ('b.wav', 3, 8)]
+
+
+@pytest.mark.parametrize('text', [
+    'FILE "album.wav" WAVE\nTRACK',
+    'FILE\nTRACK 01 AUDIO\nINDEX 01 00:00:00',
+    'FILE "album.wav" WAVE\nTRACK 01 AUDIO\nINDEX 01',
+    'FILE "album.wav" WAVE\nTRACK 01 AUDIO\nINDEX 01 1:xx:00',
+    'FILE "album.wav" WAVE\nTRACK uno AUDIO\nINDEX 01 00:00:00',
+    'FILE "album.wav" WAVE\nTRACK 01 AUDIO\nINDEX\nTITLE\n',
+    'FILE "falta.wav" WAVE\nTRACK 01 AUDIO\nINDEX 01 00:00:00',
+])
+def test_malformed_lines_are_skipped(tmp_path, album, text):
+    cue = write_cue(tmp_path, text)
+    assert r.parse_cue_sheet(cue) == []
+    assert r.CueIndex().tracks(cue) == []
+
+
+def test_malformed_lines_keep_valid_tracks(tmp_path, album):
+    cue = write_cue(tmp_path, '\n'.join([
+        'FILE "album.wav" WAVE',
+        'TRACK 01 AUDIO', 'INDEX 01 00:00:00', 'INDEX 01 00:02:00', 'INDEX 01',
+        'TRACK', 'INDEX 01 00:03:00',  # Sin número: el INDEX no tiene a qué pista ir
+        'TRACK 02 AUDIO', 'INDEX 01 00:04:00',
+    ]))
+    tracks = r.parse_cue_sheet(cue)
+    assert [(t.number, t.start, t.end) for t in tracks] == [(1, 0, 4), (2, 4, 20)]
+
+
+def test_legacy_encoding(tmp_path, album):
+    cue = write_cue(tmp_path, 'FILE "album.wav" WAVE\nTRACK 01 AUDIO\nTITLE "Canción"\nINDEX 01 00:00:00\n',
+                    encoding='cp1252')
+    assert r.parse_cue_sheet(cue)[0].title == 'Canción'
+
+
+def test_index_caches_until_sheet_changes(tmp_path, album):
+    cue = write_cue(tmp_path, 'FILE "album.wav" WAVE\nTRACK 01 AUDIO\nINDEX 01 00:00:00\n')
+    index = r.CueIndex()
+    first = index.locate(r.cue_track_key(cue, 1))
+    assert first is not None and index.locate(cue + '#01') is first  # Sin volver a leer la hoja
+    assert index.locate(cue + '#02') is None
+    assert index.locate('/tmp/otro.wav') is None and index.locate('http://radio/x.cue#01') is None
+    write_cue(tmp_path, 'FILE "album.wav" WAVE\nTRACK 01 AUDIO\nINDEX 01 00:01:00\n')
+    stat = os.stat(cue)
+    os.utime(cue, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert index.locate(cue + '#01').start == 1
+    os.remove(cue)
+    assert index.tracks(cue) == [] and index.locate(cue + '#01') is None
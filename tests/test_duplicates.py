@@ -0,0 +1,122 @@
+import struct
+
+import pytest
+
+import reproductor
+from reproductor import audio_payload_range, hash_audio_file, wav_fingerprint
+
+np = pytest.importorskip('numpy')
+
+
+def chunk(chunk_id, payload):
+    return chunk_id + struct.pack('<I', len(payload)) + payload + (b'\0' if len(payload) % 2 else b'')
+
+
+def riff(*chunks):
+    body = b'WAVE' + b''.join(chunks)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def fmt(rate=44100, channels=2):
+    return chunk(b'fmt ', struct.pack('<HHIIHH', 1, channels, rate, rate * channels * 2, channels * 2, 16))
+
+
+def info_list(**tags):
+    fields = b''.join(chunk(key.encode(), value.encode() + b'\0') for key, value in tags.items())
+    return chunk(b'LIST', b'INFO' + fields)
+
+
+def id3v2(text):
+    frame = b'TIT2' + struct.pack('>I', len(text) + 1) + b'\0\0' + b'\0' + text.encode('latin-1')
+    size = len(frame) + 100  # Con relleno, como dejan muchos editores
+    synchsafe = bytes([(size >> 21) & 0x7f, (size >> 14) & 0x7f, (size >> 7) & 0x7f, size & 0x7f])
+    return b'ID3\x03\x00\x00' + synchsafe + frame + bytes(100)
+
+
+def id3v1(title):
+    return b'TAG' + title.encode('latin-1').ljust(30, b'\0') + bytes(125 - 30)
+
+
+def ape(title):
+    item = struct.pack('<II', len(title), 0) + b'Title\0' + title.encode()
+    size = len(item) + 32
+    footer = b'APETAGEX' + struct.pack('<IIII', 2000, size, 1, 0) + bytes(8)
+    return item + footer
+
+
+@pytest.fixture
+def audio():
+    rng = np.random.default_rng(11)
+    samples = (rng.standard_normal((44100 * 3, 2)) * 4000)
+    samples[44100:66150] *= 0.05  # Un tramo suave para que la envolvente no sea plana
+    return samples.astype('<i2').tobytes()
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_wav_tags_do_not_change_the_hash(tmp_path, audio):
+    plain = write(tmp_path, 'plain.wav', riff(fmt(), chunk(b'data', audio)))
+    tagged = write(tmp_path, 'tagged.wav', riff(fmt(), info_list(INAM="Canción", IART="Alguien"),
+                                                chunk(b'data', audio), info_list(ICMT="al final")))
+    other = write(tmp_path, 'other.wav', riff(fmt(), chunk(b'data', audio[:-4] + b'\1\0\1\0')))
+    _, plain_hash, plain_fp = hash_audio_file(plain, fingerprint=True)
+    _, tagged_hash, tagged_fp = hash_audio_file(tagged, fingerprint=True)
+    assert plain_hash is not None and plain_hash == tagged_hash
+    assert plain_fp == tagged_fp and plain_fp[0] == 3
+    assert hash_audio_file(other)[1] != plain_hash
+
+
+def test_mp3_tags_do_not_change_the_hash(tmp_path):
+    frames = b''.join(b'\xff\xfb\x90\x64' + bytes([n % 251]) * 413 for n in range(40))
+    plain = write(tmp_path, 'plain.mp3', frames)
+    tagged = write(tmp_path, 'tagged.mp3', id3v2("Título") + id3v2("Otro") + frames + ape("x") + id3v1("Título"))
+    _, plain_hash, fp = hash_audio_file(plain, fingerprint=True)
+    assert fp is None  # Solo los WAV tienen huella
+    assert hash_audio_file(tagged)[1] == plain_hash
+    data = open(tagged, 'rb').read()
+    start, end = audio_payload_range(data, tagged)
+    assert data[start:end] == frames
+
+
+def test_numpy_fingerprint_matches_fallback(audio, monkeypatch):
+    for channels, payload in ((2, audio), (1, audio[:44100 * 2 * 5 + 6])):
+        data = riff(fmt(channels=channels), chunk(b'data', payload))
+        fast = wav_fingerprint(data)
+        monkeypatch.setattr(reproductor, 'np', None)
+        slow = wav_fingerprint(data)
+        monkeypatch.undo()
+        assert fast == slow and fast is not None
+    assert isinstance(fast[1], int)
+
+
+def test_fingerprint_rejects_unsupported_wavs():
+    assert wav_fingerprint(riff(fmt(), chunk(b'data', bytes(20)))) is None  # Menos de una muestra por segmento
+    assert wav_fingerprint(riff(fmt())) is None
+    eight_bit = chunk(b'fmt ', struct.pack('<HHIIHH', 1, 1, 8000, 8000, 1, 8))
+    assert wav_fingerprint(riff(eight_bit, chunk(b'data', bytes(8000)))) is None
+
+
+def test_scan_prunes_hash_cache(tmp_path, audio, monkeypatch):
+    store = tmp_path / 'cache'
+    store.mkdir()
+    monkeypatch.setattr(reproductor, 'get_data_path', lambda filename: str(store / filename))
+    kept = write(tmp_path, 'kept.wav', riff(fmt(), chunk(b'data', audio)))
+    other = write(tmp_path, 'other.wav', riff(fmt(), chunk(b'data', audio[:-4] + bytes(4))))
+    deleted = write(tmp_path, 'deleted.wav', riff(fmt(), chunk(b'data', audio[4:])))
+    replaced = write(tmp_path, 'replaced.wav', riff(fmt(), chunk(b'data', audio[8:])))
+    reproductor.DuplicateScanWorker([kept, other, deleted, replaced]).run()
+    assert len(reproductor.HashCache().entries) == 4
+
+    (tmp_path / 'deleted.wav').unlink()
+    (tmp_path / 'replaced.wav').unlink()  # Otro archivo en la misma ruta: otra identidad
+    write(tmp_path, 'replaced.wav', riff(fmt(), chunk(b'data', audio[12:])))
+    renamed = str(tmp_path / 'renamed.wav')
+    (tmp_path / 'kept.wav').rename(renamed)
+    reproductor.DuplicateScanWorker([renamed]).run()
+    # Se queda lo que vio el escaneo y lo que sigue igual en disco aunque no estuviera en la lista
+    entries = reproductor.HashCache().entries
+    assert sorted(entry[5] for entry in entries.values()) == [other, renamed]
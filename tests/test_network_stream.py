@@ -0,0 +1,233 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+import reproductor
+from reproductor import NetworkStream, StreamReader
+
+AUDIO = bytes(range(256)) * 1024  # 256 KiB reconocibles byte a byte
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Sirve las rutas de server.routes escribiendo la respuesta en bruto (permite «ICY 200 OK»)"""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict((k.lower(), v) for k, v in self.headers.items())))
+        route = self.server.routes[self.path]
+        try:
+            route(self, len(self.server.requests))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    httpd.routes = {}
+    httpd.requests = []
+    httpd.url = lambda path: f"http://127.0.0.1:{httpd.server_address[1]}{path}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def streams():
+    """Cierra al final los flujos que se hayan arrancado"""
+    started = []
+    yield started
+    for stream in started:
+        stream.close()
+        stream.wait(3000)
+
+
+def range_start(handler):
+    value = handler.headers.get('Range', '')
+    return int(value[len('bytes='):].rstrip('-')) if value.startswith('bytes=') else 0
+
+
+def read_all(reader, size, timeout=10.0):
+    """Lee como lo haría SDL: bloques fijos, reintentando cuando el lector devuelve 0"""
+    data = bytearray()
+    deadline = time.monotonic() + timeout
+    while len(data) < size and time.monotonic() < deadline:
+        buffer = bytearray(4096)
+        count = reader.readinto(buffer)
+        if count:
+            data += buffer[:count]
+        else:
+            reader.stream.wait_ready()
+    return bytes(data)
+
+
+def test_icy_metadata_is_split_from_audio(server):
+    metaint = 1000
+    titles = ["Artista - Primera", "Artista - Primera", "Ñandú - Segunda"]
+
+    def icy(handler, _):
+        out = handler.wfile
+        out.write(b"ICY 200 OK\r\nicy-name: Radio Prueba\r\ncontent-type: audio/mpeg\r\n"
+                  b"icy-metaint: %d\r\n\r\n" % metaint)
+        for number, title in enumerate(titles):
+            out.write(AUDIO[number * metaint:(number + 1) * metaint])
+            meta = f"StreamTitle='{title}';StreamUrl='';".encode('utf-8')
+            blocks = -(-len(meta) // 16)
+            out.write(bytes([blocks]) + meta.ljust(blocks * 16, b'\0'))
+        out.write(AUDIO[3 * metaint:4 * metaint])
+        out.write(b"\0")  # Bloque de metadatos vacío: no cambia el título
+        out.write(AUDIO[4 * metaint:4 * metaint + 500])
+        out.flush()
+
+    server.routes['/radio'] = icy
+    stream = NetworkStream(server.url('/radio'), read_ahead=1 << 20)
+    seen = []
+    stream.title_changed.connect(seen.append)
+    stream._download()  # En este hilo: las señales llegan directamente
+
+    assert stream.live and stream.length is None and not stream.complete
+    assert stream.name == "Radio Prueba"
+    assert stream.namehint() == 'mp3'
+    assert seen == ["Radio Prueba", "Artista - Primera", "Ñandú - Segunda"]
+    assert stream.title == "Ñandú - Segunda"
+    assert stream.received == 4 * metaint + 500
+    assert bytes(stream._data) == AUDIO[:4 * metaint + 500]
+    assert server.requests[0][1]['icy-metadata'] == '1'
+
+
+def test_read_ahead_limits_download(server, streams):
+    def whole(handler, _):
+        handler.wfile.write(b"HTTP/1.0 200 OK\r\nContent-Type: audio/wav\r\n"
+                            b"Content-Length: %d\r\n\r\n" % len(AUDIO))
+        handler.wfile.write(AUDIO)
+
+    server.routes['/file.wav'] = whole
+    read_ahead = 4 * NetworkStream.CHUNK
+    stream = NetworkStream(server.url('/file.wav'), read_ahead=read_ahead)
+    streams.append(stream)
+    stream.start()
+
+    assert wait_until(lambda: stream.received >= read_ahead)
+    time.sleep(0.3)  # Si no respetara el límite seguiría bajando el resto
+    assert stream.received < read_ahead + NetworkStream.CHUNK
+    assert not stream.complete
+
+    reader = stream.reader()
+    assert reader.size == len(AUDIO)
+    first = read_all(reader, read_ahead)
+    assert first == AUDIO[:read_ahead]
+    # Al consumir se abre sitio y la descarga continúa, siempre con el mismo margen
+    assert wait_until(lambda: stream.received >= 2 * read_ahead)
+    assert stream.received - stream.consumed < read_ahead + NetworkStream.CHUNK
+
+    rest = read_all(reader, len(AUDIO) - read_ahead)
+    assert first + rest == AUDIO
+    assert stream.complete and stream.reconnects == 0
+    assert reader.readinto(bytearray(16)) == 0  # Fin del archivo
+
+
+@pytest.mark.parametrize('honor_range', [True, False])
+def test_reconnects_after_disconnect(server, streams, honor_range):
+    cut = len(AUDIO) // 3
+
+    def flaky(handler, attempt):
+        start = range_start(handler) if honor_range else 0
+        status = b"206 Partial Content" if start else b"200 OK"
+        handler.wfile.write(b"HTTP/1.0 %s\r\nContent-Length: %d\r\n\r\n" % (status, len(AUDIO) - start))
+        handler.wfile.write(AUDIO[start:cut] if attempt == 1 else AUDIO[start:])
+
+    server.routes['/flaky.mp3'] = flaky
+    stream = NetworkStream(server.url('/flaky.mp3'), read_ahead=1 << 20)
+    streams.append(stream)
+    stream.start()
+
+    data = read_all(stream.reader(), len(AUDIO))
+    assert data == AUDIO
+    assert stream.complete and stream.reconnects == 1
+    assert server.requests[1][1]['range'] == f"bytes={cut}-"
+
+
+def test_reconnects_after_stall(server, streams, monkeypatch):
+    monkeypatch.setattr(NetworkStream, 'STALL_TIMEOUT', 0.3)
+    cut = len(AUDIO) // 4
+    release = threading.Event()
+
+    def stalling(handler, attempt):
+        start = range_start(handler)
+        status = b"206 Partial Content" if start else b"200 OK"
+        handler.wfile.write(b"HTTP/1.0 %s\r\nContent-Length: %d\r\n\r\n" % (status, len(AUDIO) - start))
+        if attempt == 1:
+            handler.wfile.write(AUDIO[:cut])
+            handler.wfile.flush()
+            release.wait(5)  # Conexión abierta pero muda
+        else:
+            handler.wfile.write(AUDIO[start:])
+
+    server.routes['/stall.mp3'] = stalling
+    stream = NetworkStream(server.url('/stall.mp3'), read_ahead=1 << 20)
+    streams.append(stream)
+    stalled = []
+    stream.stalled.connect(lambda: stalled.append(True))
+    stream.start()
+
+    reader = stream.reader()
+    assert read_all(reader, cut) == AUDIO[:cut]
+    # Sin datos nuevos el lector no se bloquea: devuelve 0 y avisa del corte
+    started = time.monotonic()
+    assert reader.readinto(bytearray(4096)) == 0
+    assert time.monotonic() - started < 1.0
+    assert stream.starving and stalled
+
+    rest = read_all(reader, len(AUDIO) - cut)
+    release.set()
+    assert AUDIO[:cut] + rest == AUDIO
+    assert stream.reconnects >= 1 and stream.complete
+
+
+def test_reader_answers_far_probes_with_zeros():
+    stream = NetworkStream('http://127.0.0.1/live', read_ahead=8192)
+    stream._store(AUDIO[:1000])
+    reader = StreamReader(stream, 0)
+    assert reader.size == NetworkStream.LIVE_SIZE  # Emisión sin tamaño conocido
+
+    reader.seek(-128, reproductor.io.SEEK_END)  # SDL busca etiquetas ID3v1 al final
+    buffer = bytearray(b'x' * 128)
+    assert reader.readinto(buffer) == 128 and buffer == bytes(128)
+    assert stream.consumed == 0  # El sondeo no cuenta como lectura
+
+    reader.seek(0)
+    buffer = bytearray(1000)
+    assert reader.readinto(buffer) == 1000 and buffer == AUDIO[:1000]
+    assert stream.consumed == 1000
+
+
+def test_gives_up_when_nothing_arrives(server, monkeypatch):
+    monkeypatch.setattr(NetworkStream, 'MAX_FAILURES', 2)
+
+    def missing(handler, _):
+        handler.wfile.write(b"HTTP/1.0 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+
+    server.routes['/missing'] = missing
+    stream = NetworkStream(server.url('/missing'), read_ahead=8192)
+    messages = []
+    stream.status.connect(messages.append)
+    stream.run()
+    assert stream.failed and stream.received == 0
+    assert len(server.requests) == 2
+    assert messages[-1] == "No se pudo conectar con la emisión"
@@ -0,0 +1,127 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import reproductor as r
+
+FRAMES = 4  # Bloques diminutos: cada uno ocupa 4 frames x 2 canales x 2 bytes
+BLOCK_BYTES = FRAMES * 2 * 2
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(r.PCMCache, 'BLOCK_FRAMES', FRAMES)
+
+
+def samples(blocks, value=1):
+    return np.full((blocks * FRAMES, 2), value, np.int16)
+
+
+def store(cache, path, blocks):
+    return cache.store_track(path, 1, 44100, samples(blocks))
+
+
+def test_least_recently_used_track_goes_first():
+    cache = r.PCMCache(4 * BLOCK_BYTES)
+    store(cache, 'a', 2)
+    store(cache, 'b', 2)
+    assert cache.lookup('a', 1, 44100, 2) is not None  # 'a' pasa a ser la más reciente
+    store(cache, 'c', 2)
+    assert cache.lookup('b', 1, 44100, 2) is None
+    assert cache.lookup('a', 1, 44100, 2) is not None
+    assert cache.lookup('c', 1, 44100, 2) is not None
+    assert cache.bytes_used == 4 * BLOCK_BYTES
+
+
+def test_budget_is_never_exceeded():
+    cache = r.PCMCache(3 * BLOCK_BYTES)
+    for name in 'abcdef':
+        store(cache, name, 2)
+        assert cache.bytes_used <= cache.budget
+    cache.set_budget(BLOCK_BYTES)
+    assert cache.bytes_used <= BLOCK_BYTES
+
+
+def test_track_larger_than_budget_is_refused_even_when_pinned():
+    cache = r.PCMCache(3 * BLOCK_BYTES)
+    store(cache, 'small', 1)
+    cache.pin('big')  # La que suena se fija antes de decodificarla
+    assert not cache.fits(4 * BLOCK_BYTES)
+    assert store(cache, 'big', 4) is False
+    assert cache.lookup('big', 1, 44100, 2) is None
+    assert cache.bytes_used == BLOCK_BYTES
+    assert cache.lookup('small', 1, 44100, 2) is not None
+
+
+def test_zero_budget_stores_nothing():
+    cache = r.PCMCache(0)
+    assert store(cache, 'a', 1) is False
+    assert cache.bytes_used == 0 and cache.stats()['tracks'] == 0
+
+
+def test_pinned_track_is_kept():
+    cache = r.PCMCache(4 * BLOCK_BYTES)
+    store(cache, 'a', 2)
+    cache.pin('a')
+    store(cache, 'b', 2)
+    store(cache, 'c', 2)
+    assert cache.lookup('a', 1, 44100, 2) is not None
+    assert cache.lookup('b', 1, 44100, 2) is None
+    cache.unpin('a')  # Ya suelta vuelve a competir por el espacio
+    store(cache, 'd', 2)
+    store(cache, 'e', 2)
+    assert cache.lookup('a', 1, 44100, 2) is None
+
+
+def test_evicting_a_block_drops_the_whole_track():
+    cache = r.PCMCache(3 * BLOCK_BYTES)
+    store(cache, 'a', 3)
+    assert cache.lookup('a', 1, 44100, 2) is not None
+    cache.set_budget(2 * BLOCK_BYTES)  # No cabe entera: sale con todos sus bloques
+    assert cache.lookup('a', 1, 44100, 2) is None
+    assert all(cache.get_block('a', i) is None for i in range(3))
+    assert cache.stats()['tracks'] == 0 and cache.bytes_used == 0
+    assert (cache.evictions, cache.evicted_bytes) == (1, 3 * BLOCK_BYTES)
+
+
+def test_bytes_used_only_counts_servable_tracks():
+    cache = r.PCMCache(10 * BLOCK_BYTES)
+    cache.pin('p')
+    store(cache, 'p', 2)
+    for i, blocks in enumerate([3, 1, 4, 2, 3, 1, 5, 2, 2, 3]):
+        store(cache, f't{i}', blocks)
+        cache.lookup('t0', 1, 44100, 2)  # Una pista que se sigue usando mientras se llena
+        assert cache.bytes_used <= cache.budget
+        servable = [cache.lookup(name, 1, 44100, 2) for name in ['p'] + [f't{j}' for j in range(i + 1)]]
+        assert cache.bytes_used == sum(track['blocks'] * BLOCK_BYTES for track in servable if track)
+    assert cache.stats()['tracks'] == sum(1 for track in servable if track)
+
+
+def test_lookup_checks_format_and_mtime():
+    cache = r.PCMCache(4 * BLOCK_BYTES)
+    store(cache, 'a', 1)
+    assert cache.lookup('a', 2, 44100, 2) is None  # Archivo modificado
+    assert cache.lookup('a', 1, 48000, 2) is None  # Otro mezclador
+    assert cache.lookup('a', 1, 44100, 1) is None
+
+
+def test_statistics():
+    cache = r.PCMCache(2 * BLOCK_BYTES)
+    store(cache, 'a', 2)
+    cache.lookup('a', 1, 44100, 2)
+    cache.lookup('x', 1, 44100, 2)
+    store(cache, 'b', 1)
+    stats = cache.stats()
+    assert stats == {'bytes_used': BLOCK_BYTES, 'budget': 2 * BLOCK_BYTES, 'tracks': 1, 'hits': 1,
+                     'misses': 1, 'evictions': 1, 'evicted_bytes': 2 * BLOCK_BYTES}
+
+
+def test_decoded_source_reads_across_blocks():
+    cache = r.PCMCache(4 * BLOCK_BYTES)
+    data = np.arange(3 * FRAMES * 2, dtype=np.int16).reshape(-1, 2)
+    cache.store_track('a', 1, 44100, data)
+    source = r.DecodedSource(cache, 'a', cache.lookup('a', 1, 44100, 2))
+    assert source.read_int16(2, 10).shape == (FRAMES - 2, 2)  # Nunca cruza un bloque
+    assert np.array_equal(source.read_int16(FRAMES, FRAMES), data[FRAMES:2 * FRAMES])
+    assert np.array_equal(source.read_before(2 * FRAMES, 3), data[2 * FRAMES - 3:2 * FRAMES])
+    source.close()
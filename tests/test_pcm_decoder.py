@@ -0,0 +1,50 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import pygame
+
+from reproductor import decode_pcm
+
+
+@pytest.fixture(autouse=True)
+def mixer():
+    yield
+    pygame.mixer.quit()
+
+
+def tone(frames, channels=2):
+    wave = (8000 * np.sin(np.arange(frames) / 7.0)).astype(np.int16)
+    return np.repeat(wave[:, None], channels, axis=1)
+
+
+def test_decodes_to_a_raw_file(make_wav, tmp_path):
+    samples = tone(22050)
+    path = make_wav('tone.wav', samples)
+    out = str(tmp_path / 'tone.pcm')
+    result_path, frames, reason = decode_pcm(path, 44100, 2, 1 << 20, out)
+    assert (result_path, frames, reason) == (path, 22050, '')
+    assert pygame.mixer.get_init()[0] == 44100
+    decoded = np.fromfile(out, dtype=np.int16).reshape(-1, 2)
+    assert np.array_equal(decoded, samples)
+
+
+def test_resamples_to_the_requested_rate(make_wav, tmp_path):
+    path = make_wav('tone.wav', tone(22050))
+    _, frames, _ = decode_pcm(path, 48000, 2, 1 << 20, str(tmp_path / 'tone.pcm'))
+    assert pygame.mixer.get_init()[0] == 48000
+    assert frames == pytest.approx(24000, abs=16)
+
+
+def test_tracks_over_the_limit_are_not_decoded(make_wav, tmp_path):
+    path = make_wav('tone.wav', tone(44100))
+    out = tmp_path / 'tone.pcm'
+    assert decode_pcm(path, 44100, 2, 1000, str(out)) == (path, 0, "no cabe en la caché PCM")
+    assert not out.exists()
+
+
+def test_unreadable_files_report_why(tmp_path):
+    broken = tmp_path / 'broken.mp3'
+    broken.write_bytes(b'no es audio')
+    path, frames, reason = decode_pcm(str(broken), 44100, 2, 1 << 20, str(tmp_path / 'x.pcm'))
+    assert frames == 0 and reason
@@ -0,0 +1,209 @@
+import random
+
+import pytest
+
+from reproductor import PlayQueue
+
+
+class Playlist:
+    """Lista y cola juntas, editadas como lo hace AudioPlayer: primero la lista, luego el aviso"""
+
+    def __init__(self, keys):
+        self.keys = []
+        self.queue = PlayQueue(self.keys)
+        for key in keys:
+            self.insert(len(self.keys), key)
+
+    def insert(self, index, key):
+        self.keys.insert(index, key)
+        self.queue.track_inserted(index, key)
+
+    def remove(self, key):
+        index = self.keys.index(key)
+        del self.keys[index]
+        self.queue.track_removed(index, key)
+
+    def move(self, old_rows, new_rows):
+        moved = [self.keys[row] for row in old_rows]
+        for row in reversed(old_rows):
+            del self.keys[row]
+        for row, key in zip(new_rows, moved):
+            self.keys.insert(row, key)
+        self.queue.tracks_moved(old_rows, new_rows)
+
+
+@pytest.fixture
+def playlist():
+    return Playlist('abcdefgh')
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(1234)
+
+
+def take(queue, count, auto=True):
+    return [queue.next(auto) for _ in range(count)]
+
+
+def test_sequential_next_and_previous(playlist):
+    queue = playlist.queue
+    assert take(queue, 8) == list('abcdefgh')
+    assert queue.next() is None  # Sin repetición la lista termina
+    assert queue.previous() == 'g'
+    assert queue.previous() == 'f'
+    assert queue.next() == 'g'  # Rehace lo deshecho con "anterior"
+    assert queue.next() == 'h'
+
+
+def test_previous_without_history_follows_list_order(playlist):
+    queue = playlist.queue
+    queue.jump('d', 3)
+    queue._history.clear()
+    assert queue.previous() == 'c'
+    assert queue.previous() == 'b'
+    queue.jump('a', 0)
+    queue._history.clear()
+    assert queue.previous() is None
+    queue.repeat = PlayQueue.REPEAT_ALL
+    assert queue.previous() == 'h'
+
+
+def test_repeat_modes(playlist):
+    queue = playlist.queue
+    queue.repeat = PlayQueue.REPEAT_ALL
+    assert take(queue, 10) == list('abcdefghab')
+    queue.repeat = PlayQueue.REPEAT_ONE
+    assert take(queue, 3) == ['b', 'b', 'b']  # Al terminar la pista se repite
+    assert queue.next() == 'c'  # Pero "siguiente" sí avanza
+
+
+def test_shuffle_plays_each_track_once_per_cycle(playlist):
+    queue = playlist.queue
+    queue.repeat = PlayQueue.REPEAT_ALL
+    queue.set_shuffle(True)
+    everything = set(playlist.keys)
+
+    first = take(queue, len(everything))
+    assert sorted(first) == sorted(everything)
+    for _ in range(20):
+        # La pista que cierra un ciclo cuenta como ya sonada en el siguiente
+        carried = queue.current
+        cycle = take(queue, len(everything) - 1)
+        assert carried not in cycle
+        assert sorted(cycle + [carried]) == sorted(everything)
+
+
+def test_shuffle_without_repeat_stops_after_one_cycle(playlist):
+    queue = playlist.queue
+    queue.set_shuffle(True)
+    played = take(queue, 8)
+    assert sorted(played) == list('abcdefgh')
+    assert queue.next() is None
+
+
+def test_shuffle_sees_tracks_edited_mid_cycle(playlist):
+    queue = playlist.queue
+    queue.set_shuffle(True)
+    played = take(queue, 3)
+    pending = [key for key in playlist.keys if key not in played]
+    gone = pending[0]
+    playlist.remove(gone)
+    playlist.remove(played[0])
+    playlist.insert(2, 'x')
+    playlist.insert(0, 'y')
+
+    rest = take(queue, 20)
+    assert rest[-1] is None
+    rest = rest[:rest.index(None)]
+    assert sorted(played + rest) == sorted(set('abcdefgh') - {gone} | {'x', 'y'})
+
+
+def test_single_track_shuffle_repeats_itself():
+    playlist = Playlist('a')
+    queue = playlist.queue
+    queue.repeat = PlayQueue.REPEAT_ALL
+    queue.set_shuffle(True)
+    assert take(queue, 3) == ['a', 'a', 'a']
+
+
+def test_shuffle_previous_and_forward(playlist):
+    queue = playlist.queue
+    queue.set_shuffle(True)
+    played = take(queue, 4)
+    assert queue.previous() == played[2]
+    assert queue.previous() == played[1]
+    assert take(queue, 2) == played[2:4]
+    following = queue.next()
+    assert following not in played
+
+
+def test_play_next_survives_index_shifts(playlist):
+    queue = playlist.queue
+    queue.jump('c', 2)
+    queue.play_next('f')
+    playlist.insert(0, 'x')  # Desplaza la actual y la elegida
+    playlist.remove('d')
+    playlist.insert(3, 'y')  # Justo detrás de la actual
+    assert queue.next() == 'f'
+    assert queue.next() == 'g'  # Sigue por donde está "f" ahora
+    assert queue.previous() == 'f'
+    assert queue.previous() == 'c'
+
+
+def test_play_next_goes_ahead_of_enqueued_and_skips_removed(playlist):
+    queue = playlist.queue
+    queue.jump('a', 0)
+    queue.enqueue('e')
+    queue.enqueue('g')
+    queue.play_next('h')
+    queue.play_next('d')
+    playlist.remove('h')
+    assert take(queue, 3, auto=False) == ['d', 'e', 'g']
+    assert queue.next() is None  # "g" es ahora la última de la lista
+
+
+def test_cursor_follows_inserts_and_removes_before_current(playlist):
+    queue = playlist.queue
+    queue.jump('e', 4)
+    playlist.insert(0, 'x')
+    playlist.insert(1, 'y')
+    playlist.remove('b')
+    assert queue._cursor == playlist.keys.index('e')
+    assert queue.next() == 'f'
+    playlist.insert(len(playlist.keys), 'z')
+    assert take(queue, 3) == ['g', 'h', 'z']
+
+
+def test_removing_current_continues_from_its_place(playlist):
+    queue = playlist.queue
+    queue.jump('d', 3)
+    playlist.remove('d')
+    assert not queue.has('d')
+    assert queue.next() == 'e'
+
+    queue.jump('b', 1)
+    queue._history.clear()
+    playlist.remove('b')
+    assert queue.previous() == 'a'
+
+
+def test_moves_keep_the_current_track(playlist):
+    queue = playlist.queue
+    queue.jump('c', 2)
+    playlist.move([2], [6])  # La actual pasa al final
+    assert playlist.keys == list('abdefgch')
+    assert queue.next() == 'h'
+
+    queue.jump('b', 1)
+    playlist.move([0, 4], [5, 6])  # Otras pistas cruzan por delante
+    assert queue.next() == playlist.keys[playlist.keys.index('b') + 1]
+
+
+def test_resync_after_replacing_the_list(playlist):
+    queue = playlist.queue
+    queue.jump('c', 2)
+    playlist.keys[:] = list('xcyz')
+    queue.resync()
+    assert not queue.has('a') and queue.has('z')
+    assert queue.next() == 'y'
@@ -0,0 +1,73 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from reproductor import PolyphaseResampler, ResampledSource, WavFile
+
+RATES = [(44100, 48000), (48000, 44100), (96000, 44100), (22050, 44100)]
+
+
+def sine(rate, seconds, frequency, channels=2, level=16000):
+    t = np.arange(int(rate * seconds)) / rate
+    wave = (level * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+    return np.repeat(wave[:, None], channels, axis=1)
+
+
+def frequency_of(samples, rate):
+    """Frecuencia por cruces ascendentes por cero, sin los bordes del filtro"""
+    x = samples[rate // 10:-rate // 10, 0].astype(np.float64)
+    crossings = np.flatnonzero((x[:-1] < 0) & (x[1:] >= 0))
+    return (len(crossings) - 1) / ((crossings[-1] - crossings[0]) / rate)
+
+
+@pytest.fixture
+def source(make_wav):
+    opened = []
+
+    def open_wav(rate, seconds=1.0, frequency=1000.0):
+        wav = WavFile(make_wav(f'sine{rate}.wav', sine(rate, seconds, frequency), rate=rate))
+        opened.append(wav)
+        return wav
+    yield open_wav
+    for wav in opened:
+        wav.close()
+
+
+@pytest.mark.parametrize('in_rate,out_rate', RATES)
+def test_output_length_follows_rate_ratio(in_rate, out_rate):
+    resampler = PolyphaseResampler(in_rate, out_rate)
+    assert resampler.up * in_rate == resampler.down * out_rate
+    assert resampler.output_frames(in_rate * 3) == out_rate * 3
+    assert resampler.output_frames(1001) == 1001 * out_rate // in_rate
+
+
+def test_supported_rejects_odd_ratios():
+    assert PolyphaseResampler.supported(44100, 48000)
+    assert not PolyphaseResampler.supported(44100, 48001)
+
+
+@pytest.mark.parametrize('in_rate,out_rate', RATES)
+def test_sine_keeps_frequency_and_level(source, in_rate, out_rate):
+    resampled = ResampledSource(source(in_rate), out_rate)
+    assert resampled.rate == out_rate and resampled.frames == out_rate
+    assert resampled.duration == pytest.approx(1.0)
+    out = resampled.read_int16(0, resampled.frames)
+    assert frequency_of(out, out_rate) == pytest.approx(1000.0, abs=1.0)
+    peak = np.abs(out[out_rate // 10:-out_rate // 10]).max()
+    assert peak == pytest.approx(16000, rel=0.01)  # Ganancia unidad en la banda de paso
+
+
+def test_removes_content_above_new_nyquist(source):
+    # 20 kHz a 48 kHz no cabe en 22.05 kHz: el filtro debe eliminarlo, no reflejarlo
+    resampled = ResampledSource(source(48000, frequency=20000.0), 22050)
+    out = resampled.read_int16(0, resampled.frames)
+    assert np.abs(out[2205:-2205]).max() < 160  # Al menos 40 dB por debajo
+
+
+@pytest.mark.parametrize('block', [7, 333, 1000, 4096])
+def test_block_reads_are_continuous(source, block):
+    resampled = ResampledSource(source(44100), 48000)
+    whole = resampled.read_int16(0, resampled.frames)
+    parts = np.concatenate([resampled.read_int16(start, block) for start in range(0, resampled.frames, block)])
+    assert np.array_equal(whole, parts)
+    assert len(resampled.read_int16(resampled.frames, block)) == 0
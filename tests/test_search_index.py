@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from reproductor import SearchIndex
+
+SONGS = {
+    'a.mp3': ("Canción del Árbol", "Niños Cantores", "Éxitos"),
+    'b.mp3': ("Arbolito", "Los Pinos", "Navidad"),
+    'c.mp3': ("Straße der Lieder", "Grüne Welle", "Deutsch"),
+    'd.flac': ("Cancionero", "Canto Libre", "Folk"),
+    'e.wav': ("Song For You", "Some Band", "Rock"),
+}
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    for key, fields in SONGS.items():
+        index.add(key, *fields)
+    return index
+
+
+def matched(index, query):
+    """Resultado de search con None (sin filtro) convertido en todas las claves"""
+    result = index.search(query)
+    return set(index._doc_tokens) if result is None else result
+
+
+def brute_force(documents, query):
+    terms = SearchIndex.tokenize(query)
+    return {key for key, fields in documents.items()
+            if all(any(token.startswith(term) for token in SearchIndex.tokenize(' '.join(fields)))
+                   for term in terms)}
+
+
+def test_tokenize_folds_case_and_accents():
+    assert SearchIndex.tokenize("  Canción ÁRBOL-niño's ") == ['cancion', 'arbol', 'nino', 's']
+    assert SearchIndex.tokenize("Straße") == ['strasse']
+    assert SearchIndex.tokenize("") == []
+
+
+def test_empty_query_does_not_filter(index):
+    assert index.search("") is None
+    assert index.search("  ,. ") is None
+
+
+def test_prefix_matching_across_terms(index):
+    assert matched(index, "canc") == {'a.mp3', 'd.flac'}
+    assert matched(index, "canc arb") == {'a.mp3'}
+    assert matched(index, "arb canc") == {'a.mp3'}  # El orden de los términos no importa
+    assert matched(index, "arbol") == {'a.mp3', 'b.mp3'}
+    assert matched(index, "arbol pin") == {'b.mp3'}
+    assert matched(index, "canc zzz") == set()
+    assert matched(index, "ong") == set()  # Solo prefijos, no subcadenas
+
+
+def test_case_and_accent_folding_both_ways(index):
+    assert matched(index, "CANCION") == {'a.mp3', 'd.flac'}
+    assert matched(index, "cánción") == {'a.mp3', 'd.flac'}
+    assert matched(index, "ninos exitos") == {'a.mp3'}
+    assert matched(index, "STRASSE grune") == {'c.mp3'}
+    assert matched(index, "straße") == {'c.mp3'}
+
+
+def test_incremental_add_and_remove(index):
+    assert matched(index, "arb") == {'a.mp3', 'b.mp3'}
+    index.add('f.ogg', "Árboles", "Bosque", "")
+    assert matched(index, "arb") == {'a.mp3', 'b.mp3', 'f.ogg'}
+    assert 'f.ogg' in index and len(index) == 6
+
+    index.remove('b.mp3')
+    assert matched(index, "arb") == {'a.mp3', 'f.ogg'}
+    assert matched(index, "pinos") == set()
+    assert 'pinos' not in index._tokens  # El token huérfano desaparece del índice ordenado
+
+    index.remove('missing.mp3')  # Quitar lo que no está no falla
+    assert len(index) == 5
+
+
+def test_reindexing_replaces_old_tokens(index):
+    index.add('e.wav', "Otra Canción", "", "")
+    assert matched(index, "song") == set()
+    assert matched(index, "otra canc") == {'e.wav'}
+    assert matched(index, "canc") == {'a.mp3', 'd.flac', 'e.wav'}
+
+
+def test_refined_queries_agree_with_fresh_searches(index):
+    typed = "canciones del arbol"
+    for end in range(1, len(typed) + 1):
+        query = typed[:end]
+        assert matched(index, query) == brute_force(SONGS, query), query
+
+
+def test_edits_between_refinements_are_seen(index):
+    assert matched(index, "so") == {'e.wav'}
+    index.add('g.mp3', "Sonata", "", "")
+    assert matched(index, "son") == {'e.wav', 'g.mp3'}
+    index.remove('e.wav')
+    assert matched(index, "sona") == {'g.mp3'}
+
+
+def test_bulk_load_matches_brute_force():
+    rng = random.Random(7)
+    words = ["amor", "amores", "año", "Ángel", "ánimo", "bajo", "bala", "calle", "cálido", "día",
+             "dinero", "Über", "uber", "zona", "zapato"]
+    documents = {f"{n}.mp3": (' '.join(rng.sample(words, 3)), rng.choice(words), f"tema{n}")
+                 for n in range(200)}
+    index = SearchIndex()
+    for key, fields in documents.items():
+        index.add(key, *fields)
+    assert len(index._new_tokens) >= 64  # Carga masiva: se ordenan de una vez al buscar
+    for query in ["a", "am", "an", "ang", "ub", "c d", "zap ca", "amores dia", "ÁNGEL", "tema1", "tema12 a"]:
+        assert matched(index, query) == brute_force(documents, query), query
+    assert index._tokens == sorted(index._tokens)
+
+    for key in list(documents)[::3]:
+        index.remove(key)
+        del documents[key]
+    for query in ["a", "ub", "zap ca", "ba"]:
+        assert matched(index, query) == brute_force(documents, query), query
@@ -0,0 +1,107 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from reproductor import SilenceDetector, SilenceInfo, analyze_silence
+
+RATE = 8000
+MARGIN = SilenceDetector.MARGIN_SECONDS
+STEP = SilenceDetector.WINDOW_SECONDS
+
+
+def tone(seconds, level=0.5, channels=2):
+    t = np.arange(int(seconds * RATE)) / RATE
+    wave = (level * 32767 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+    return np.repeat(wave[:, None], channels, axis=1)
+
+
+def silence(seconds, channels=2):
+    return np.zeros((int(seconds * RATE), channels), dtype=np.int16)
+
+
+def detect(parts, block=None, channels=2):
+    samples = np.concatenate(parts)
+    detector = SilenceDetector(RATE, channels)
+    block = block or len(samples)
+    for start in range(0, len(samples), block):
+        detector.feed(samples[start:start + block])
+    return detector.result()
+
+
+def test_leading_and_trailing_silence():
+    info = detect([silence(1.0), tone(3.0), silence(1.5)])
+    assert info.duration == pytest.approx(5.5)
+    assert info.sound_start == pytest.approx(1.0 - MARGIN, abs=STEP)
+    assert info.sound_end == pytest.approx(4.0 + MARGIN, abs=STEP)
+    assert info.gaps == []
+    assert info.effective_length() == pytest.approx(3.0 + 2 * MARGIN, abs=2 * STEP)
+
+
+def test_internal_gap_longer_than_minimum():
+    info = detect([tone(1.0), silence(3.0), tone(1.0), silence(2.5), tone(0.5)])
+    assert info.sound_start == 0.0
+    assert info.sound_end == pytest.approx(info.duration)
+    assert len(info.gaps) == 2
+    (start1, end1), (start2, end2) = info.gaps
+    assert start1 == pytest.approx(1.0 + MARGIN, abs=STEP)
+    assert end1 == pytest.approx(4.0 - MARGIN, abs=STEP)
+    assert start2 == pytest.approx(5.0 + MARGIN, abs=STEP)
+    assert end2 == pytest.approx(7.5 - MARGIN, abs=STEP)
+    assert info.effective_length(skip_gaps=True) == pytest.approx(
+        info.effective_length() - (end1 - start1) - (end2 - start2))
+
+
+def test_short_pause_is_not_a_gap():
+    info = detect([tone(1.0), silence(SilenceDetector.MIN_GAP_SECONDS - 0.5), tone(1.0)])
+    assert info.gaps == []
+
+
+def test_threshold_separates_hiss_from_sound():
+    rng = np.random.default_rng(3)
+    hiss = (rng.standard_normal((2 * RATE, 1)) * 32768 * 10 ** (-60 / 20)).astype(np.int16)
+    quiet = tone(2.0, level=10 ** (-40 / 20), channels=1)
+    info = detect([hiss, quiet, hiss], channels=1)
+    assert info.sound_start == pytest.approx(2.0 - MARGIN, abs=STEP)
+    assert info.sound_end == pytest.approx(4.0 + MARGIN, abs=STEP)
+
+
+def test_all_silence_is_not_trimmed():
+    info = detect([silence(3.0)])
+    assert (info.sound_start, info.sound_end, info.gaps) == (0.0, 3.0, [])
+
+
+def test_block_size_does_not_change_the_result():
+    parts = [silence(0.73), tone(1.31), silence(2.6), tone(0.9), silence(0.4)]
+    whole = detect(parts)
+    for block in (333, 400, 4097):
+        split = detect(parts, block=block)
+        assert (split.sound_start, split.sound_end, split.gaps) == (whole.sound_start, whole.sound_end,
+                                                                     whole.gaps)
+
+
+def test_analyze_silence_reads_wav_files(make_wav):
+    path = make_wav('gap.wav', np.concatenate([silence(0.5), tone(1.0), silence(3.0), tone(1.0)]), rate=RATE)
+    result_path, info = analyze_silence(path, decode=False)
+    assert result_path == path
+    assert info.sound_start == pytest.approx(0.5 - MARGIN, abs=STEP)
+    assert info.gaps == [pytest.approx((1.5 + MARGIN, 4.5 - MARGIN), abs=STEP)]
+
+
+def test_analyze_silence_without_decoding(tmp_path):
+    mp3 = tmp_path / 'song.mp3'
+    mp3.write_bytes(b'\xff\xfb' + bytes(1000))
+    assert analyze_silence(str(mp3), decode=False) == (str(mp3), None)
+    broken = tmp_path / 'broken.wav'
+    broken.write_bytes(b'RIFF\x04\x00\x00\x00WAVE')
+    assert analyze_silence(str(broken)) == (str(broken), None)
+
+
+def test_silence_info_navigation():
+    info = SilenceInfo(1.0, 20.0, 21.0, [(5.0, 8.0), (12.0, 15.0)])
+    assert info.gap_at(6.0) == 8.0
+    assert info.gap_at(4.97, tolerance=0.05) == 8.0
+    assert info.gap_at(9.0) is None
+    assert info.next_boundary(2.0) == 20.0
+    assert info.next_boundary(2.0, skip_gaps=True) == 5.0
+    assert info.next_boundary(13.0, skip_gaps=True) == 20.0
+    assert info.effective_length(skip_gaps=True) == pytest.approx(13.0)
@@ -0,0 +1,139 @@
+import time
+
+import pytest
+
+from reproductor import MusicLibrary, SmartPlaylists
+
+DAY = 86400
+TRACKS = [
+    # ruta, título, artista, álbum, género, duración (s), agregada hace (días)
+    ('/m/a.mp3', "Sol", "Los Andes", "Cumbres", "Folk", 180, 2),
+    ('/m/b.mp3', "Luna", "los andes", "Valles", "Rock", 420, 40),
+    ('/m/c.mp3', "Mar", "Océano", "Costas", "Jazz", 300, 400),
+    ('/m/d.wav', "Río", None, None, None, 60, 1),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = MusicLibrary.connect(':memory:')
+    now = int(time.time())
+    conn.executemany("INSERT INTO tracks (path, title, artist, album, genre, duration, added) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     [row[:6] + (now - row[6] * DAY,) for row in TRACKS])
+    play(conn, '/m/a.mp3', starts=5, skips=0)
+    play(conn, '/m/c.mp3', starts=2, skips=2)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def smart(conn):
+    return SmartPlaylists(conn)
+
+
+def play(conn, path, starts, skips):
+    conn.execute("INSERT OR IGNORE INTO history_tracks (path) VALUES (?)", (path,))
+    track = conn.execute("SELECT id FROM history_tracks WHERE path = ?", (path,)).fetchone()[0]
+    conn.execute("INSERT OR REPLACE INTO play_stats VALUES (?, ?, ?, ?, 0)", (track, starts, starts - skips, skips))
+
+
+def evaluate(conn, rules):
+    where, params = SmartPlaylists.compile(rules)
+    return sorted(row[0] for row in conn.execute(f"SELECT t.path {SmartPlaylists.SOURCE} WHERE {where}", params))
+
+
+@pytest.mark.parametrize('conditions,expected', [
+    ([('artist', 'contains', 'ANDES')], ['/m/a.mp3', '/m/b.mp3']),
+    ([('artist', 'is', 'los andes')], ['/m/a.mp3', '/m/b.mp3']),
+    ([('artist', 'is_not', 'Los Andes')], ['/m/c.mp3', '/m/d.wav']),  # Sin artista cuenta como ''
+    ([('genre', 'excludes', 'o')], ['/m/c.mp3', '/m/d.wav']),
+    ([('title', 'contains', '')], ['/m/a.mp3', '/m/b.mp3', '/m/c.mp3', '/m/d.wav']),
+    ([('duration', '>', 4)], ['/m/b.mp3', '/m/c.mp3']),
+    ([('duration', '=', 3)], ['/m/a.mp3']),
+    ([('plays', '>', 0)], ['/m/a.mp3', '/m/c.mp3']),
+    ([('plays', '<', 1)], ['/m/b.mp3', '/m/d.wav']),  # Nunca sonadas: 0 reproducciones
+    ([('skips', '>', 1)], ['/m/c.mp3']),
+    ([('added', '<', 7)], ['/m/a.mp3', '/m/d.wav']),
+    ([], ['/m/a.mp3', '/m/b.mp3', '/m/c.mp3', '/m/d.wav']),
+])
+def test_compile_single_conditions(conn, conditions, expected):
+    assert evaluate(conn, {'match': 'all', 'conditions': conditions}) == expected
+
+
+def test_compile_match_all_and_any(conn):
+    conditions = [('artist', 'contains', 'andes'), ('duration', '<', 5)]
+    assert evaluate(conn, {'match': 'all', 'conditions': conditions}) == ['/m/a.mp3']
+    assert evaluate(conn, {'match': 'any', 'conditions': conditions}) == ['/m/a.mp3', '/m/b.mp3', '/m/d.wav']
+
+
+def test_compile_keeps_values_out_of_the_sql():
+    where, params = SmartPlaylists.compile({'conditions': [('title', 'is', "x') OR 1=1 --")]})
+    assert "OR 1=1" not in where
+    assert params == ["x') OR 1=1 --"]
+
+
+def test_uses():
+    rules = {'conditions': [('plays', '>', 3), ('artist', 'is', 'x')]}
+    assert SmartPlaylists.uses(rules, SmartPlaylists.HISTORY_FIELDS)
+    assert not SmartPlaylists.uses(rules, SmartPlaylists.RELATIVE_FIELDS)
+
+
+def test_create_materializes_members(smart):
+    playlist_id = smart.create("Andinos", {'match': 'all', 'conditions': [('artist', 'contains', 'andes')]})
+    assert smart.members(playlist_id) == ['/m/a.mp3', '/m/b.mp3']
+    assert smart.all() == [(playlist_id, "Andinos",
+                            {'match': 'all', 'conditions': [['artist', 'contains', 'andes']]})]
+
+
+def test_update_paths_uses_compiled_rules(smart, conn, monkeypatch):
+    rock = smart.create("Rock", {'match': 'all', 'conditions': [('genre', 'is', 'rock')]})
+    played = smart.create("Sonadas", {'match': 'all', 'conditions': [('plays', '>', 0)]})
+    smart.compiled()
+    # Las reglas ya no se vuelven a leer ni a traducir en cada tanda
+    monkeypatch.setattr(SmartPlaylists, 'all', lambda self: pytest.fail("reglas releídas"))
+    monkeypatch.setattr(SmartPlaylists, 'compile', staticmethod(lambda rules: pytest.fail("reglas recompiladas")))
+
+    conn.execute("UPDATE tracks SET genre = 'Rock' WHERE path = '/m/c.mp3'")
+    conn.execute("UPDATE tracks SET genre = 'Pop' WHERE path = '/m/b.mp3'")
+    changes = smart.update_paths(['/m/b.mp3', '/m/c.mp3', '/m/d.wav'])
+    assert changes == {rock: (['/m/c.mp3'], ['/m/b.mp3'])}
+    assert smart.members(rock) == ['/m/c.mp3']
+
+    play(conn, '/m/b.mp3', starts=1, skips=0)
+    assert smart.update_paths(['/m/b.mp3'], SmartPlaylists.HISTORY_FIELDS) == {played: (['/m/b.mp3'], [])}
+    assert smart.update_paths(['/m/b.mp3']) == {}  # Nada más cambió
+
+
+def test_saving_a_rule_recompiles_it(smart, conn):
+    playlist_id = smart.create("Cortas", {'match': 'all', 'conditions': [('duration', '<', 2)]})
+    assert smart.members(playlist_id) == ['/m/d.wav']
+    smart.update(playlist_id, "Largas", {'match': 'all', 'conditions': [('duration', '>', 6)]})
+    assert smart.members(playlist_id) == ['/m/b.mp3']
+
+    conn.execute("UPDATE tracks SET duration = 600 WHERE path = '/m/a.mp3'")
+    assert smart.update_paths(['/m/a.mp3']) == {playlist_id: (['/m/a.mp3'], [])}
+
+    smart.delete(playlist_id)
+    assert playlist_id not in smart.compiled()
+    assert smart.update_paths(['/m/a.mp3']) == {}
+
+
+def test_cache_is_loaded_from_saved_rules(conn):
+    first = SmartPlaylists(conn)
+    playlist_id = first.create("Jazz", {'match': 'any', 'conditions': [('genre', 'is', 'jazz')]})
+    second = SmartPlaylists(conn)  # Otra sesión: las reglas salen de la base
+    rules, where, params = second.compiled()[playlist_id]
+    assert rules == {'match': 'any', 'conditions': [['genre', 'is', 'jazz']]}
+    assert (where, params) == SmartPlaylists.compile(rules)
+
+
+def test_refresh_relative_only_touches_time_rules(smart, conn):
+    recent = smart.create("Recientes", {'match': 'all', 'conditions': [('added', '<', 3)]})
+    folk = smart.create("Folk", {'match': 'all', 'conditions': [('genre', 'is', 'folk')]})
+    conn.execute("UPDATE tracks SET added = added - 5 * 86400 WHERE path = '/m/a.mp3'")
+    conn.execute("UPDATE tracks SET genre = 'Folk' WHERE path = '/m/b.mp3'")
+    smart.refresh_relative()
+    assert smart.members(recent) == ['/m/d.wav']
+    assert smart.members(folk) == ['/m/a.mp3']  # No se reevaluó: sigue esperando a update_paths
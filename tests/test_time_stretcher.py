@@ -0,0 +1,78 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from reproductor import TimeStretcher
+
+RATE = 44100
+SPEEDS = [0.5, 0.8, 1.25, 2.0]
+
+
+def sine(seconds, frequency=440.0, channels=2, level=16000):
+    t = np.arange(int(RATE * seconds)) / RATE
+    wave = (level * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+    return np.repeat(wave[:, None], channels, axis=1)
+
+
+def frequency_of(samples):
+    x = samples[RATE // 10:-RATE // 10, 0].astype(np.float64)
+    crossings = np.flatnonzero((x[:-1] < 0) & (x[1:] >= 0))
+    return (len(crossings) - 1) / ((crossings[-1] - crossings[0]) / RATE)
+
+
+def stretch(samples, speed, block=2048, origin=0):
+    stretcher = TimeStretcher(samples.shape[1], RATE, origin, speed)
+    out = [stretcher.process(samples[start:start + block]) for start in range(0, len(samples), block)]
+    return stretcher, np.concatenate(out)
+
+
+@pytest.mark.parametrize('speed', SPEEDS)
+def test_output_length_follows_speed(speed):
+    x = sine(3.0)
+    stretcher, out = stretch(x, speed)
+    # Solo queda pendiente la última trama y su margen de búsqueda
+    pending = (stretcher.frame + stretcher.search + stretcher.hop) / speed
+    assert 0 <= len(x) / speed - len(out) < pending
+    assert len(out) == pytest.approx(stretcher.position() / speed, abs=stretcher.hop)
+
+
+@pytest.mark.parametrize('speed', SPEEDS)
+def test_sine_keeps_its_pitch(speed):
+    _, out = stretch(sine(3.0), speed)
+    assert frequency_of(out) == pytest.approx(440.0, abs=2.0)
+    assert np.abs(out[RATE // 10:]).max() == pytest.approx(16000, rel=0.02)
+
+
+@pytest.mark.parametrize('speed', SPEEDS)
+def test_no_clicks_at_frame_joins(speed):
+    _, out = stretch(sine(2.0), speed)
+    steady = out[RATE // 10:, 0].astype(np.int32)
+    # La pendiente máxima de un seno de 440 Hz a 16000 es 2π·440·16000/44100 ≈ 1003 por muestra
+    assert np.abs(np.diff(steady)).max() < 1.2 * 2 * np.pi * 440 * 16000 / RATE
+
+
+@pytest.mark.parametrize('speed', [0.5, 1.0, 1.5])
+def test_block_size_does_not_change_output(speed):
+    x = sine(2.0, frequency=310.0)
+    _, reference = stretch(x, speed, block=2048)
+    for block in (777, 4096, 10000):
+        _, out = stretch(x, speed, block=block)
+        common = min(len(out), len(reference))
+        assert common > len(reference) - 2 * 4096
+        assert np.array_equal(out[:common], reference[:common]), block
+
+
+def test_unit_speed_passes_audio_through():
+    x = sine(1.0, frequency=523.0)
+    stretcher, out = stretch(x, 1.0)
+    hop = stretcher.hop
+    # Tras el fundido de entrada de la primera media trama, la suma de Hann al 50 % reconstruye la entrada
+    assert np.abs(out[hop:].astype(np.int32) - x[hop:len(out)]).max() <= 2
+
+
+def test_position_starts_at_origin():
+    stretcher = TimeStretcher(2, RATE, 5000, 1.5)
+    assert stretcher.position() == 5000
+    assert len(stretcher.process(np.zeros((100, 2), np.int16))) == 0  # Aún no hay una trama entera
+    stretcher.process(sine(0.5))
+    assert stretcher.position() > 5000
@@ -0,0 +1,35 @@
+import struct
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from reproductor import WavFile
+
+
+def wav_bytes(channels=2, bits=16, block_align=None, frames=100, rate=44100):
+    block_align = channels * bits // 8 if block_align is None else block_align
+    fmt = struct.pack('<HHIIHH', 1, channels, rate, rate * block_align, block_align, bits)
+    data = bytes(frames * channels * bits // 8)
+    body = (b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+            + b'data' + struct.pack('<I', len(data)) + data)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def test_reads_frames_and_format(tmp_path):
+    path = tmp_path / 'ok.wav'
+    path.write_bytes(wav_bytes(channels=1, bits=24, frames=300, rate=48000))
+    wav = WavFile(str(path))
+    try:
+        assert (wav.channels, wav.rate, wav.bits, wav.frames) == (1, 48000, 24, 300)
+        assert wav.read_int16(0, 1000).shape == (300, 1)
+    finally:
+        wav.close()
+
+
+@pytest.mark.parametrize('block_align', [0, 3, 8])
+def test_rejects_inconsistent_block_align(tmp_path, block_align):
+    path = tmp_path / 'broken.wav'
+    path.write_bytes(wav_bytes(block_align=block_align))
+    with pytest.raises(ValueError):
+        WavFile(str(path))